@@ -0,0 +1,47 @@
+"""Crash-safe file output: write a temporary sibling, then rename it over the destination."""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Hidden and ending in .tmp, so part globs such as *.cache_part never pick up one left behind by a crash.
+_TEMP_NAME = re.compile(r"\..+\.\d+-\d+\.tmp")
+
+
+def temp_path_for(path: Path) -> Path:
+    # Unique per process and thread, so concurrent writers of the same destination never share a temporary file.
+    return path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def remove_stale_temps(root: Path) -> int:
+    """Delete the temporary files killed writers left under ``root``; only call it while nothing writes there."""
+    removed = 0
+    for path in root.rglob(".*.tmp"):
+        if _TEMP_NAME.fullmatch(path.name) and path.is_file():
+            path.unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        logging.info("Removed %s temporary file(s) left under %s by an interrupted run", removed, root)
+    return removed
+
+
+def write_atomic(
+    path: Path, payload: bytes | memoryview | str, encoding: Optional[str] = None, newline: Optional[str] = None
+) -> None:
+    """Replace ``path`` with ``payload`` (text is written like ``Path.write_text`` with ``encoding``/``newline``)."""
+    tmp_path = temp_path_for(path)
+    try:
+        if isinstance(payload, str):
+            with tmp_path.open("w", encoding=encoding, newline=newline) as handle:
+                handle.write(payload)
+        else:
+            with tmp_path.open("wb") as handle:
+                handle.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -5,15 +5,61 @@ import argparse
 import logging
 import shutil
 import sys
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Iterable
+from typing import Dict, Iterable, Iterator, NamedTuple, Tuple
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
     sys.path.append(str(SCRIPT_DIR))
 
-from split_shader_cache import process_cache_file  # type: ignore  # noqa: E402
-from decompile_dxil import extract_dxil  # type: ignore  # noqa: E402
+from split_shader_cache import (  # type: ignore  # noqa: E402
+    OUTPUT_FORMATS,
+    RAW_PART_MODES,
+    CachePart,
+    PartOutput,
+    SplitOptions,
+    add_part_to_pack,
+    iter_cache_parts,
+    open_journal,
+    part_file_name,
+)
+from atomic_files import remove_stale_temps  # type: ignore  # noqa: E402
+from blob_store import (  # type: ignore  # noqa: E402
+    count_objects,
+    link_or_copy,
+    log_dedup_summary,
+    manifest_path_for,
+    object_path,
+    read_manifest,
+)
+from memory_budget import log_peak_rss, parse_size, plan_jobs, worker_share  # type: ignore  # noqa: E402
+from output_layout import FLAT, LAYOUTS, OutputLayout, load_layout, resolve_layout  # type: ignore  # noqa: E402
+from decompile_dxil import (  # type: ignore  # noqa: E402
+    DEFAULT_DXC_ARG_SETS,
+    extract_dxil,
+    extract_dxil_blob,
+    extract_dxil_buffer,
+)
+from part_filter import (  # type: ignore  # noqa: E402
+    PartFilter,
+    add_filter_arguments,
+    filter_from_args,
+    parse_part_name,
+)
+from shader_pack import PackWriter, pack_path_for  # type: ignore  # noqa: E402
+from run_journal import STAGES, RunJournal  # type: ignore  # noqa: E402
+from run_manifest import RunManifest  # type: ignore  # noqa: E402
+from dxc_arg_order import ArgSetOrder, save_learned, stats_path_for  # type: ignore  # noqa: E402
+from tool_scheduler import (  # type: ignore  # noqa: E402
+    DEFAULT_TOOL_TIMEOUT,
+    ToolScheduler,
+    log_tool_summary,
+    read_tool_log,
+    shared_tool_log,
+)
+from worker_pool import resolve_jobs, run_per_file  # type: ignore  # noqa: E402
 
 DEFAULT_INPUT_DIR = SCRIPT_DIR.parent.parent / "Resources" / "WhereWindsMeet" / "dx12"
 DEFAULT_OUTPUT_DIR = SCRIPT_DIR.parent.parent / "Outputs" / "WhereWindsMeet" / "shader_cache_extracted"
@@ -35,6 +81,316 @@ def _iter_cache_files(input_dir: Path, single: str | None) -> Iterable[Path]:
     yield from sorted(input_dir.glob("*.cache"))
 
 
+class ExtractOptions(NamedTuple):
+    """Everything ``_process_cache`` needs besides the cache; handed to worker processes with every cache."""
+
+    split: SplitOptions  # how parts are split and written; ``decompressed`` is --keep-intermediates
+    dxc: str | None = None
+    dxc_arg_sets: Iterable[Iterable[str]] = DEFAULT_DXC_ARG_SETS
+    emit_ir: bool = True
+    skip_split: bool = False  # extract from the outputs of an earlier split instead of splitting
+    tools: ToolScheduler | None = None  # runs dxc
+
+
+def _extract_split_parts(
+    cache_file: Path,
+    cache_out_dir: Path,
+    options: ExtractOptions,
+    part_filter: PartFilter | None = None,
+    layout: OutputLayout = FLAT,
+    journal: RunJournal | None = None,
+) -> Tuple[int, int]:
+    """Run DXIL extraction over parts already split to disk; returns (DXIL extracted, DXIL failures)."""
+    decompressed_parts = layout.glob(cache_out_dir, "*.cache_part.lz4_decompressed")
+    if part_filter is not None:
+        decompressed_parts = [path for path in decompressed_parts if part_filter.selects_path(path)]
+    undecoded = [
+        raw_path.name
+        for raw_path in layout.glob(cache_out_dir, "*.cache_part")
+        if not raw_path.with_name(raw_path.name + ".lz4_decompressed").exists()
+    ]
+    if undecoded:
+        logging.warning(
+            "%s part(s) of %s failed to decompress during the split and only have a raw .cache_part (e.g. %s)",
+            len(undecoded),
+            cache_file.name,
+            min(undecoded),
+        )
+    if not decompressed_parts:
+        logging.warning("No decompressed chunks for %s (looked in %s)", cache_file.name, cache_out_dir)
+        return 0, 0
+
+    extracted = 0
+    failed = 0
+    for part_idx, dxbc_path in enumerate(decompressed_parts, start=1):
+        logging.info("    [%s/%s] DXIL->IR %s", part_idx, len(decompressed_parts), dxbc_path.name)
+        try:
+            extract_dxil(dxbc_path, dxbc_path.parent, options.dxc, options.dxc_arg_sets, options.emit_ir, options.tools)
+        except ValueError as err:
+            logging.error("DXIL extraction failed for %s: %s", dxbc_path, err)
+            failed += 1
+            continue
+        extracted += 1
+        parsed = parse_part_name(dxbc_path.name)
+        if journal is not None and parsed is not None:
+            journal.record(parsed[1], "dxil")
+    return extracted, failed
+
+
+def _extract_into_pack(pack: PackWriter, part_index: int, data: bytes, label: str, options: ExtractOptions) -> None:
+    # Same skip-if-present rule as the loose-file layout, applied to the pack index.
+    if (part_index, "dxil_ir" if options.emit_ir else "dxil") in pack:
+        logging.info("Skipping %s because it is already in %s", label, pack.path.name)
+        return
+    bitcode, ir_text = extract_dxil_buffer(
+        data, label, options.dxc, options.dxc_arg_sets, options.emit_ir, tools=options.tools
+    )
+    if (part_index, "dxil") not in pack:
+        pack.add(part_index, "dxil", bitcode)
+    if ir_text is not None:
+        pack.add(part_index, "dxil_ir", ir_text.encode())
+
+
+def _iter_parts(
+    cache_file: Path, output_dir: Path, options: SplitOptions, part_filter: PartFilter | None
+) -> Iterator[CachePart]:
+    parts = iter_cache_parts(
+        cache_file,
+        output_dir,
+        use_index=options.use_index,
+        decompress_workers=options.decompress_workers,
+        max_memory=options.max_memory,
+        part_filter=part_filter,
+        pooled_lz4=options.pooled_lz4,
+    )
+    # The DXBC parser hands out views into its input (``DxbcContainer.data``) that can outlive the part, so pooled
+    # buffers are copied out before extraction sees them rather than recycled under those views.
+    for part in parts:
+        if isinstance(part.decompressed, memoryview):
+            part = part._replace(decompressed=bytes(part.decompressed))
+        yield part
+
+
+def _process_cache_into_pack(
+    cache_file: Path, output_dir: Path, options: ExtractOptions, part_filter: PartFilter | None = None
+) -> Tuple[int, int, int]:
+    """Pack-format counterpart of ``_process_cache``: every artifact is appended to ``<stem>.shaderpack``."""
+    parts = 0
+    extracted = 0
+    failed = 0
+    with PackWriter(pack_path_for(cache_file.stem, output_dir)) as pack:
+        if options.skip_split:
+            indices = [
+                index
+                for index in pack.parts("lz4_decompressed")
+                if part_filter is None
+                or part_filter.selects(cache_file.stem, index, pack.size(index, "lz4_decompressed"))
+            ]
+            sources = ((index, pack.read(index, "lz4_decompressed")) for index in indices)
+        else:
+            sources = _split_into_pack(cache_file, output_dir, pack, options.split, part_filter)
+
+        for part_index, data in sources:
+            if not options.skip_split:
+                parts += 1
+            if data is None:
+                continue
+            label = part_file_name(cache_file.stem, part_index)
+            logging.info("    [part %s] DXIL->IR %s", part_index, label)
+            try:
+                _extract_into_pack(pack, part_index, data, label, options)
+            except ValueError as err:
+                logging.error("DXIL extraction failed for %s part %s: %s", cache_file.name, part_index, err)
+                failed += 1
+                continue
+            extracted += 1
+
+    if not options.skip_split:
+        logging.info("Split %s into %s chunk(s)", cache_file.name, parts)
+    return parts, extracted, failed
+
+
+def _split_into_pack(
+    cache_file: Path,
+    output_dir: Path,
+    pack: PackWriter,
+    options: SplitOptions,
+    part_filter: PartFilter | None = None,
+) -> Iterable[Tuple[int, bytes | memoryview | None]]:
+    # The pack is shared with extraction and kept across runs; add_part_to_pack skips what an earlier run added.
+    for part in _iter_parts(cache_file, output_dir, options, part_filter):
+        add_part_to_pack(pack, part, options.raw_part_mode, options.decompressed)
+        yield part.number, part.decompressed
+
+
+def _dedup_sources(
+    cache_file: Path,
+    output_dir: Path,
+    options: ExtractOptions,
+    part_filter: PartFilter | None = None,
+    journal: RunJournal | None = None,
+) -> Iterable[Tuple[str, str, bytes | memoryview | None]]:
+    """Yield (part name, object key, decompressed blob or None when it is only on disk) for a dedup-format cache."""
+    if options.skip_split:
+        manifest_path = manifest_path_for(cache_file.stem, output_dir)
+        if not manifest_path.exists():
+            logging.warning("No dedup manifest for %s (looked for %s)", cache_file.name, manifest_path)
+            return
+        for name, key in read_manifest(manifest_path):
+            if part_filter is None or _dedup_selected(part_filter, name, object_path(output_dir, key)):
+                yield name, key, None
+        return
+
+    cache_parts = _iter_parts(cache_file, output_dir, options.split, part_filter)
+    with PartOutput(cache_file.name, output_dir, options.split, journal is not None, journal) as output:
+        for part in cache_parts:
+            key = output.add(part)
+            if key is None:
+                continue
+            yield f"{cache_file.stem}_part{part.number:04d}", key, part.decompressed
+
+
+def _dedup_selected(part_filter: PartFilter, name: str, source_path: Path) -> bool:
+    parsed = parse_part_name(name)
+    if parsed is None:
+        return part_filter.selects_path(source_path)
+    size = source_path.stat().st_size if source_path.exists() else None
+    return part_filter.selects(parsed[0], parsed[1], size)
+
+
+def _process_cache_dedup(
+    cache_file: Path,
+    output_dir: Path,
+    options: ExtractOptions,
+    part_filter: PartFilter | None = None,
+    layout: OutputLayout = FLAT,
+    journal: RunJournal | None = None,
+) -> Tuple[int, int, int]:
+    """Dedup-format counterpart of ``_process_cache``: DXIL is extracted once per distinct blob, next to the object."""
+    outcomes: Dict[str, bool] = {}
+    parts = 0
+    extracted = 0
+    failed = 0
+    for name, key, data in _dedup_sources(cache_file, output_dir, options, part_filter, journal):
+        parts += 1
+        if key not in outcomes:
+            source_path = object_path(output_dir, key)
+            logging.info("    [%s] DXIL->IR object %s", name, key)
+            try:
+                blob = data if data is not None else source_path.read_bytes()
+                extract_dxil_blob(
+                    blob,
+                    key,
+                    source_path.parent,
+                    options.dxc,
+                    options.dxc_arg_sets,
+                    options.emit_ir,
+                    source_path,
+                    options.tools,
+                )
+            except (OSError, ValueError) as err:
+                logging.error("DXIL extraction failed for %s (object %s): %s", name, key, err)
+                outcomes[key] = False
+            else:
+                outcomes[key] = True
+
+        if not outcomes[key]:
+            failed += 1
+        else:
+            extracted += 1
+            if options.split.dedup_links:
+                for suffix in (".dxil", ".dxil_ir.txt"):
+                    artifact = object_path(output_dir, key).with_name(key + suffix)
+                    if artifact.exists():
+                        link_path = layout.part_path(output_dir / cache_file.stem, f"{name}.cache_part{suffix}")
+                        link_or_copy(artifact, link_path)
+            parsed = parse_part_name(name)
+            if journal is not None and parsed is not None:
+                journal.record(parsed[1], "dxil")
+
+    if not options.skip_split:
+        logging.info("Split %s into %s chunk(s) (%s distinct blob(s))", cache_file.name, parts, len(outcomes))
+    return (0 if options.skip_split else parts), extracted, failed
+
+
+def _default_raw_parts(output_format: str, keep_intermediates: bool) -> str:
+    # --keep-intermediates has always meant every raw part; otherwise only failures are worth keeping.
+    return "always" if keep_intermediates and output_format != "dedup" else "on-failure"
+
+
+def _process_cache(
+    cache_file: Path, output_dir: Path, options: ExtractOptions, part_filter: PartFilter | None = None
+) -> Tuple[int, int, int]:
+    """Split one cache and extract DXIL from its parts; returns (parts split, DXIL extracted, DXIL failures)."""
+    logging.info("Processing cache %s", cache_file.name)
+    split = options.split
+    if split.raw_parts is None:
+        split = split._replace(raw_parts=_default_raw_parts(split.output_format, split.decompressed))
+        options = options._replace(split=split)
+    if split.output_format == "pack":
+        return _process_cache_into_pack(cache_file, output_dir, options, part_filter)
+
+    journal = None
+    if part_filter is None:
+        # The pack keeps its own record of what is done; selective runs leave the journal of the full run alone.
+        stages = ("dxil",) if options.skip_split else STAGES
+        journal, part_filter = open_journal(cache_file, output_dir, split.resume, stages)
+    with journal or nullcontext():
+        layout = split.layout or load_layout(output_dir)
+        if split.output_format == "dedup":
+            return _process_cache_dedup(cache_file, output_dir, options, part_filter, layout, journal)
+        if options.skip_split:
+            cache_out_dir = output_dir / cache_file.stem
+            return (0, *_extract_split_parts(cache_file, cache_out_dir, options, part_filter, layout, journal))
+        return _process_cache_files(cache_file, output_dir, options, part_filter, journal)
+
+
+def _process_cache_files(
+    cache_file: Path,
+    output_dir: Path,
+    options: ExtractOptions,
+    part_filter: PartFilter | None = None,
+    journal: RunJournal | None = None,
+) -> Tuple[int, int, int]:
+    """Loose-file part of ``_process_cache``: each part is written and extracted before the next is decompressed."""
+    split = options.split
+    parts = 0
+    extracted = 0
+    failed = 0
+    cache_parts = _iter_parts(cache_file, output_dir, split, part_filter)
+    with PartOutput(cache_file.name, output_dir, split, journal is not None, journal) as output:
+        for part in cache_parts:
+            parts += 1
+            output.add(part)
+            if part.decompressed is None:
+                continue
+
+            base_name = part_file_name(cache_file.stem, part.number)
+            logging.info("    [part %s] DXIL->IR %s", part.number, base_name)
+            try:
+                extract_dxil_blob(
+                    part.decompressed,
+                    base_name,
+                    output.artifact_dir(part.number),
+                    options.dxc,
+                    options.dxc_arg_sets,
+                    options.emit_ir,
+                    tools=options.tools,
+                )
+            except ValueError as err:
+                logging.error("DXIL extraction failed for %s part %s: %s", cache_file.name, part.number, err)
+                failed += 1
+                continue
+            extracted += 1
+            if journal is not None:
+                journal.record(part.number, "dxil")
+
+    if not parts and part_filter is None:
+        logging.warning("No shader parts found in %s", cache_file.name)
+    logging.info("Split %s into %s chunk(s)", cache_file.name, parts)
+    return parts, extracted, failed
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Split and extract SPIR-V IR for Where Winds Meet caches")
     parser.add_argument("--input-dir", type=Path, default=DEFAULT_INPUT_DIR, help="Directory containing *.cache files")
@@ -44,6 +400,86 @@ def main() -> None:
     parser.add_argument("--single", type=str, default=None, help="Process only the specified cache filename")
     parser.add_argument("--skip-split", action="store_true", help="Assume caches are already split/decompressed")
     parser.add_argument("--skip-ir", action="store_true", help="Extract DXIL bitcode without invoking llvm-dis/dxc")
+    parser.add_argument(
+        "--keep-intermediates",
+        action="store_true",
+        help="Also write the .lz4_decompressed files, and by default every .cache_part "
+        "(default: extract DXIL straight from memory)",
+    )
+    parser.add_argument(
+        "--raw-parts",
+        choices=RAW_PART_MODES,
+        default=None,
+        help="When to write the compressed .cache_part of a part "
+        "(default: always with --keep-intermediates, otherwise on-failure)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="files",
+        help="Write loose files under <stem>/ or append every artifact to <stem>.shaderpack (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dedup-links",
+        action="store_true",
+        help="With --output-format dedup, hardlink blobs and their DXIL artifacts back into <stem>/",
+    )
+    parser.add_argument("--force", action="store_true", help="Reprocess caches the run manifest marks as unchanged")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the caches an interrupted run left unfinished from its journal instead of redoing every part",
+    )
+    parser.add_argument(
+        "--dxc-timeout",
+        type=float,
+        default=DEFAULT_TOOL_TIMEOUT,
+        help="Seconds before a dxc call is killed; 0 waits forever (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dxc-concurrency",
+        type=int,
+        default=0,
+        help="dxc processes allowed to run at once across all --jobs workers (0 = one per CPU, default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fixed-dxc-order",
+        action="store_true",
+        help="Always try the dxc argument sets in their given order instead of the order learned per shader class",
+    )
+    parser.add_argument(
+        "--tool-log",
+        type=Path,
+        default=None,
+        help="Write the shader, exit code and duration of every dxc call to this TSV file",
+    )
+    parser.add_argument("--jobs", type=int, default=1, help="Cache files to process in parallel (0 = one per CPU)")
+    parser.add_argument("--decompress-threads", type=int, default=1, help="Threads decompressing chunks per cache")
+    parser.add_argument(
+        "--pooled-lz4",
+        action="store_true",
+        help="Decode LZ4 into reused buffers through liblz4 via ctypes (experimental; default: python-lz4)",
+    )
+    parser.add_argument(
+        "--writer-threads",
+        type=int,
+        default=1,
+        help="Threads writing loose part files behind extraction; 0 writes inline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default=None,
+        help="Put loose files directly in <stem>/ or in hash-prefix shard directories below it "
+        "(default: the layout recorded in the output directory, else flat)",
+    )
+    add_filter_arguments(parser)
+    parser.add_argument(
+        "--max-memory",
+        type=parse_size,
+        default=None,
+        help="RSS budget for the whole run, e.g. 2G; caps --jobs and throttles read-ahead and decompression",
+    )
     parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
     args = parser.parse_args()
 
@@ -57,36 +493,120 @@ def main() -> None:
 
     dxc = _resolve(args.dxc, "dxc")
 
-    if args.dxc_args is None:
-        dxc_arg_sets: Iterable[Iterable[str]] = (["-dumpbin"], ["-dumpbin", "-dxil"], ["-dumpbin", "-all"])
-    else:
-        dxc_arg_sets = (args.dxc_args,)
+    dxc_arg_sets: Iterable[Iterable[str]] = DEFAULT_DXC_ARG_SETS if args.dxc_args is None else (args.dxc_args,)
+    if not args.fixed_dxc_order:
+        dxc_arg_sets = ArgSetOrder.load(dxc_arg_sets, stats_path_for(output_dir))
 
+    part_filter = filter_from_args(args)
+    if args.resume and part_filter is not None:
+        raise SystemExit("--resume continues a full run and cannot be combined with part selection")
     caches = list(_iter_cache_files(input_dir, args.single))
     if not caches:
         logging.warning("No cache files detected under %s", input_dir)
         return
 
-    for index, cache_file in enumerate(caches, start=1):
-        logging.info("[%s/%s] Processing cache %s", index, len(caches), cache_file.name)
-        cache_out_dir = output_dir / cache_file.stem
+    layout = resolve_layout(output_dir, args.layout)
+    raw_parts = args.raw_parts or _default_raw_parts(args.output_format, args.keep_intermediates)
+    settings = {
+        "output_format": args.output_format,
+        "emit_ir": not args.skip_ir,
+        "dxc_args": args.dxc_args,
+        "skip_split": args.skip_split,
+        "keep_intermediates": args.keep_intermediates,
+        "dedup_links": args.dedup_links,
+        "raw_parts": raw_parts,
+    }
+    # Selective (--parts/size/sample) runs neither consult nor update the incremental run manifest.
+    manifest = RunManifest(output_dir, "batch", settings) if part_filter is None else None
+    if manifest is not None and not args.force:
+        # With --skip-split the existing outputs are this run's input, so they must not be cleaned away.
+        caches, unchanged = manifest.partition(caches, clean=not args.skip_split)
+        if unchanged:
+            logging.info("Skipping %s unchanged cache file(s); pass --force to redo them", len(unchanged))
+        if not caches:
+            manifest.save()
+            logging.info("Finished. Nothing to do.")
+            return
 
-        if not args.skip_split:
-            parts = process_cache_file(cache_file, output_dir)
-            logging.info("Split %s into %s chunk(s)", cache_file.name, parts)
+    if args.dxc_concurrency < 0:
+        raise SystemExit(f"--dxc-concurrency must be >= 0, got {args.dxc_concurrency}")
+    jobs = plan_jobs(min(resolve_jobs(args.jobs), len(caches)), args.max_memory)
+    if output_dir.is_dir():
+        remove_stale_temps(output_dir)
+    objects_before = count_objects(output_dir) if args.output_format == "dedup" else 0
 
-        decompressed_parts = sorted(cache_out_dir.glob("*.cache_part.lz4_decompressed"))
-        if not decompressed_parts:
-            logging.warning("No decompressed chunks for %s (looked in %s)", cache_file.name, cache_out_dir)
-            continue
-
-        for part_idx, dxbc_path in enumerate(decompressed_parts, start=1):
-            logging.info("    [%s/%s] DXIL->IR %s", part_idx, len(decompressed_parts), dxbc_path.name)
-            try:
-                extract_dxil(dxbc_path, cache_out_dir, dxc, dxc_arg_sets, not args.skip_ir)
-            except ValueError as err:
-                logging.error("DXIL extraction failed for %s: %s", dxbc_path, err)
+    total_parts = 0
+    total_extracted = 0
+    total_dxil_failures = 0
+    failed_caches = 0
+    succeeded = []
+    with shared_tool_log(args.tool_log) as tool_log:
+        tools = ToolScheduler(args.dxc_concurrency, args.dxc_timeout or None, tool_log)
+        initializer, initargs = tools.pool_initializer()
+        options = ExtractOptions(
+            split=SplitOptions(
+                output_format=args.output_format,
+                raw_parts=raw_parts,
+                decompressed=args.keep_intermediates,
+                dedup_links=args.dedup_links,
+                decompress_workers=args.decompress_threads,
+                max_memory=worker_share(args.max_memory, jobs),
+                writer_threads=args.writer_threads,
+                layout=layout,
+                resume=args.resume,
+                pooled_lz4=args.pooled_lz4,
+            ),
+            dxc=dxc,
+            dxc_arg_sets=dxc_arg_sets,
+            emit_ir=not args.skip_ir,
+            skip_split=args.skip_split,
+            tools=tools,
+        )
+        worker = partial(_process_cache, output_dir=output_dir, options=options, part_filter=part_filter)
+        results = run_per_file(worker, caches, jobs, initializer, initargs)
+        for index, (cache_file, counts, error) in enumerate(results, start=1):
+            if error is not None:
+                logging.error("[%s/%s] Failed to process cache %s: %s", index, len(caches), cache_file.name, error)
+                failed_caches += 1
                 continue
+            parts, extracted, dxil_failures = counts
+            logging.info(
+                "[%s/%s] Finished cache %s: %s part(s), %s DXIL extracted, %s failed",
+                index,
+                len(caches),
+                cache_file.name,
+                parts,
+                extracted,
+                dxil_failures,
+            )
+            total_parts += parts
+            total_extracted += extracted
+            total_dxil_failures += dxil_failures
+            succeeded.append(cache_file)
+        tools.close()
+        tool_runs = read_tool_log(tool_log)
+
+    if manifest is not None:
+        manifest.record(succeeded)
+        manifest.save()
+
+    logging.info(
+        "Finished. Split %s shader blobs from %s cache file(s); extracted DXIL from %s part(s) (%s failed).",
+        total_parts,
+        len(caches) - failed_caches,
+        total_extracted,
+        total_dxil_failures,
+    )
+    log_tool_summary(tool_runs)
+    if isinstance(dxc_arg_sets, ArgSetOrder):
+        save_learned(dxc_arg_sets.arg_sets, stats_path_for(output_dir), tool_runs)
+    log_peak_rss(args.max_memory, jobs)
+    if args.output_format == "dedup":
+        manifests = (manifest_path_for(cache_file.stem, output_dir) for cache_file in caches)
+        keys = [key for path in manifests if path.exists() for _, key in read_manifest(path)]
+        log_dedup_summary(keys, count_objects(output_dir) - objects_before)
+    if failed_caches:
+        raise SystemExit(f"{failed_caches} cache file(s) failed; see the log above")
 
 
 if __name__ == "__main__":
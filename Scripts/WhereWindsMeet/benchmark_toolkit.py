@@ -0,0 +1,189 @@
+"""Throughput benchmarks for the cache splitter and DXIL helpers on synthetic caches."""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Sequence
+
+from decompile_dxil import DxbcContainer, _extract_bitcode
+from export_shader_ir import extract_function_name
+from split_shader_cache import OUTPUT_FORMATS, SplitOptions, iter_cache_parts, process_cache_file
+from synthetic_cache import HEADER64_RATIO, SyntheticCache, synthetic_ir_text, write_synthetic_cache
+
+
+class BenchResult(NamedTuple):
+    name: str
+    items: int
+    size: int
+    seconds: float
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.size / self.seconds / 1e6 if self.seconds else float("inf")
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else float("inf")
+
+
+def _best_of(repeat: int, run: Callable[[], None], prepare: Callable[[], None] | None = None) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_process_cache_file(
+    caches: Sequence[Path], work_dir: Path, repeat: int, decompress_workers: int, output_format: str
+) -> BenchResult:
+    output_root = work_dir / "split"
+    options = SplitOptions(output_format=output_format, use_index=False, decompress_workers=decompress_workers)
+    written: List[int] = []
+
+    def prepare() -> None:
+        shutil.rmtree(output_root, ignore_errors=True)
+        written.clear()
+
+    def run() -> None:
+        for cache in caches:
+            written.append(process_cache_file(cache, output_root, options))
+
+    seconds = _best_of(repeat, run, prepare)
+    return BenchResult("process_cache_file", sum(written), sum(cache.stat().st_size for cache in caches), seconds)
+
+
+def bench_dxbc_container(blobs: Sequence[bytes], repeat: int) -> BenchResult:
+    def run() -> None:
+        for blob in blobs:
+            DxbcContainer(blob).chunk("DXIL")
+
+    return BenchResult("DxbcContainer", len(blobs), sum(map(len, blobs)), _best_of(repeat, run))
+
+
+def bench_extract_bitcode(dxil_chunks: Sequence[memoryview], repeat: int) -> BenchResult:
+    def run() -> None:
+        for chunk in dxil_chunks:
+            _extract_bitcode(chunk)
+
+    return BenchResult("_extract_bitcode", len(dxil_chunks), sum(map(len, dxil_chunks)), _best_of(repeat, run))
+
+
+def bench_extract_function_name(texts: Sequence[str], repeat: int) -> BenchResult:
+    def run() -> None:
+        for text in texts:
+            extract_function_name(text)
+
+    size = sum(len(text.encode()) for text in texts)
+    return BenchResult("extract_function_name", len(texts), size, _best_of(repeat, run))
+
+
+def _load_blobs(caches: Sequence[Path], work_dir: Path) -> List[bytes]:
+    blobs = []
+    for cache in caches:
+        for part in iter_cache_parts(cache, work_dir, use_index=False):
+            if part.decompressed is not None:
+                blobs.append(bytes(part.decompressed))
+    return blobs
+
+
+def _check_round_trip(synthetic: Sequence[SyntheticCache], blobs: Sequence[bytes]) -> None:
+    # Timing a splitter that drops or cuts blobs would be meaningless, so every generated blob must come back whole.
+    chunks = sum(cache.chunks for cache in synthetic)
+    size = sum(cache.decompressed_bytes for cache in synthetic)
+    if len(blobs) != chunks or sum(map(len, blobs)) != size:
+        raise SystemExit(
+            f"Synthetic caches did not round-trip: {len(blobs)} of {chunks} blob(s), "
+            f"{sum(map(len, blobs))} of {size} byte(s) decoded"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the shader cache toolkit on synthetic caches")
+    parser.add_argument(
+        "--input-dir",
+        type=Path,
+        default=None,
+        help="Benchmark these *.cache files instead of generating synthetic ones",
+    )
+    parser.add_argument("--work-dir", type=Path, default=None, help="Scratch directory (default: a temporary one)")
+    parser.add_argument("--caches", type=int, default=2, help="Synthetic caches to generate (default: %(default)s)")
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks per synthetic cache (default: %(default)s)")
+    parser.add_argument("--min-size", type=int, default=2 * 1024, help="Smallest bitcode size (default: %(default)s)")
+    parser.add_argument("--max-size", type=int, default=64 * 1024, help="Largest bitcode size (default: %(default)s)")
+    parser.add_argument(
+        "--header64-ratio",
+        type=float,
+        default=HEADER64_RATIO,
+        help="Share of synthetic chunks with a 64-bit size header (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is reported")
+    parser.add_argument("--decompress-threads", type=int, default=1, help="Threads passed to process_cache_file")
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="files",
+        help="Output format used for process_cache_file (default: %(default)s)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+
+    # The splitter logs every cache it touches; keep the benchmark output to the results table.
+    log_level = logging.DEBUG if args.verbose else logging.WARNING
+    logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s")
+
+    with tempfile.TemporaryDirectory(prefix="wwm_bench_") as temp_dir:
+        work_dir = args.work_dir or Path(temp_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        synthetic: List[SyntheticCache] = []
+        if args.input_dir is not None:
+            caches = sorted(args.input_dir.glob("*.cache"))
+            if not caches:
+                raise SystemExit(f"No cache files found under {args.input_dir}")
+        else:
+            synthetic = [
+                write_synthetic_cache(
+                    work_dir / "caches" / f"synthetic{index:03d}.cache",
+                    args.chunks,
+                    args.min_size,
+                    args.max_size,
+                    args.header64_ratio,
+                    args.seed + index,
+                )
+                for index in range(args.caches)
+            ]
+            caches = [cache.path for cache in synthetic]
+
+        blobs = _load_blobs(caches, work_dir)
+        if synthetic:
+            _check_round_trip(synthetic, blobs)
+        dxil_chunks = [chunk for chunk in (DxbcContainer(blob).chunk("DXIL") for blob in blobs) if chunk is not None]
+        rng = random.Random(args.seed)
+        texts = [synthetic_ir_text(rng) for _ in range(max(1, len(blobs)))]
+
+        results = [
+            bench_process_cache_file(caches, work_dir, args.repeat, args.decompress_threads, args.output_format),
+            bench_dxbc_container(blobs, args.repeat),
+            bench_extract_bitcode(dxil_chunks, args.repeat),
+            bench_extract_function_name(texts, args.repeat),
+        ]
+
+    print(f"{'benchmark':<24}{'items':>10}{'MB':>10}{'seconds':>10}{'MB/s':>12}{'chunks/s':>14}")
+    for result in results:
+        print(
+            f"{result.name:<24}{result.items:>10}{result.size / 1e6:>10.1f}{result.seconds:>10.3f}"
+            f"{result.mb_per_second:>12.1f}{result.items_per_second:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
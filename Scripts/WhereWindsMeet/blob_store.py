@@ -0,0 +1,97 @@
+"""Content-addressed store for decompressed shader blobs shared across caches and patches."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+from atomic_files import write_atomic
+
+OBJECTS_DIR = "objects"
+MANIFEST_SUFFIX = ".manifest.tsv"
+_DIGEST_SIZE = 16
+
+
+def blob_key(blob: bytes | memoryview) -> str:
+    return hashlib.blake2b(blob, digest_size=_DIGEST_SIZE).hexdigest()
+
+
+def object_path(output_root: Path, key: str) -> Path:
+    return output_root / OBJECTS_DIR / key[:2] / key
+
+
+def manifest_path_for(cache_stem: str, output_root: Path) -> Path:
+    return output_root / f"{cache_stem}{MANIFEST_SUFFIX}"
+
+
+def store_blob(output_root: Path, blob: bytes | memoryview) -> Tuple[str, bool]:
+    """Store ``blob`` unless an identical one is already present; returns (key, newly stored)."""
+    key = blob_key(blob)
+    path = object_path(output_root, key)
+    if path.exists():
+        return key, False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent workers may race on the same object, so publish it with an atomic rename.
+    write_atomic(path, blob)
+    return key, True
+
+
+def count_objects(output_root: Path) -> int:
+    objects_root = output_root / OBJECTS_DIR
+    if not objects_root.exists():
+        return 0
+    total = 0
+    for shard in os.scandir(objects_root):
+        if shard.is_dir():
+            total += sum(1 for entry in os.scandir(shard.path) if "." not in entry.name)
+    return total
+
+
+def write_manifest(manifest_path: Path, rows: Iterable[Tuple[str, str]]) -> None:
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(manifest_path, "".join(f"{name}\t{key}\n" for name, key in rows), encoding="utf-8", newline="\n")
+
+
+def read_manifest(manifest_path: Path) -> List[Tuple[str, str]]:
+    rows = []
+    for line in manifest_path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        name, _, key = line.partition("\t")
+        rows.append((name, key))
+    return rows
+
+
+def merge_manifest(manifest_path: Path, rows: Iterable[Tuple[str, str]]) -> None:
+    """Add or replace ``rows`` in an existing manifest (for runs that only touched some parts), keeping name order."""
+    merged = dict(read_manifest(manifest_path)) if manifest_path.exists() else {}
+    merged.update(rows)
+    write_manifest(manifest_path, sorted(merged.items()))
+
+
+def link_or_copy(src: Path, dest: Path) -> None:
+    """Materialize ``dest`` as a hardlink to ``src``, copying when the filesystem refuses links."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError as err:
+        logging.debug("Hardlink %s -> %s failed (%s); copying instead", dest, src, err)
+        shutil.copy2(src, dest)
+
+
+def log_dedup_summary(keys: Sequence[str], new_objects: int) -> None:
+    """Report how many parts (``keys``, one per part) collapsed onto how many distinct objects."""
+    unique = len(set(keys))
+    ratio = len(keys) / unique if unique else 1.0
+    logging.info(
+        "Dedup: %s part(s) map to %s distinct blob(s) (ratio %.2f:1); %s new object(s) stored this run",
+        len(keys),
+        unique,
+        ratio,
+        new_objects,
+    )
@@ -0,0 +1,81 @@
+"""Persistent chunk offset index, so later runs can seek straight to the chunks of a shader cache they need."""
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+INDEX_MAGIC = b"WWMI"
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".chunk_index"
+
+# magic, version, reserved, cache size, cache mtime (ns), entry count
+_HEADER = struct.Struct("<4sHHQQI")
+# offset, length, header width, declared uncompressed size, crc32
+_ENTRY = struct.Struct("<QQBQI")
+
+
+class ChunkEntry(NamedTuple):
+    offset: int  # absolute offset of the chunk, just past its delimiter
+    length: int  # chunk length including the size header
+    header_len: int  # 4 or 8, or 0 when the size header could not be decoded
+    uncompressed_size: int
+    checksum: int  # crc32 of the whole chunk
+
+
+def index_path_for(cache_path: Path, output_root: Path) -> Path:
+    return output_root / f"{cache_path.stem}{INDEX_SUFFIX}"
+
+
+def chunk_checksum(chunk: bytes | memoryview) -> int:
+    return zlib.crc32(chunk)
+
+
+def write_index(index_path: Path, cache_path: Path, entries: Sequence[ChunkEntry]) -> None:
+    stat = cache_path.stat()
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, stat.st_size, stat.st_mtime_ns, len(entries)))
+        for entry in entries:
+            handle.write(_ENTRY.pack(*entry))
+    os.replace(tmp_path, index_path)
+    logging.debug("Wrote chunk index %s (%s entries)", index_path, len(entries))
+
+
+def load_index(index_path: Path, cache_path: Path) -> Optional[List[ChunkEntry]]:
+    """Return the indexed chunks of ``cache_path``, or None when the index is missing, stale or unreadable."""
+    try:
+        raw = index_path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+    if len(raw) < _HEADER.size:
+        logging.warning("Ignoring truncated chunk index %s", index_path)
+        return None
+    magic, version, _, cache_size, cache_mtime, count = _HEADER.unpack_from(raw, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        logging.warning("Ignoring chunk index %s with unknown format", index_path)
+        return None
+    if len(raw) != _HEADER.size + count * _ENTRY.size:
+        logging.warning("Ignoring truncated chunk index %s", index_path)
+        return None
+
+    stat = cache_path.stat()
+    if stat.st_size != cache_size or stat.st_mtime_ns != cache_mtime:
+        logging.debug("Chunk index %s is stale for %s", index_path, cache_path.name)
+        return None
+
+    return [ChunkEntry(*fields) for fields in _ENTRY.iter_unpack(raw[_HEADER.size :])]
+
+
+def read_chunk(data: bytes | memoryview, entry: ChunkEntry) -> memoryview:
+    """Return a view of the indexed chunk, raising ValueError if it no longer matches the index."""
+    view = memoryview(data)[entry.offset : entry.offset + entry.length]
+    if len(view) != entry.length or chunk_checksum(view) != entry.checksum:
+        view.release()
+        raise ValueError(f"Chunk at offset {entry.offset} does not match the index checksum")
+    return view
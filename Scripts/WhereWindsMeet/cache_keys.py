@@ -0,0 +1,166 @@
+"""Shader key index recovered from the undocumented metadata block at the start of a shader cache."""
+from __future__ import annotations
+
+import logging
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from atomic_files import write_atomic
+from cache_index import ChunkEntry
+
+KEYS_SUFFIX = ".keys.tsv"
+# Widest record considered; real tables hold a key, a hash and a few integers per shader.
+MAX_RECORD_SIZE = 256
+# Shortest key prefix (in hex digits) accepted by ``select_parts``.
+MIN_PREFIX_LENGTH = 8
+_U32 = struct.Struct("<I")
+_DELIMITER_SIZE = 4
+
+
+class KeyTable(NamedTuple):
+    position: int  # offset of the first record within the metadata block
+    record_size: int
+    ordered_by: str  # "offset" when a record field locates its chunk, "position" when records are in chunk order
+    keys: Dict[str, int]  # lower-case hex key -> 1-based part number
+
+
+def keys_path_for(cache_stem: str, output_root: Path) -> Path:
+    return output_root / f"{cache_stem}{KEYS_SUFFIX}"
+
+
+def _column(header: bytes, start: int, record_size: int, count: int, field: int) -> List[int]:
+    return [_U32.unpack_from(header, start + index * record_size + field)[0] for index in range(count)]
+
+
+def _match_offsets(
+    header: bytes, start: int, record_size: int, entries: Sequence[ChunkEntry]
+) -> Optional[Tuple[int, List[int]]]:
+    """Return (field position, part per record) for the first u32 field locating a distinct chunk in every record."""
+    by_offset = {}
+    for part, entry in enumerate(entries, start=1):
+        by_offset[entry.offset] = part
+        by_offset[entry.offset - _DELIMITER_SIZE] = part
+    for field in range(0, record_size - 3, 4):
+        parts: List[int] = []
+        for index in range(len(entries)):
+            part = by_offset.get(_U32.unpack_from(header, start + index * record_size + field)[0])
+            if part is None:
+                break
+            parts.append(part)
+        else:
+            if len(set(parts)) == len(parts):
+                return field, parts
+    return None
+
+
+def _dropped_fields(
+    header: bytes,
+    start: int,
+    record_size: int,
+    parts: Sequence[int],
+    entries: Sequence[ChunkEntry],
+    offset_field: Optional[int],
+) -> Set[int]:
+    """Byte positions within a record that hold the chunk offset or blob size rather than key material."""
+    dropped: Set[int] = set()
+    candidates = [] if offset_field is None else [offset_field]
+    sizes = [entries[part - 1].uncompressed_size for part in parts]
+    for field in range(0, record_size - 3, 4):
+        if _column(header, start, record_size, len(parts), field) == sizes:
+            candidates.append(field)
+    for field in candidates:
+        dropped.update(range(field, field + 4))
+        # A zero high half makes it a 64-bit field.
+        if field + 8 <= record_size and not any(_column(header, start, record_size, len(parts), field + 4)):
+            dropped.update(range(field + 4, field + 8))
+    return dropped
+
+
+def _table_at(header: bytes, start: int, record_size: int, entries: Sequence[ChunkEntry]) -> Optional[KeyTable]:
+    count = len(entries)
+    matched = _match_offsets(header, start, record_size, entries)
+    if matched is not None:
+        offset_field, parts = matched
+        ordered_by = "offset"
+    elif start + count * record_size == len(header):
+        offset_field, parts = None, list(range(1, count + 1))
+        ordered_by = "position"
+    else:
+        return None
+
+    dropped = _dropped_fields(header, start, record_size, parts, entries, offset_field)
+    key_bytes = [position for position in range(record_size) if position not in dropped]
+    if not key_bytes:
+        return None
+    keys: Dict[str, int] = {}
+    for index, part in enumerate(parts):
+        record = header[start + index * record_size : start + (index + 1) * record_size]
+        keys[bytes(record[position] for position in key_bytes).hex()] = part
+    if len(keys) != count:
+        return None  # keys must identify their shader
+    return KeyTable(start, record_size, ordered_by, keys)
+
+
+def parse_key_table(header: bytes | memoryview, entries: Sequence[ChunkEntry]) -> Optional[KeyTable]:
+    """Find a count-prefixed table of one record per chunk in a cache's metadata block, or return None."""
+    header = bytes(header)
+    count = len(entries)
+    if not count:
+        return None
+    count_bytes = _U32.pack(count)
+    fallback: Optional[KeyTable] = None
+    position = header.find(count_bytes)
+    while position != -1:
+        for start in (position + 4, position + 8):
+            if start == position + 8 and header[position + 4 : position + 8] != bytes(4):
+                continue  # not a 64-bit count
+            for record_size in range(4, min(MAX_RECORD_SIZE, (len(header) - start) // count) + 1, 4):
+                table = _table_at(header, start, record_size, entries)
+                if table is None:
+                    continue
+                # Records that locate their chunk beat ones that merely fill the rest of the block.
+                if table.ordered_by == "offset":
+                    return table
+                fallback = fallback or table
+        position = header.find(count_bytes, position + 1)
+    return fallback
+
+
+def normalize_key(key: str) -> str:
+    key = key.strip().lower()
+    return key[2:] if key.startswith("0x") else key
+
+
+def read_key_file(path: Path) -> List[str]:
+    """Keys listed one per line (or as the first column of a ``.keys.tsv``); blank lines and ``#`` comments skipped."""
+    keys = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            keys.append(line.split()[0])
+    return keys
+
+
+def select_parts(table: KeyTable, keys: Iterable[str]) -> Tuple[Set[int], List[str]]:
+    """Map keys (or unique prefixes of ``MIN_PREFIX_LENGTH``+ hex digits) to parts; returns (parts, unmatched)."""
+    parts: Set[int] = set()
+    unmatched: List[str] = []
+    for key in keys:
+        wanted = normalize_key(key)
+        part = table.keys.get(wanted)
+        if part is None and len(wanted) >= MIN_PREFIX_LENGTH:
+            candidates = [number for full, number in table.keys.items() if full.startswith(wanted)]
+            part = candidates[0] if len(candidates) == 1 else None
+        if part is None:
+            unmatched.append(key)
+        else:
+            parts.add(part)
+    return parts, unmatched
+
+
+def write_keys(path: Path, table: KeyTable) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = sorted(table.keys.items(), key=lambda item: item[1])
+    write_atomic(path, "".join(f"{key}\t{part}\n" for key, part in rows), encoding="utf-8", newline="\n")
+    logging.debug("Wrote %s key(s) to %s", len(table.keys), path)
@@ -0,0 +1,114 @@
+"""Header-only statistics for shader caches (``split_shader_cache.py --stats-only``); nothing is decompressed."""
+from __future__ import annotations
+
+import bisect
+import heapq
+import logging
+from typing import Callable, Dict, List, Tuple
+
+# Upper bounds (exclusive) of the uncompressed/compressed ratio buckets; the last bucket is open-ended.
+RATIO_BUCKETS = (1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 16.0)
+TOP_CHUNKS = 10
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def _ratio_label(bucket: int) -> str:
+    if bucket == 0:
+        return f"< {RATIO_BUCKETS[0]:g}x"
+    if bucket == len(RATIO_BUCKETS):
+        return f">= {RATIO_BUCKETS[-1]:g}x"
+    return f"{RATIO_BUCKETS[bucket - 1]:g}-{RATIO_BUCKETS[bucket]:g}x"
+
+
+class CacheStats:
+    """Counters for one or more caches; merge per-cache results with :meth:`merge`."""
+
+    def __init__(self) -> None:
+        self.caches = 0
+        self.cache_bytes = 0
+        self.chunks = 0
+        self.compressed_bytes = 0
+        self.uncompressed_bytes = 0
+        self.header_widths: Dict[int, int] = {}  # 4, 8, or 0 for undecodable headers
+        self.ratio_histogram: Dict[int, int] = {}  # bucket index -> chunks
+        self.size_histogram: Dict[int, int] = {}  # power-of-two exponent of the declared size -> chunks
+        self.largest: List[Tuple[int, str, int]] = []  # min-heap of (declared size, cache name, part)
+
+    def add_cache(self, cache_bytes: int) -> None:
+        self.caches += 1
+        self.cache_bytes += cache_bytes
+
+    def add_chunk(self, cache_name: str, part: int, length: int, header_len: int, uncompressed_size: int) -> None:
+        self.chunks += 1
+        self.header_widths[header_len] = self.header_widths.get(header_len, 0) + 1
+        if not header_len:
+            return
+        compressed = length - header_len
+        self.compressed_bytes += compressed
+        self.uncompressed_bytes += uncompressed_size
+        ratio = uncompressed_size / compressed if compressed else float("inf")
+        bucket = bisect.bisect_right(RATIO_BUCKETS, ratio)
+        self.ratio_histogram[bucket] = self.ratio_histogram.get(bucket, 0) + 1
+        exponent = max(0, uncompressed_size - 1).bit_length()
+        self.size_histogram[exponent] = self.size_histogram.get(exponent, 0) + 1
+        item = (uncompressed_size, cache_name, part)
+        if len(self.largest) < TOP_CHUNKS:
+            heapq.heappush(self.largest, item)
+        elif item > self.largest[0]:
+            heapq.heapreplace(self.largest, item)
+
+    def merge(self, other: "CacheStats") -> None:
+        self.caches += other.caches
+        self.cache_bytes += other.cache_bytes
+        self.chunks += other.chunks
+        self.compressed_bytes += other.compressed_bytes
+        self.uncompressed_bytes += other.uncompressed_bytes
+        for mine, theirs in (
+            (self.header_widths, other.header_widths),
+            (self.ratio_histogram, other.ratio_histogram),
+            (self.size_histogram, other.size_histogram),
+        ):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.largest = heapq.nlargest(TOP_CHUNKS, self.largest + other.largest)
+        heapq.heapify(self.largest)
+
+    @staticmethod
+    def _histogram_lines(histogram: Dict[int, int], label: Callable[[int], str]) -> List[str]:
+        decoded = sum(histogram.values()) or 1
+        rows = sorted(histogram.items())
+        return [f"  {label(key):>14} {count:>10} ({100 * count / decoded:5.1f}%)" for key, count in rows]
+
+    def report_lines(self, seconds: float) -> List[str]:
+        ratio = self.uncompressed_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+        throughput = self.cache_bytes / seconds / 1e9 if seconds else float("inf")
+        lines = [
+            f"Caches: {self.caches} ({_format_bytes(self.cache_bytes)}) in {seconds:.2f}s ({throughput:.2f} GB/s)",
+            f"Chunks: {self.chunks}",
+            f"Compressed payload: {_format_bytes(self.compressed_bytes)}",
+            f"Declared uncompressed: {_format_bytes(self.uncompressed_bytes)} (overall ratio {ratio:.2f}x)",
+            "Size headers: "
+            + ", ".join(
+                f"{self.header_widths.get(width, 0)} {name}"
+                for width, name in ((4, "32-bit"), (8, "64-bit"), (0, "undecodable"))
+            ),
+            "Uncompressed/compressed ratio:",
+            *self._histogram_lines(self.ratio_histogram, _ratio_label),
+            "Declared uncompressed size:",
+            *self._histogram_lines(self.size_histogram, lambda exponent: f"<= {_format_bytes(1 << exponent)}"),
+            "Largest chunks (declared uncompressed size):",
+        ]
+        for size, cache_name, part in sorted(self.largest, reverse=True):
+            lines.append(f"  {_format_bytes(size):>12}  {cache_name} part {part}")
+        return lines
+
+    def log_report(self, seconds: float) -> None:
+        for line in self.report_lines(seconds):
+            logging.info("%s", line)
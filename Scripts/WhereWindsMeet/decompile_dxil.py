@@ -5,46 +5,101 @@ import argparse
 import logging
 import shutil
 import struct
-import subprocess
+import tempfile
+from collections import Counter
+from functools import partial
 from pathlib import Path
-from typing import Dict, Iterable, Sequence, Tuple
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 from tqdm import tqdm
 
+from atomic_files import write_atomic
+from dxc_arg_order import ArgSetOrder, arg_set_key, save_learned, shader_class, stats_path_for
+from part_filter import add_filter_arguments, filter_from_args
+from tool_scheduler import DEFAULT_TOOL_TIMEOUT, ToolScheduler, log_tool_summary, read_tool_log, shared_tool_log
+from worker_pool import resolve_jobs, run_per_file
+
 DXBC_MAGIC = b"DXBC"
 DXIL_SIGNATURE = b"DXIL"
 BITCODE_MAGIC = b"BC\xC0\xDE"
-
-
-def _read_chunk_offsets(data: bytes) -> Iterable[int]:
-    chunk_count = struct.unpack_from("<I", data, 28)[0]
-    return struct.unpack_from("<" + "I" * chunk_count, data, 32)
-
-
-def _parse_chunks(data: bytes) -> Dict[str, Tuple[int, bytes]]:
-    chunks: Dict[str, Tuple[int, bytes]] = {}
-    for offset in _read_chunk_offsets(data):
-        tag = data[offset : offset + 4].decode("ascii")
-        size = struct.unpack_from("<I", data, offset + 4)[0]
-        payload = data[offset + 8 : offset + 8 + size]
-        if tag in chunks:
-            logging.warning("Duplicate chunk tag %s detected, keeping last occurrence", tag)
-        chunks[tag] = (offset, payload)
-    return chunks
-
-
-def _extract_bitcode(dxil_chunk: bytes) -> bytes:
+# dxc argument sets tried in order until one produces output.
+DEFAULT_DXC_ARG_SETS: Tuple[Tuple[str, ...], ...] = (("-dumpbin",), ("-dumpbin", "-dxil"), ("-dumpbin", "-all"))
+
+
+# Scheduler for dxc calls made without an explicit one, e.g. through the in-memory API.
+DEFAULT_TOOLS = ToolScheduler()
+
+_CONTAINER_HEADER = struct.Struct("<4s16sHHII")  # magic, digest, major, minor, total size, chunk count
+_CHUNK_HEADER = struct.Struct("<4sI")  # tag, payload size
+_PROGRAM_VERSION = struct.Struct("<I")  # shader kind << 16 | model major << 4 | model minor
+_BITCODE_HEADER = struct.Struct("<4sIII")  # "DXIL", DXIL version, bitcode offset (from this header), bitcode size
+_BITCODE_HEADER_OFFSET = 8  # after the program version and size in dwords
+
+
+class DxbcContainer:
+    """A DXBC container validated once and read in place; chunks are returned as views, the last of a repeated tag."""
+
+    __slots__ = ("data", "_chunks")
+
+    def __init__(self, data: bytes | bytearray | memoryview, label: object = "DXBC container") -> None:
+        view = memoryview(data).cast("B")
+        if len(view) < _CONTAINER_HEADER.size or view[:4] != DXBC_MAGIC:
+            raise ValueError(f"Input is not a DXBC container: {label}")
+        total_size, count = struct.unpack_from("<II", view, 24)
+        if total_size > len(view):
+            raise ValueError(f"DXBC container {label} is truncated: {len(view)} of {total_size} bytes present")
+        table_end = _CONTAINER_HEADER.size + 4 * count
+        if table_end > len(view):
+            raise ValueError(f"DXBC container {label} declares {count} chunks, more than its {len(view)} bytes hold")
+
+        chunks: Dict[bytes, Tuple[int, int]] = {}
+        for offset in struct.unpack_from(f"<{count}I", view, _CONTAINER_HEADER.size):
+            if offset < table_end or offset + _CHUNK_HEADER.size > len(view):
+                raise ValueError(f"DXBC container {label} has a chunk offset {offset} outside the container")
+            tag, size = _CHUNK_HEADER.unpack_from(view, offset)
+            start = offset + _CHUNK_HEADER.size
+            if start + size > len(view):
+                raise ValueError(f"DXBC container {label} has a {size}-byte chunk at {offset} running past its end")
+            if tag in chunks:
+                duplicate = tag.decode("ascii", "replace")
+                logging.warning("Duplicate chunk tag %s detected, keeping last occurrence", duplicate)
+            chunks[tag] = (start, size)
+        self.data = view
+        self._chunks = chunks
+
+    def __contains__(self, tag: str) -> bool:
+        return tag.encode("ascii") in self._chunks
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def tags(self) -> List[str]:
+        return [tag.decode("ascii", "replace") for tag in self._chunks]
+
+    def chunk(self, tag: str) -> memoryview | None:
+        """Payload of the chunk tagged ``tag`` (e.g. ``"DXIL"``) as a view into the container, or None."""
+        location = self._chunks.get(tag.encode("ascii"))
+        if location is None:
+            return None
+        start, size = location
+        return self.data[start : start + size]
+
+
+def _extract_bitcode(dxil_chunk: bytes | memoryview) -> bytes:
     if len(dxil_chunk) < 24:
         raise ValueError("DXIL chunk too small to contain header")
-    if dxil_chunk[8:12] != DXIL_SIGNATURE:
+    signature, _, bitcode_offset, declared_size = _BITCODE_HEADER.unpack_from(dxil_chunk, _BITCODE_HEADER_OFFSET)
+    if signature != DXIL_SIGNATURE:
         raise ValueError("Malformed DXIL chunk: missing DXIL signature")
 
-    declared_size = struct.unpack_from("<I", dxil_chunk, 20)[0]
-    bitcode_start = dxil_chunk.find(BITCODE_MAGIC)
-    if bitcode_start == -1:
-        raise ValueError("Bitcode magic not found inside DXIL chunk")
+    # The header says where the bitcode starts; only search for its magic when that does not hold up.
+    bitcode_start = _BITCODE_HEADER_OFFSET + bitcode_offset
+    if dxil_chunk[bitcode_start : bitcode_start + len(BITCODE_MAGIC)] != BITCODE_MAGIC:
+        bitcode_start = bytes(dxil_chunk).find(BITCODE_MAGIC)
+        if bitcode_start == -1:
+            raise ValueError("Bitcode magic not found inside DXIL chunk")
 
-    bitcode = dxil_chunk[bitcode_start : bitcode_start + declared_size]
+    bitcode = bytes(dxil_chunk[bitcode_start : bitcode_start + declared_size])
     if len(bitcode) != declared_size:
         raise ValueError("DXIL chunk truncated before bitcode ended")
     return bitcode
@@ -52,86 +107,155 @@ def _extract_bitcode(dxil_chunk: bytes) -> bytes:
 
 def _write_bytes(path: Path, payload: bytes) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_bytes(payload)
+    write_atomic(path, payload)
     logging.info("Wrote %s (%s bytes)", path, len(payload))
 
 
-def _run_tool(exe: str, args: Iterable[str], capture: bool = True) -> str | bool | None:
-    cmd = [exe, *args]
-    logging.debug("Running %s", " ".join(cmd))
-    try:
-        completed = subprocess.run(cmd, check=True, capture_output=capture, text=True)
-    except FileNotFoundError:
-        logging.warning("Tool %s not found on PATH", exe)
-        return None
-    except subprocess.CalledProcessError as err:
-        logging.error("Tool %s failed: %s", exe, err)
+def _outputs_exist(label: object, ir_path: Path, dxil_path: Path, emit_ir: bool) -> bool:
+    if emit_ir and ir_path.exists():
+        logging.info("Skipping %s because %s already exists", label, ir_path)
+        return True
+
+    if not emit_ir and dxil_path.exists():
+        logging.info("DXIL already extracted: %s", dxil_path)
+        return True
+    return False
+
+
+def _disassemble(
+    data: bytes | memoryview,
+    source_path: Path | None,
+    dxc: str,
+    dxc_arg_sets: Iterable[Iterable[str]],
+    label: str,
+    group: str,
+    tools: ToolScheduler,
+    ir_path: Path | None = None,
+) -> str | bool | None:
+    """Try dxc per argument set until one succeeds: its text, True once written to ``ir_path``, or None."""
+    if source_path is None:
+        # dxc only reads containers from disk, so stage the in-memory blob for the duration of the attempts.
+        handle = tempfile.NamedTemporaryFile(suffix=".dxbc", delete=False)
+        try:
+            with handle:
+                handle.write(data)
+            return _disassemble(data, Path(handle.name), dxc, dxc_arg_sets, label, group, tools, ir_path)
+        finally:
+            Path(handle.name).unlink(missing_ok=True)
+
+    learned = dxc_arg_sets if isinstance(dxc_arg_sets, ArgSetOrder) else None
+    for arg_set in learned.attempts(group) if learned is not None else dxc_arg_sets:
+        pretty = " ".join(arg_set)
+        logging.info("Trying dxc disassembly with args: %s", pretty)
+        run, output = tools.run([dxc, *arg_set, str(source_path)], label, ir_path, group, arg_set_key(arg_set))
+        if learned is not None and run.status in ("ok", "failed"):
+            learned.record(group, arg_set, run.status == "ok")
+        if run.status == "ok":
+            return output if ir_path is None else True
+        if run.status in ("timeout", "missing"):
+            # The remaining argument sets would only hang or be missing the same way.
+            break
+    return None
+
+
+def _dump_ir(
+    data: bytes | memoryview,
+    source_path: Path | None,
+    dxc: str | None,
+    dxc_arg_sets: Iterable[Iterable[str]],
+    label: str,
+    group: str,
+    tools: ToolScheduler,
+    ir_path: Path | None = None,
+) -> str | bool | None:
+    if not dxc:
+        logging.warning("Skipping textual IR dump because dxc was not found on PATH")
         return None
-    if capture:
-        return completed.stdout
-    return True
+    output = _disassemble(data, source_path, dxc, dxc_arg_sets, label, group, tools, ir_path)
+    if output is None:
+        logging.warning(
+            "Unable to emit textual IR automatically via dxc. Consider passing explicit --dxc-args or --skip-ir."
+        )
+    return output
 
 
-def _emit_ir_with_dxc(dxbc_path: Path, ir_path: Path, dxc: str, dxc_args: Iterable[str]) -> bool:
-    output = _run_tool(dxc, [*dxc_args, str(dxbc_path)])
-    if not output:
-        return False
-    ir_path.write_text(output)
-    logging.info("Captured dxc textual output: %s", ir_path)
-    return True
+class DxilArtifacts(NamedTuple):
+    bitcode: bytes
+    ir_text: Optional[str]  # None unless IR was requested and dxc produced it
 
 
-def extract_dxil(
-    dxbc_path: Path,
+def _bitcode_of(data: bytes | bytearray | memoryview, name: str) -> Tuple[bytes, str]:
+    """Return the DXIL bitcode of a container and the class (e.g. ``ps_6_6``) of its shader."""
+    # Pooled blobs from the splitter arrive as views; only the bitcode is copied out, so it outlives the view.
+    payload = DxbcContainer(data, name).chunk("DXIL")
+    if not payload:
+        raise ValueError("DXIL chunk not found in container")
+
+    try:
+        bitcode = _extract_bitcode(payload)
+    except ValueError as err:
+        raise ValueError(f"Failed to extract DXIL bitcode: {err}") from err
+    return bitcode, shader_class(_PROGRAM_VERSION.unpack_from(payload)[0])
+
+
+def extract_dxil_buffer(
+    data: bytes | bytearray | memoryview,
+    name: str,
+    dxc: str | None = None,
+    dxc_arg_sets: Iterable[Iterable[str]] = DEFAULT_DXC_ARG_SETS,
+    emit_ir: bool = False,
+    source_path: Path | None = None,
+    tools: ToolScheduler | None = None,
+) -> DxilArtifacts:
+    """Return the DXIL bitcode (and with ``emit_ir`` the dxc IR) of an in-memory DXBC container; raises ValueError."""
+    bitcode, group = _bitcode_of(data, name)
+    ir_text = None
+    if emit_ir:
+        output = _dump_ir(data, source_path, dxc, dxc_arg_sets, name, group, tools or DEFAULT_TOOLS)
+        ir_text = output if isinstance(output, str) else None
+    return DxilArtifacts(bitcode, ir_text)
+
+
+def extract_dxil_blob(
+    data: bytes | memoryview,
+    base_name: str,
     out_dir: Path,
     dxc: str | None,
     dxc_arg_sets: Iterable[Iterable[str]],
     emit_ir: bool,
+    source_path: Path | None = None,
+    tools: ToolScheduler | None = None,
 ) -> None:
-    base_name = dxbc_path.stem
+    """``extract_dxil_buffer`` writing ``<base_name>.dxil`` / ``<base_name>.dxil_ir.txt`` under ``out_dir``."""
     ir_path = out_dir / f"{base_name}.dxil_ir.txt"
     dxil_path = out_dir / f"{base_name}.dxil"
+    label = source_path or base_name
 
-    if emit_ir and ir_path.exists():
-        logging.info("Skipping %s because %s already exists", dxbc_path, ir_path)
+    if _outputs_exist(label, ir_path, dxil_path, emit_ir):
         return
 
-    if not emit_ir and dxil_path.exists():
-        logging.info("DXIL already extracted: %s", dxil_path)
-        return
-
-    data = dxbc_path.read_bytes()
-    if data[:4] != DXBC_MAGIC:
-        raise ValueError(f"Input is not a DXBC container: {dxbc_path}")
+    bitcode, group = _bitcode_of(data, str(label))
+    _write_bytes(dxil_path, bitcode)
+    if emit_ir and _dump_ir(data, source_path, dxc, dxc_arg_sets, base_name, group, tools or DEFAULT_TOOLS, ir_path):
+        logging.info("Captured dxc textual output: %s", ir_path)
 
-    chunks = _parse_chunks(data)
-    dxil_chunk = chunks.get("DXIL")
-    if not dxil_chunk:
-        raise ValueError("DXIL chunk not found in container")
 
-    _, payload = dxil_chunk
-    try:
-        bitcode = _extract_bitcode(payload)
-    except ValueError as err:
-        raise ValueError(f"Failed to extract DXIL bitcode: {err}") from err
+def extract_dxil(
+    dxbc_path: Path,
+    out_dir: Path,
+    dxc: str | None,
+    dxc_arg_sets: Iterable[Iterable[str]],
+    emit_ir: bool,
+    tools: ToolScheduler | None = None,
+) -> None:
+    base_name = dxbc_path.stem
+    ir_path = out_dir / f"{base_name}.dxil_ir.txt"
+    dxil_path = out_dir / f"{base_name}.dxil"
 
-    _write_bytes(dxil_path, bitcode)
+    if _outputs_exist(dxbc_path, ir_path, dxil_path, emit_ir):
+        return
 
-    if emit_ir:
-        if not dxc:
-            logging.warning("Skipping textual IR dump because dxc was not found on PATH")
-            return
-        ir_generated = False
-        for arg_set in dxc_arg_sets:
-            pretty = " ".join(arg_set)
-            logging.info("Trying dxc disassembly with args: %s", pretty)
-            ir_generated = _emit_ir_with_dxc(dxbc_path, ir_path, dxc, arg_set)
-            if ir_generated:
-                break
-        if not ir_generated:
-            logging.warning(
-                "Unable to emit textual IR automatically via dxc. Consider passing explicit --dxc-args or --skip-ir."
-            )
+    extract_dxil_blob(dxbc_path.read_bytes(), base_name, out_dir, dxc, dxc_arg_sets, emit_ir, dxbc_path, tools)
 
 
 def _gather_inputs(root: Path, pattern: str) -> Sequence[Path]:
@@ -139,6 +263,35 @@ def _gather_inputs(root: Path, pattern: str) -> Sequence[Path]:
     return files
 
 
+def _extract_into(
+    dxbc_path: Path,
+    out_dir: Path | None,
+    dxc: str | None,
+    dxc_arg_sets: Iterable[Iterable[str]],
+    emit_ir: bool,
+    tools: ToolScheduler,
+) -> None:
+    target_dir = out_dir or dxbc_path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    extract_dxil(dxbc_path, target_dir, dxc, dxc_arg_sets, emit_ir, tools)
+
+
+def _waves(paths: Sequence[Path], out_dir: Path | None) -> List[List[Path]]:
+    """Group ``paths`` so no two inputs of a group share an output stem under a common ``out_dir``."""
+    if out_dir is None:
+        return [list(paths)]
+    # A collision in a later group sees the earlier input's outputs and skips itself, as in a serial run.
+    seen: Counter[str] = Counter()
+    waves: List[List[Path]] = []
+    for path in paths:
+        wave = seen[path.stem]
+        seen[path.stem] += 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(path)
+    return waves
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Extract DXIL chunks and emit dxc textual dumps")
     parser.add_argument(
@@ -172,6 +325,44 @@ def main() -> None:
         action="store_true",
         help="Skip attempts to produce human-readable IR (default is to emit IR when tooling is available)",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Inputs to extract in parallel with --input-dir, each in its own process (0 = one per CPU, "
+        "default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dxc-timeout",
+        type=float,
+        default=DEFAULT_TOOL_TIMEOUT,
+        help="Seconds before a dxc call is killed; 0 waits forever (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dxc-concurrency",
+        type=int,
+        default=0,
+        help="dxc processes allowed to run at once across all --jobs workers (0 = one per CPU, default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fixed-dxc-order",
+        action="store_true",
+        help="Always try the dxc argument sets in their given order instead of the order learned per shader class",
+    )
+    parser.add_argument(
+        "--arg-stats",
+        type=Path,
+        default=None,
+        help="File the learned dxc argument order is kept in across runs (default: dxc_arg_stats.json in --out-dir; "
+        "without either the order is only learned for this run)",
+    )
+    parser.add_argument(
+        "--tool-log",
+        type=Path,
+        default=None,
+        help="Write the exit code and duration of every dxc call to this TSV file",
+    )
+    add_filter_arguments(parser)
     parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
     args = parser.parse_args()
 
@@ -206,31 +397,73 @@ def main() -> None:
             raise SystemExit(f"Input file does not exist: {dxbc_path}")
         target_paths = [dxbc_path]
 
+    part_filter = filter_from_args(args)
+    if part_filter is not None:
+        # Split parts are selected by their <stem>_partNNNN name and file size, before anything is read.
+        selected = [path for path in target_paths if part_filter.selects_path(path)]
+        logging.info("Selected %s of %s input(s)", len(selected), len(target_paths))
+        if not selected:
+            logging.warning("No inputs match the part filters")
+            return
+        target_paths = selected
+
     out_dir_override = args.out_dir
     if out_dir_override:
         out_dir_override.mkdir(parents=True, exist_ok=True)
 
     dxc = args.dxc or shutil.which("dxc")
 
-    if args.dxc_args is None:
-        dxc_arg_sets = (["-dumpbin"], ["-dumpbin", "-dxil"], ["-dumpbin", "-all"])
-    else:
-        dxc_arg_sets = (args.dxc_args,)
+    dxc_arg_sets: Iterable[Iterable[str]] = DEFAULT_DXC_ARG_SETS if args.dxc_args is None else (args.dxc_args,)
+    # Learned argument order lives next to the outputs, like the artifacts it helped produce, never in the input tree.
+    stats_path = args.arg_stats or (stats_path_for(out_dir_override) if out_dir_override else None)
+    if not args.fixed_dxc_order:
+        dxc_arg_sets = ArgSetOrder.load(dxc_arg_sets, stats_path) if stats_path else ArgSetOrder(dxc_arg_sets)
 
     emit_ir = not args.skip_ir
 
-    iterator = tqdm(target_paths, desc="DXBC caches", unit="file") if multi_mode else target_paths
-    for dxbc_path in iterator:
-        if out_dir_override:
-            out_dir = out_dir_override
-        else:
-            out_dir = dxbc_path.parent
-        out_dir.mkdir(parents=True, exist_ok=True)
-        try:
-            extract_dxil(dxbc_path, out_dir, dxc, dxc_arg_sets, emit_ir)
-        except ValueError as err:
-            logging.error("Failed to process %s: %s", dxbc_path, err)
-            continue
+    # Nearly all the time goes to waiting on dxc, so inputs are fanned out to worker processes as a whole.
+    if args.dxc_concurrency < 0:
+        raise SystemExit(f"--dxc-concurrency must be >= 0, got {args.dxc_concurrency}")
+    jobs = min(resolve_jobs(args.jobs), len(target_paths))
+    invalid = 0
+    crashed = 0
+    with shared_tool_log(args.tool_log) as tool_log:
+        tools = ToolScheduler(args.dxc_concurrency, args.dxc_timeout or None, tool_log)
+        initializer, initargs = tools.pool_initializer()
+        worker = partial(
+            _extract_into,
+            out_dir=out_dir_override,
+            dxc=dxc,
+            dxc_arg_sets=dxc_arg_sets,
+            emit_ir=emit_ir,
+            tools=tools,
+        )
+        with tqdm(total=len(target_paths), desc="DXBC caches", unit="file", disable=not multi_mode) as progress:
+            for wave in _waves(target_paths, out_dir_override):
+                for dxbc_path, _, error in run_per_file(worker, wave, jobs, initializer, initargs):
+                    progress.update()
+                    if isinstance(error, ValueError):
+                        logging.error("Failed to process %s: %s", dxbc_path, error)
+                        invalid += 1
+                    elif error is not None:
+                        logging.error("Failed to process %s: %s: %s", dxbc_path, type(error).__name__, error)
+                        crashed += 1
+        tools.close()
+        tool_runs = read_tool_log(tool_log)
+    log_tool_summary(tool_runs)
+    if isinstance(dxc_arg_sets, ArgSetOrder) and stats_path is not None:
+        save_learned(dxc_arg_sets.arg_sets, stats_path, tool_runs)
+
+    if invalid or crashed:
+        logging.warning(
+            "%s of %s input(s) failed: %s without extractable DXIL, %s with other errors",
+            invalid + crashed,
+            len(target_paths),
+            invalid,
+            crashed,
+        )
+    if crashed:
+        raise SystemExit(f"{crashed} input(s) failed unexpectedly; see the log above")
 
 
 if __name__ == "__main__":
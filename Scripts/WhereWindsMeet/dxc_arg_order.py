@@ -0,0 +1,161 @@
+"""Learned per-shader-class order of the dxc argument sets, kept across runs in ``dxc_arg_stats.json``."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tool_scheduler import ToolRun
+
+# The first set that succeeds decides the dump, so a learned order can change a shader's IR text between runs.
+STATS_NAME = "dxc_arg_stats.json"
+STATS_VERSION = 1
+# Failures without a single success after which a set is skipped for a shader class.
+SKIP_AFTER_FAILURES = 16
+# Every this many shaders of a class, skipped sets are tried again.
+PROBE_INTERVAL = 64
+# DXIL program kinds, indexed by the upper half of the program version.
+_SHADER_KINDS = (
+    "ps",
+    "vs",
+    "gs",
+    "hs",
+    "ds",
+    "cs",
+    "lib",
+    "raygen",
+    "intersection",
+    "anyhit",
+    "closesthit",
+    "miss",
+    "callable",
+    "ms",
+    "as",
+)
+
+ArgSet = Tuple[str, ...]
+_PROCESS_ORDERS: Dict[Tuple[ArgSet, ...], "ArgSetOrder"] = {}
+_PROCESS_ORDERS_LOCK = threading.Lock()
+
+
+def stats_path_for(output_root: Path) -> Path:
+    return output_root / STATS_NAME
+
+
+def shader_class(program_version: int) -> str:
+    """Class name such as ``ps_6_6`` for the program version dword at the start of a DXIL chunk."""
+    kind = program_version >> 16
+    name = _SHADER_KINDS[kind] if kind < len(_SHADER_KINDS) else f"kind{kind}"
+    return f"{name}_{(program_version >> 4) & 0xF}_{program_version & 0xF}"
+
+
+def arg_set_key(arg_set: Iterable[str]) -> str:
+    """The name an argument set is counted and logged under (its arguments, space-joined)."""
+    return " ".join(arg_set)
+
+
+class ArgSetOrder:
+    """dxc argument sets with per-shader-class outcome counts; iterates as the sets in their given order."""
+
+    def __init__(
+        self, arg_sets: Iterable[Iterable[str]], counts: Optional[Dict[str, Dict[str, List[int]]]] = None
+    ) -> None:
+        self.arg_sets: List[ArgSet] = [tuple(arg_set) for arg_set in arg_sets]
+        # shader class -> argument set (space-joined) -> [successes, failures]
+        self.counts: Dict[str, Dict[str, List[int]]] = counts if counts is not None else {}
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[ArgSet]:
+        return iter(self.arg_sets)
+
+    def __reduce__(self) -> Tuple[object, Tuple[List[ArgSet], Dict[str, Dict[str, List[int]]]]]:
+        return process_order, (self.arg_sets, self.counts)
+
+    @classmethod
+    def load(cls, arg_sets: Iterable[Iterable[str]], path: Path) -> "ArgSetOrder":
+        """The sets with the counts saved at ``path`` by earlier runs, if any."""
+        try:
+            document = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            document = {}
+        except (OSError, ValueError) as err:
+            logging.warning("Ignoring unreadable dxc argument statistics %s: %s", path, err)
+            document = {}
+        counts = document.get("classes", {}) if document.get("version") == STATS_VERSION else {}
+        return cls(arg_sets, counts)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        document = {"version": STATS_VERSION, "classes": self.counts}
+        tmp_path.write_text(json.dumps(document, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def attempts(self, shader_class: str) -> List[ArgSet]:
+        """The sets to try for the next shader of ``shader_class``, most successful first, without skipped ones."""
+        with self._lock:
+            seen = self._seen[shader_class] = self._seen.get(shader_class, 0) + 1
+            counts = {key: tuple(outcome) for key, outcome in self.counts.get(shader_class, {}).items()}
+        probe = seen % PROBE_INTERVAL == 0
+        ordered = []
+        for arg_set in self.arg_sets:
+            successes, failures = counts.get(arg_set_key(arg_set), (0, 0))
+            if successes or failures < SKIP_AFTER_FAILURES or probe:
+                ordered.append(arg_set)
+
+        def rate(arg_set: ArgSet) -> float:
+            successes, failures = counts.get(arg_set_key(arg_set), (0, 0))
+            # Smoothed, so untried sets rank between ones that work and ones that do not; ties keep the given order.
+            return (successes + 1) / (successes + failures + 2)
+
+        return sorted(ordered, key=rate, reverse=True)
+
+    def record(self, shader_class: str, arg_set: Iterable[str], succeeded: bool) -> None:
+        self.record_key(shader_class, arg_set_key(arg_set), succeeded)
+
+    def record_key(self, shader_class: str, key: str, succeeded: bool) -> None:
+        with self._lock:
+            outcome = self.counts.setdefault(shader_class, {}).setdefault(key, [0, 0])
+            outcome[0 if succeeded else 1] += 1
+
+    def learn(self, runs: Iterable[ToolRun]) -> None:
+        """Count the dxc calls in ``runs`` (e.g. read back from a tool log) made with one of the sets."""
+        known = {arg_set_key(arg_set) for arg_set in self.arg_sets}
+        for run in runs:
+            # A timed-out or missing dxc says nothing about the arguments it was given.
+            if run.group and run.variant in known and run.status in ("ok", "failed"):
+                self.record_key(run.group, run.variant, run.status == "ok")
+
+    def log_summary(self) -> None:
+        for name, outcomes in sorted(self.counts.items()):
+            described = []
+            for arg_set in self.arg_sets:
+                successes, failures = outcomes.get(arg_set_key(arg_set), (0, 0))
+                skipped = " skipped" if not successes and failures >= SKIP_AFTER_FAILURES else ""
+                described.append(f"[{arg_set_key(arg_set)}] {successes}/{successes + failures} ok{skipped}")
+            logging.info("dxc arguments for %s: %s", name, ", ".join(described))
+
+
+def process_order(arg_sets: Iterable[Iterable[str]], counts: Dict[str, Dict[str, List[int]]]) -> ArgSetOrder:
+    """The order of these argument sets shared by this whole process, starting from ``counts`` when first made."""
+    key = tuple(tuple(arg_set) for arg_set in arg_sets)
+    with _PROCESS_ORDERS_LOCK:
+        order = _PROCESS_ORDERS.get(key)
+        if order is None:
+            order = _PROCESS_ORDERS[key] = ArgSetOrder(key, counts)
+        return order
+
+
+def save_learned(arg_sets: Iterable[Iterable[str]], path: Path, runs: Iterable[ToolRun]) -> None:
+    """Fold the dxc calls of a finished run into the counts saved at ``path``, then log the totals of every run."""
+    runs = list(runs)
+    if not any(run.group for run in runs):
+        return
+    order = ArgSetOrder.load(arg_sets, path)
+    order.learn(runs)
+    order.save(path)
+    order.log_summary()
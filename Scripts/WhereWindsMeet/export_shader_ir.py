@@ -10,6 +10,8 @@ from typing import List, Optional
 
 from tqdm import tqdm
 
+from output_layout import part_owner
+
 ENTRYPOINT_REF_RE = re.compile(r"!dx\.entryPoints\s*=\s*!{!(\d+)}")
 STRING_RE = re.compile(r'!"([^"]+)"')
 PART_ID_RE = re.compile(r"(part\d+)", re.IGNORECASE)
@@ -113,7 +115,8 @@ def main() -> None:
             continue
 
         part_id = extract_part_id(ir_path)
-        folder_name = ir_path.parent.name
+        # Named after the cache rather than the parent directory, which is a shard in the sharded layout.
+        folder_name = part_owner(ir_path)
         safe_name = sanitize_name(entry_name)
 
         dest_dir = args.output_root / folder_name
@@ -0,0 +1,177 @@
+"""Opt-in pooled output buffers for the splitter's LZ4 hot loop (``--pooled-lz4``); python-lz4 is the default."""
+from __future__ import annotations
+
+import ctypes
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import lz4.block
+import lz4.block._block
+
+# Smallest buffer handed out; every size class is a power of two from here up.
+MIN_BUFFER_SIZE = 64 * 1024
+# Idle buffers a pool keeps in total before letting released ones go to the garbage collector.
+MAX_RETAINED_BYTES = 256 * 1024 * 1024
+_INT_MAX = 2**31 - 1
+_PyBUF_SIMPLE = 0
+_PyBUF_WRITABLE = 1
+# Shared library names of a system liblz4, tried after the ``lz4`` package's own extension module.
+_LIBRARY_NAMES = ("liblz4.so.1", "liblz4.1.dylib", "liblz4.dll", "lz4.dll")
+
+
+class _PyBuffer(ctypes.Structure):
+    _fields_ = [
+        ("buf", ctypes.c_void_p),
+        ("obj", ctypes.c_void_p),
+        ("len", ctypes.c_ssize_t),
+        ("itemsize", ctypes.c_ssize_t),
+        ("readonly", ctypes.c_int),
+        ("ndim", ctypes.c_int),
+        ("format", ctypes.c_char_p),
+        ("shape", ctypes.c_void_p),
+        ("strides", ctypes.c_void_p),
+        ("suboffsets", ctypes.c_void_p),
+        ("internal", ctypes.c_void_p),
+    ]
+
+
+def _find_decoder() -> Tuple[Optional[ctypes._CFuncPtr], str]:
+    """Return ``LZ4_decompress_safe`` and where it came from, or (None, why not)."""
+    if getattr(ctypes, "pythonapi", None) is None:
+        return None, "not running on CPython"
+    # Loading by name only: ctypes.util.find_library would spawn ldconfig or a compiler to search.
+    for library in (lz4.block._block.__file__, *_LIBRARY_NAMES):
+        try:
+            return ctypes.CDLL(library).LZ4_decompress_safe, library
+        except (OSError, AttributeError):
+            continue
+    return None, "no loadable library exports LZ4_decompress_safe"
+
+
+def _agrees_with_python_lz4(decoder: ctypes._CFuncPtr) -> bool:
+    sample = bytes(range(256)) * 64 + b"shader" * 512
+    block = lz4.block.compress(sample, store_size=False)
+    buffer = bytearray(len(sample) + 16)
+    with _pinned(block, _PyBUF_SIMPLE) as (src, src_len), _pinned(buffer, _PyBUF_WRITABLE) as (dst, _):
+        decoded = decoder(src, dst, src_len, len(sample))
+        corrupt = decoder(src, dst, src_len, len(sample) // 2)
+    return decoded == len(sample) and bytes(buffer[:decoded]) == sample and corrupt < 0 and not any(buffer[-16:])
+
+
+def _load_decoder() -> Optional[ctypes._CFuncPtr]:
+    decoder, source = _find_decoder()
+    if decoder is not None:
+        decoder.argtypes = (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int)
+        decoder.restype = ctypes.c_int
+        ctypes.pythonapi.PyObject_GetBuffer.argtypes = (ctypes.py_object, ctypes.POINTER(_PyBuffer), ctypes.c_int)
+        ctypes.pythonapi.PyBuffer_Release.argtypes = (ctypes.POINTER(_PyBuffer),)
+        if not _agrees_with_python_lz4(decoder):
+            decoder, source = None, f"LZ4_decompress_safe from {source} disagrees with python-lz4"
+    if decoder is None:
+        logging.info("LZ4 decoder: lz4.block.decompress (%s); blocks are not decoded into pooled buffers", source)
+        return None
+    logging.info("LZ4 decoder: LZ4_decompress_safe from %s, into pooled buffers", source)
+    return decoder
+
+
+_DECODER: Optional[ctypes._CFuncPtr] = None
+_DECODER_LOADED = False
+_DECODER_LOCK = threading.Lock()
+
+
+def _decoder() -> Optional[ctypes._CFuncPtr]:
+    """The ctypes decoder, loaded on first use."""
+    global _DECODER, _DECODER_LOADED
+    if not _DECODER_LOADED:
+        with _DECODER_LOCK:
+            if not _DECODER_LOADED:
+                _DECODER = _load_decoder()
+                _DECODER_LOADED = True
+    return _DECODER
+
+
+@contextmanager
+def _pinned(obj: object, flags: int) -> Iterator[Tuple[int, int]]:
+    """Yield (address, length) of a contiguous buffer, holding an export on it for the duration."""
+    view = _PyBuffer()
+    ctypes.pythonapi.PyObject_GetBuffer(obj, ctypes.byref(view), flags)
+    try:
+        yield view.buf, view.len
+    finally:
+        ctypes.pythonapi.PyBuffer_Release(ctypes.byref(view))
+
+
+def size_class(size: int) -> int:
+    return max(MIN_BUFFER_SIZE, 1 << (size - 1).bit_length())
+
+
+class BufferPool:
+    """Thread-safe free lists of ``bytearray`` buffers, one per power-of-two size class."""
+
+    def __init__(self, max_retained: int = MAX_RETAINED_BYTES) -> None:
+        self.max_retained = max_retained
+        self._free: Dict[int, List[bytearray]] = {}
+        self._retained = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pooled(self) -> bool:
+        """Whether :meth:`decompress` decodes into pooled buffers (liblz4 available) or returns fresh bytes."""
+        return _decoder() is not None
+
+    def acquire(self, size: int) -> bytearray:
+        capacity = size_class(size)
+        with self._lock:
+            free = self._free.get(capacity)
+            if free:
+                self._retained -= capacity
+                return free.pop()
+        return bytearray(capacity)
+
+    def release(self, buffer: bytearray) -> None:
+        capacity = len(buffer)
+        if capacity != size_class(capacity):
+            return
+        with self._lock:
+            if self._retained + capacity > self.max_retained:
+                return
+            self._free.setdefault(capacity, []).append(buffer)
+            self._retained += capacity
+
+    def trim(self, max_retained: int) -> None:
+        """Lower the retention limit, dropping idle buffers (largest first) until the pool fits under it."""
+        with self._lock:
+            self.max_retained = max_retained
+            for capacity in sorted(self._free, reverse=True):
+                free = self._free[capacity]
+                while free and self._retained > max_retained:
+                    free.pop()
+                    self._retained -= capacity
+
+    def recycle(self, payload: bytes | memoryview | None) -> None:
+        """Release a payload from :meth:`decompress` and return its buffer to the pool; plain ``bytes`` are ignored."""
+        if not isinstance(payload, memoryview) or not isinstance(payload.obj, bytearray):
+            return
+        buffer = payload.obj
+        try:
+            payload.release()
+        except BufferError:
+            # Something still exports the view; leave the buffer to the garbage collector.
+            return
+        self.release(buffer)
+
+    def decompress(self, compressed: bytes | memoryview, capacity: int) -> bytes | memoryview:
+        """Decode one LZ4 block of at most ``capacity`` bytes, as a pooled memoryview when liblz4 is available."""
+        decoder = _decoder()
+        if decoder is None or capacity > _INT_MAX or len(compressed) > _INT_MAX:
+            return lz4.block.decompress(compressed, uncompressed_size=capacity)
+
+        buffer = self.acquire(capacity)
+        with _pinned(compressed, _PyBUF_SIMPLE) as (src, src_len), _pinned(buffer, _PyBUF_WRITABLE) as (dst, _):
+            decoded = decoder(src, dst, src_len, capacity)
+        if decoded < 0:
+            self.release(buffer)
+            raise lz4.block.LZ4BlockError(f"Decompression failed: corrupt input or insufficient space ({decoded})")
+        return memoryview(buffer)[:decoded]
@@ -0,0 +1,91 @@
+"""Memory budget (``--max-memory``): an RSS ceiling for the whole run, split between its worker processes."""
+from __future__ import annotations
+
+import argparse
+import logging
+import mmap
+import re
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+# Smallest share a worker process gets; below it the interpreter and one in-flight chunk alone would not fit.
+MIN_WORKER_MEMORY = 256 * 1024 * 1024
+# Fractions of a process's share given to decompressed chunks in flight and to the idle buffer pool.
+IN_FLIGHT_SHARE = 4
+RETAINED_SHARE = 8
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+
+def parse_size(text: str) -> int:
+    """argparse type for sizes such as ``512M``, ``2G``, ``1.5GiB`` or a plain byte count."""
+    match = _SIZE_RE.match(text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}; expected e.g. 512M or 2G")
+    size = int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {text!r}")
+    return size
+
+
+def format_size(size: Optional[int]) -> str:
+    if size is None:
+        return "unavailable"
+    return f"{size / 1024**2:.0f} MiB"
+
+
+def plan_jobs(jobs: int, max_memory: Optional[int]) -> int:
+    """Cap a worker count so every worker gets at least ``MIN_WORKER_MEMORY`` of the budget."""
+    if max_memory is None:
+        return jobs
+    allowed = max(1, max_memory // MIN_WORKER_MEMORY)
+    if jobs > allowed:
+        logging.info("Memory budget %s allows %s parallel job(s) instead of %s", format_size(max_memory), allowed, jobs)
+        return allowed
+    return jobs
+
+
+def worker_share(max_memory: Optional[int], jobs: int) -> Optional[int]:
+    return None if max_memory is None else max_memory // max(1, jobs)
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process, or None where it cannot be sampled cheaply."""
+    try:
+        with open("/proc/self/statm", "rb") as handle:
+            return int(handle.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def over_budget(max_memory: Optional[int]) -> bool:
+    if max_memory is None:
+        return False
+    rss = current_rss()
+    return rss is not None and rss > max_memory
+
+
+def _max_rss(who: int) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def log_peak_rss(max_memory: Optional[int], jobs: int = 1) -> None:
+    """Report the measured peak RSS of this process and of its largest finished child (worker or tool) process."""
+    own = _max_rss(resource.RUSAGE_SELF) if resource is not None else None
+    children = _max_rss(resource.RUSAGE_CHILDREN) if resource is not None else None
+    if children:
+        logging.info("Peak RSS: %s (main process), %s (largest child)", format_size(own), format_size(children))
+    else:
+        logging.info("Peak RSS: %s", format_size(own))
+    share = worker_share(max_memory, jobs)
+    if share is not None and max(own or 0, children or 0) > share:
+        logging.warning("Peak RSS exceeded the %s per-process share of the memory budget", format_size(share))
@@ -0,0 +1,150 @@
+"""Flat or hash-sharded placement of loose per-part files under ``<output root>/<cache stem>/``."""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+from atomic_files import write_atomic
+from part_filter import parse_part_name
+
+LAYOUTS = ("flat", "sharded")
+LAYOUT_FILE = "output_layout.json"
+# Prefix directories per part; one level of 256 shards keeps tens of thousands of parts at a few hundred per shard.
+DEFAULT_SHARD_LEVELS = 1
+_PART_MARKER = ".cache_part"
+
+
+class OutputLayout(NamedTuple):
+    name: str = "flat"
+    levels: int = 0
+
+    def part_dir(self, cache_dir: Path, file_name: str) -> Path:
+        """Directory under ``cache_dir`` holding the part artifact ``file_name`` (or the part base name)."""
+        if not self.levels:
+            return cache_dir
+        parsed = parse_part_name(file_name)
+        if parsed is None:
+            return cache_dir
+        digest = hashlib.blake2b(f"{parsed[0]}_part{parsed[1]:04d}".encode(), digest_size=self.levels).hexdigest()
+        return cache_dir.joinpath(*(digest[level * 2 : level * 2 + 2] for level in range(self.levels)))
+
+    def part_path(self, cache_dir: Path, file_name: str) -> Path:
+        return self.part_dir(cache_dir, file_name) / file_name
+
+    def glob(self, cache_dir: Path, pattern: str) -> List[Path]:
+        """Part files matching ``pattern`` under ``cache_dir``, looking only where this layout puts them."""
+        return sorted(cache_dir.glob("/".join(["*"] * self.levels + [pattern])))
+
+
+FLAT = OutputLayout()
+
+
+def load_layout(output_root: Path) -> OutputLayout:
+    """The layout recorded for ``output_root``, or ``FLAT`` when none is recorded."""
+    try:
+        raw = json.loads((output_root / LAYOUT_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return FLAT
+    except (OSError, ValueError) as err:
+        raise SystemExit(f"Unreadable {LAYOUT_FILE} in {output_root}: {err}") from None
+    layout = OutputLayout(raw.get("layout", "flat"), int(raw.get("levels", 0)))
+    if layout.name not in LAYOUTS:
+        raise SystemExit(f"Unknown output layout {layout.name!r} in {output_root / LAYOUT_FILE}")
+    return layout
+
+
+def save_layout(output_root: Path, layout: OutputLayout) -> None:
+    marker = output_root / LAYOUT_FILE
+    if layout == FLAT:
+        marker.unlink(missing_ok=True)
+        return
+    output_root.mkdir(parents=True, exist_ok=True)
+    write_atomic(marker, json.dumps({"layout": layout.name, "levels": layout.levels}) + "\n", encoding="utf-8")
+
+
+def _cache_dirs(output_root: Path) -> Iterator[Path]:
+    if output_root.is_dir():
+        for entry in sorted(output_root.iterdir()):
+            if entry.is_dir() and entry.name != "objects":
+                yield entry
+
+
+def _holds_parts(cache_dir: Path, layout: OutputLayout) -> bool:
+    return any(_PART_MARKER in path.name for path in layout.glob(cache_dir, "*"))
+
+
+def resolve_layout(output_root: Path, requested: Optional[str]) -> OutputLayout:
+    """The layout a run writes with: the recorded one, or ``requested`` for a root without parts in another layout."""
+    current = load_layout(output_root)
+    if requested is None or requested == current.name:
+        return current
+    if any(_holds_parts(cache_dir, current) for cache_dir in _cache_dirs(output_root)):
+        raise SystemExit(
+            f"{output_root} already holds {current.name} outputs; migrate it with "
+            f"output_layout.py --output-dir {output_root} --to {requested} or drop --layout"
+        )
+    layout = OutputLayout(requested, DEFAULT_SHARD_LEVELS) if requested == "sharded" else FLAT
+    save_layout(output_root, layout)
+    return layout
+
+
+def part_owner(path: Path) -> str:
+    """Cache stem a part artifact belongs to, from its file name; falls back to its directory name."""
+    parsed = parse_part_name(path.name)
+    return parsed[0] if parsed is not None else path.parent.name
+
+
+def migrate(output_root: Path, target: OutputLayout) -> int:
+    """Move every part artifact under ``output_root`` into ``target``'s place for it; returns the files moved."""
+    current = load_layout(output_root)
+    moved = 0
+    for cache_dir in _cache_dirs(output_root):
+        for path in current.glob(cache_dir, "*"):
+            if not path.is_file() or parse_part_name(path.name) is None:
+                continue
+            destination = target.part_path(cache_dir, path.name)
+            if destination == path:
+                continue
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, destination)
+            moved += 1
+        # Drop shard directories the move emptied, deepest first.
+        for directory in sorted((p for p in cache_dir.rglob("*") if p.is_dir()), reverse=True):
+            if not any(directory.iterdir()):
+                directory.rmdir()
+    save_layout(output_root, target)
+    return moved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate an extraction output tree between flat and sharded layouts")
+    parser.add_argument("--output-dir", type=Path, required=True, help="Output root written by the splitter")
+    parser.add_argument("--to", choices=LAYOUTS, required=True, help="Layout to convert the tree to")
+    parser.add_argument(
+        "--levels",
+        type=int,
+        default=DEFAULT_SHARD_LEVELS,
+        help="Hex prefix directory levels for the sharded layout (default: %(default)s)",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s")
+
+    if not args.output_dir.is_dir():
+        raise SystemExit(f"Output directory not found: {args.output_dir}")
+    if args.to == "sharded" and not 1 <= args.levels <= 4:
+        raise SystemExit("--levels must be between 1 and 4")
+    target = OutputLayout("sharded", args.levels) if args.to == "sharded" else FLAT
+    moved = migrate(args.output_dir, target)
+    logging.info("Moved %s file(s); %s now uses the %s layout", moved, args.output_dir, target.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Part selection (``--parts``, ``--min-size``/``--max-size``, ``--sample``) shared by the splitter and extractors."""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+from pathlib import Path
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from memory_budget import parse_size
+
+_PART_NAME_RE = re.compile(r"^(?P<stem>.+)_part(?P<index>\d+)(?:\.|$)")
+_SAMPLE_SPACE = 2**64
+
+
+def parse_part_range(text: str) -> range:
+    """argparse type for a 1-based part number or inclusive range such as ``100-250``."""
+    match = re.fullmatch(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?", text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid part range {text!r}; expected e.g. 7 or 100-250")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if not 1 <= first <= last:
+        raise argparse.ArgumentTypeError(f"part range {text!r} must be ascending and start at 1 or later")
+    return range(first, last + 1)
+
+
+def parse_sample(text: str) -> float:
+    """argparse type for a sampling rate given as a percentage (``1%``) or a fraction (``0.01``)."""
+    try:
+        rate = float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid sample rate {text!r}; expected e.g. 1% or 0.01") from None
+    if not 0 < rate <= 1:
+        raise argparse.ArgumentTypeError(f"sample rate {text!r} must be above 0 and at most 100%")
+    return rate
+
+
+def parse_part_name(name: str) -> Optional[Tuple[str, int]]:
+    """Return (cache stem, part number) for names like ``<stem>_part0042.cache_part.lz4_decompressed``."""
+    match = _PART_NAME_RE.match(name)
+    return (match.group("stem"), int(match.group("index"))) if match else None
+
+
+class PartFilter(NamedTuple):
+    parts: Optional[Tuple[range, ...]] = None  # kept as ranges, so ``--parts 1-100000000`` costs nothing
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    sample: Optional[float] = None
+    seed: int = 0
+    skip: Optional[FrozenSet[int]] = None  # parts finished by an earlier run (see ``with_skipped``)
+
+    @property
+    def active(self) -> bool:
+        return any(value is not None for value in (self.parts, self.min_size, self.max_size, self.sample, self.skip))
+
+    def _sampled(self, cache_stem: str, index: int) -> bool:
+        digest = hashlib.blake2b(f"{self.seed}:{cache_stem}:{index}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") < self.sample * _SAMPLE_SPACE  # type: ignore[operator]
+
+    def selects(self, cache_stem: str, index: int, size: Optional[int]) -> bool:
+        """Whether part ``index`` of ``cache_stem``, declaring ``size`` bytes decompressed (None: unknown), is kept."""
+        if self.parts is not None and not any(index in part_range for part_range in self.parts):
+            return False
+        if self.skip is not None and index in self.skip:
+            return False
+        if self.min_size is not None or self.max_size is not None:
+            if size is None:
+                return False
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        return self.sample is None or self._sampled(cache_stem, index)
+
+    def selects_path(self, path: Path) -> bool:
+        """``selects`` for a split part on disk, identified by its file name and sized by the file itself."""
+        parsed = parse_part_name(path.name)
+        if parsed is None:
+            # Without a part number only the size filters can be applied; sample by file name instead.
+            if self.parts is not None:
+                return False
+            parsed = (path.name, 0)
+        size = path.stat().st_size if self.min_size is not None or self.max_size is not None else None
+        return self.selects(parsed[0], parsed[1], size)
+
+
+def with_skipped(part_filter: Optional[PartFilter], finished: FrozenSet[int]) -> Optional[PartFilter]:
+    """``part_filter`` additionally rejecting the ``finished`` parts (unchanged when there are none)."""
+    if not finished:
+        return part_filter
+    return (part_filter or PartFilter())._replace(skip=finished)
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add ``--parts``, ``--min-size``, ``--max-size``, ``--sample`` and ``--seed`` to ``parser``."""
+    parser.add_argument(
+        "--parts",
+        type=parse_part_range,
+        nargs="+",
+        default=None,
+        help="Only these 1-based part numbers or inclusive ranges, e.g. 7 100-250",
+    )
+    parser.add_argument(
+        "--min-size",
+        type=parse_size,
+        default=None,
+        help="Skip parts whose declared decompressed size is below this many bytes (e.g. 16K)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=parse_size,
+        default=None,
+        help="Skip parts whose declared decompressed size is above this many bytes (e.g. 1M)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=parse_sample,
+        default=None,
+        help="Keep a deterministic random share of the selected parts, e.g. 1%% or 0.05",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --sample (default: %(default)s)")
+
+
+def filter_from_args(args: argparse.Namespace) -> Optional[PartFilter]:
+    """Build the ``PartFilter`` described by ``add_filter_arguments`` options, or None when nothing is filtered."""
+    parts = tuple(args.parts) if args.parts else None
+    part_filter = PartFilter(parts, args.min_size, args.max_size, args.sample, args.seed)
+    if part_filter.min_size is not None and part_filter.max_size is not None:
+        if part_filter.min_size > part_filter.max_size:
+            raise SystemExit("--min-size must not exceed --max-size")
+    return part_filter if part_filter.active else None
@@ -0,0 +1,104 @@
+"""Per-cache journal of finished part stages, so an interrupted run can continue where it stopped (``--resume``)."""
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import Collection, Dict, FrozenSet, Optional, Set, TextIO, Tuple
+
+from atomic_files import write_atomic
+
+JOURNAL_SUFFIX = ".journal.tsv"
+# "dxil" is recorded only for parts whose extraction succeeded, so a resumed run retries the failures.
+STAGES = ("split", "dxil")
+# Entries buffered before the journal file is flushed.
+FLUSH_EVERY = 64
+_HEADER_PREFIX = "#cache\t"
+
+
+def journal_path_for(cache_stem: str, output_root: Path) -> Path:
+    return output_root / f"{cache_stem}{JOURNAL_SUFFIX}"
+
+
+def _cache_signature(cache_path: Path) -> str:
+    stat = cache_path.stat()
+    return f"{_HEADER_PREFIX}{stat.st_size}\t{stat.st_mtime_ns}"
+
+
+def _entry_line(part: int, stage: str, key: Optional[str]) -> str:
+    return f"{part}\t{stage}\t{key}" if key else f"{part}\t{stage}"
+
+
+def read_journal(path: Path) -> Tuple[Optional[str], Dict[Tuple[int, str], str]]:
+    """Return (header line, {(part, stage): object key or ""}); a torn last line from a killed run is ignored."""
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None, {}
+    lines = text.split("\n")[:-1]  # the piece after the last newline is empty or was cut short
+    header = lines[0] if lines and lines[0].startswith(_HEADER_PREFIX) else None
+    entries: Dict[Tuple[int, str], str] = {}
+    for line in lines[1:] if header is not None else lines:
+        part, stage, key = (line.split("\t") + ["", ""])[:3]
+        if part.isdigit() and stage in STAGES:
+            entries[(int(part), stage)] = key
+    return header, entries
+
+
+class RunJournal:
+    """Append-only record of the finished stages of one cache's parts; safe to ``record`` from several threads."""
+
+    def __init__(self, cache_path: Path, output_root: Path, resume: bool = False) -> None:
+        self.path = journal_path_for(cache_path.stem, output_root)
+        signature = _cache_signature(cache_path)
+        self._entries: Dict[Tuple[int, str], str] = {}
+        self._lock = threading.Lock()
+        if resume:
+            header, entries = read_journal(self.path)
+            if header == signature:
+                self._entries = entries
+            elif header is not None:
+                logging.warning("%s changed since %s was written; starting it over", cache_path.name, self.path.name)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Rewrite the surviving entries before appending to them, which also drops a torn last line.
+        lines = [signature, *(_entry_line(part, stage, key) for (part, stage), key in sorted(self._entries.items()))]
+        write_atomic(self.path, "".join(line + "\n" for line in lines), encoding="utf-8", newline="\n")
+        self._handle: Optional[TextIO] = self.path.open("a", encoding="utf-8", newline="\n")
+        self._unflushed = 0
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def finished_parts(self, stages: Collection[str]) -> FrozenSet[int]:
+        """Parts whose every stage in ``stages`` is recorded."""
+        done: Dict[int, Set[str]] = {}
+        for part, stage in self._entries:
+            done.setdefault(part, set()).add(stage)
+        wanted = set(stages)
+        return frozenset(part for part, stages_done in done.items() if wanted <= stages_done)
+
+    def object_keys(self) -> Dict[int, str]:
+        """Dedup object key of every part whose ``split`` entry has one."""
+        return {part: key for (part, stage), key in self._entries.items() if stage == "split" and key}
+
+    def record(self, part: int, stage: str, key: Optional[str] = None) -> None:
+        with self._lock:
+            if (part, stage) in self._entries:
+                return
+            if self._handle is None:
+                raise ValueError(f"{self.path.name} is closed")
+            self._entries[(part, stage)] = key or ""
+            self._handle.write(_entry_line(part, stage, key) + "\n")
+            self._unflushed += 1
+            if self._unflushed >= FLUSH_EVERY:
+                self._handle.flush()
+                self._unflushed = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
@@ -0,0 +1,130 @@
+"""Remember which cache files a run processed, and with which settings, so re-runs skip the unchanged ones."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from blob_store import manifest_path_for
+from cache_index import INDEX_SUFFIX
+from run_journal import journal_path_for
+from shader_pack import pack_path_for
+
+MANIFEST_NAME = "run_manifest.json"
+MANIFEST_VERSION = 1
+_HASH_BLOCK = 8 * 1024 * 1024
+
+
+class CacheFingerprint(NamedTuple):
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def _content_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as handle:
+        while block := handle.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path: Path) -> CacheFingerprint:
+    stat = path.stat()
+    return CacheFingerprint(stat.st_size, stat.st_mtime_ns, _content_digest(path))
+
+
+def clean_cache_outputs(output_root: Path, cache_stem: str) -> None:
+    """Remove everything a previous run derived from one cache (shared dedup objects are left alone)."""
+    stale_dir = output_root / cache_stem
+    if stale_dir.is_dir():
+        shutil.rmtree(stale_dir)
+    for stale_file in (
+        pack_path_for(cache_stem, output_root),
+        manifest_path_for(cache_stem, output_root),
+        output_root / f"{cache_stem}{INDEX_SUFFIX}",
+        journal_path_for(cache_stem, output_root),
+    ):
+        stale_file.unlink(missing_ok=True)
+
+
+class RunManifest:
+    """Fingerprints of the caches one entry point has already processed under an output root."""
+
+    def __init__(self, output_root: Path, stage: str, settings: Dict[str, object]) -> None:
+        self.path = output_root / MANIFEST_NAME
+        self.stage = stage
+        self.settings = settings
+        self._document: Dict[str, Dict[str, dict]] = {}
+        try:
+            document = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            document = {}
+        except (OSError, ValueError) as err:
+            logging.warning("Ignoring unreadable run manifest %s: %s", self.path, err)
+            document = {}
+        if document.get("version") == MANIFEST_VERSION:
+            self._document = document.get("stages", {})
+        self._entries: Dict[str, dict] = self._document.setdefault(stage, {})
+
+    def _is_unchanged(self, cache_path: Path) -> Tuple[bool, Optional[CacheFingerprint]]:
+        entry = self._entries.get(cache_path.name)
+        if entry is None or entry.get("settings") != self.settings:
+            return False, None
+        stat = cache_path.stat()
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True, None
+        if stat.st_size != entry["size"]:
+            return False, None
+        # Touched but possibly identical (e.g. re-copied by a patcher): fall back to the content hash.
+        current = fingerprint(cache_path)
+        return current.digest == entry["digest"], current
+
+    def partition(
+        self, caches: Sequence[Path], clean: bool = True, hash_workers: int = 4
+    ) -> Tuple[List[Path], List[Path]]:
+        """Split ``caches`` into (to process, unchanged), removing stale outputs of changed caches if ``clean``."""
+        with ThreadPoolExecutor(max(1, hash_workers)) as pool:
+            verdicts = list(pool.map(self._is_unchanged, caches))
+
+        pending: List[Path] = []
+        unchanged: List[Path] = []
+        for cache_path, (same, current) in zip(caches, verdicts):
+            if same:
+                unchanged.append(cache_path)
+                if current is not None:
+                    self._store(cache_path, current)
+                continue
+            if cache_path.name in self._entries:
+                logging.info("%s or its settings changed since the last run", cache_path.name)
+                if clean:
+                    clean_cache_outputs(self.path.parent, cache_path.stem)
+                del self._entries[cache_path.name]
+            pending.append(cache_path)
+        return pending, unchanged
+
+    def _store(self, cache_path: Path, current: CacheFingerprint) -> None:
+        self._entries[cache_path.name] = {
+            "size": current.size,
+            "mtime_ns": current.mtime_ns,
+            "digest": current.digest,
+            "settings": self.settings,
+        }
+
+    def record(self, caches: Sequence[Path], hash_workers: int = 4) -> None:
+        """Fingerprint and remember caches that were processed successfully."""
+        with ThreadPoolExecutor(max(1, hash_workers)) as pool:
+            for cache_path, current in zip(caches, pool.map(fingerprint, caches)):
+                self._store(cache_path, current)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        document = {"version": MANIFEST_VERSION, "stages": self._document}
+        tmp_path.write_text(json.dumps(document, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,275 @@
+"""Append-only ``<stem>.shaderpack`` files holding every artifact extracted from one shader cache."""
+from __future__ import annotations
+
+import argparse
+import logging
+import mmap
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from atomic_files import write_atomic
+from output_layout import OutputLayout, load_layout
+
+PACK_MAGIC = b"WWPK"
+PACK_VERSION = 1
+PACK_SUFFIX = ".shaderpack"
+
+# Artifact kinds in on-disk code order, mapped to the suffix the loose-file layout uses after ``<stem>_partNNNN``.
+ARTIFACT_SUFFIXES: Dict[str, str] = {
+    "cache_part": ".cache_part",
+    "lz4_decompressed": ".cache_part.lz4_decompressed",
+    "dxil": ".cache_part.dxil",
+    "dxil_ir": ".cache_part.dxil_ir.txt",
+}
+_KIND_CODES = {kind: code for code, kind in enumerate(ARTIFACT_SUFFIXES)}
+_KIND_NAMES = list(ARTIFACT_SUFFIXES)
+
+_HEADER = struct.Struct("<4sHH")  # magic, version, reserved
+_RECORD = struct.Struct("<IBQ")  # part, kind, payload length
+_INDEX_ENTRY = struct.Struct("<IBQQ")  # part, kind, payload offset, payload length
+_FOOTER = struct.Struct("<QI4s")  # index offset, entry count, magic
+_FOOTER_MAGIC = b"WWPX"
+
+PackIndex = Dict[Tuple[int, str], Tuple[int, int]]
+
+
+def pack_path_for(cache_stem: str, output_root: Path) -> Path:
+    return output_root / f"{cache_stem}{PACK_SUFFIX}"
+
+
+def _kind_code(kind: str) -> int:
+    try:
+        return _KIND_CODES[kind]
+    except KeyError:
+        raise ValueError(f"Unknown artifact kind {kind!r}; expected one of {', '.join(ARTIFACT_SUFFIXES)}") from None
+
+
+def _entry_order(key: Tuple[int, str]) -> Tuple[int, int]:
+    return key[0], _KIND_CODES[key[1]]
+
+
+def _read_trailer(data: bytes | mmap.mmap) -> Optional[PackIndex]:
+    if len(data) < _HEADER.size + _FOOTER.size:
+        return None
+    index_offset, count, magic = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+    if magic != _FOOTER_MAGIC or index_offset + count * _INDEX_ENTRY.size != len(data) - _FOOTER.size:
+        return None
+    index: PackIndex = {}
+    for part, code, offset, length in _INDEX_ENTRY.iter_unpack(data[index_offset : len(data) - _FOOTER.size]):
+        index[(part, _KIND_NAMES[code])] = (offset, length)
+    return index
+
+
+def _scan_records(data: bytes | mmap.mmap) -> Tuple[PackIndex, int]:
+    """Rebuild the index from the records themselves; returns it with the end offset of the last whole record."""
+    index: PackIndex = {}
+    position = _HEADER.size
+    while position + _RECORD.size <= len(data):
+        part, code, length = _RECORD.unpack_from(data, position)
+        payload_offset = position + _RECORD.size
+        if code >= len(_KIND_NAMES) or payload_offset + length > len(data):
+            break
+        index[(part, _KIND_NAMES[code])] = (payload_offset, length)
+        position = payload_offset + length
+    return index, position
+
+
+def _check_header(data: bytes | mmap.mmap, path: Path) -> None:
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is too small to be a shader pack")
+    magic, version, _ = _HEADER.unpack_from(data, 0)
+    if magic != PACK_MAGIC or version != PACK_VERSION:
+        raise ValueError(f"{path} is not a version {PACK_VERSION} shader pack")
+
+
+class _IndexedPack:
+    path: Path
+    index: PackIndex
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        return key in self.index
+
+    def parts(self, kind: Optional[str] = None) -> List[int]:
+        return sorted({part for part, entry_kind in self.index if kind is None or entry_kind == kind})
+
+    def entries(self) -> Iterator[Tuple[int, str]]:
+        yield from sorted(self.index, key=_entry_order)
+
+    def size(self, part: int, kind: str) -> int:
+        return self._locate(part, kind)[1]
+
+    def _locate(self, part: int, kind: str) -> Tuple[int, int]:
+        _kind_code(kind)
+        try:
+            return self.index[(part, kind)]
+        except KeyError:
+            raise KeyError(f"{self.path.name} has no {kind} artifact for part {part}") from None
+
+
+class PackWriter(_IndexedPack):
+    """Append artifacts to a pack, reopening an existing one unless ``truncate`` is set."""
+
+    def __init__(self, path: Path, truncate: bool = False) -> None:
+        self.path = path
+        self.index: PackIndex = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not truncate and path.exists() and path.stat().st_size:
+            self._handle: BinaryIO = path.open("r+b")
+            self._reopen()
+        else:
+            self._handle = path.open("wb")
+            self._handle.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0))
+
+    def _reopen(self) -> None:
+        with mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            _check_header(data, self.path)
+            index = _read_trailer(data)
+            if index is not None:
+                end = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)[0]
+            else:
+                logging.warning("Pack %s has no index trailer; recovering from its records", self.path)
+                index, end = _scan_records(data)
+        self.index = index
+        # Drop the old trailer (or a torn final record); a fresh trailer is written on close.
+        self._handle.truncate(end)
+        self._handle.seek(end)
+
+    def __enter__(self) -> "PackWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def read(self, part: int, kind: str) -> bytes:
+        offset, length = self._locate(part, kind)
+        end = self._handle.tell()
+        try:
+            self._handle.seek(offset)
+            return self._handle.read(length)
+        finally:
+            self._handle.seek(end)
+
+    def add(self, part: int, kind: str, payload: bytes | memoryview) -> None:
+        code = _kind_code(kind)
+        length = len(payload)
+        position = self._handle.tell()
+        self._handle.write(_RECORD.pack(part, code, length))
+        self._handle.write(payload)
+        self.index[(part, kind)] = (position + _RECORD.size, length)
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        index_offset = self._handle.tell()
+        for part, kind in sorted(self.index, key=_entry_order):
+            offset, length = self.index[(part, kind)]
+            self._handle.write(_INDEX_ENTRY.pack(part, _KIND_CODES[kind], offset, length))
+        self._handle.write(_FOOTER.pack(index_offset, len(self.index), _FOOTER_MAGIC))
+        self._handle.close()
+
+
+class PackReader(_IndexedPack):
+    """Random access to the artifacts in a pack by (part, kind)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._data, path)
+        index = _read_trailer(self._data)
+        if index is None:
+            logging.warning("Pack %s has no index trailer; scanning its records", path)
+            index, _ = _scan_records(self._data)
+        self.index: PackIndex = index
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def read(self, part: int, kind: str) -> memoryview:
+        """Return a zero-copy view of an artifact; it must be released before the reader is closed."""
+        offset, length = self._locate(part, kind)
+        return memoryview(self._data)[offset : offset + length]
+
+    def close(self) -> None:
+        try:
+            self._data.close()
+        except BufferError:
+            # A view returned by read() is still alive; the mapping goes away with it.
+            pass
+
+
+def unpack(
+    pack_path: Path, out_dir: Path, kinds: Optional[List[str]] = None, layout: Optional[OutputLayout] = None
+) -> int:
+    """Write the artifacts of ``pack_path`` as loose files under ``out_dir/<stem>/``; returns the file count."""
+    cache_stem = pack_path.name[: -len(PACK_SUFFIX)] if pack_path.name.endswith(PACK_SUFFIX) else pack_path.stem
+    target_dir = out_dir / cache_stem
+    target_dir.mkdir(parents=True, exist_ok=True)
+    layout = layout or load_layout(out_dir)
+
+    written = 0
+    with PackReader(pack_path) as reader:
+        for part, kind in reader.entries():
+            if kinds and kind not in kinds:
+                continue
+            path = layout.part_path(target_dir, f"{cache_stem}_part{part:04d}{ARTIFACT_SUFFIXES[kind]}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with reader.read(part, kind) as payload:
+                write_atomic(path, payload)
+            written += 1
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or unpack Where Winds Meet shader packs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    unpack_parser = subparsers.add_parser("unpack", help="Write the artifacts of one or more packs as loose files")
+    unpack_parser.add_argument("packs", type=Path, nargs="+", help=f"Pack files (*{PACK_SUFFIX})")
+    unpack_parser.add_argument(
+        "--out-dir",
+        type=Path,
+        default=None,
+        help="Directory receiving <stem>/ folders (default: next to each pack)",
+    )
+    unpack_parser.add_argument(
+        "--kind",
+        action="append",
+        choices=list(ARTIFACT_SUFFIXES),
+        default=None,
+        help="Only unpack these artifact kinds (repeatable)",
+    )
+
+    list_parser = subparsers.add_parser("list", help="List the artifacts stored in a pack")
+    list_parser.add_argument("pack", type=Path, help=f"Pack file (*{PACK_SUFFIX})")
+
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s")
+
+    if args.command == "list":
+        with PackReader(args.pack) as reader:
+            for part, kind in reader.entries():
+                print(f"{part:6d}  {kind:<17} {reader.index[(part, kind)][1]:>10} bytes")
+        return
+
+    total = 0
+    for pack_path in args.packs:
+        if not pack_path.exists():
+            raise SystemExit(f"Pack file not found: {pack_path}")
+        out_dir = args.out_dir or pack_path.parent
+        count = unpack(pack_path, out_dir, args.kind)
+        logging.info("Unpacked %s artifact(s) from %s", count, pack_path.name)
+        total += count
+
+    logging.info("Finished. Wrote %s loose file(s) from %s pack(s).", total, len(args.packs))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,84 +3,917 @@ from __future__ import annotations
 
 import argparse
 import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import BinaryIO, Collection, Deque, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 import lz4.block
 
+from atomic_files import remove_stale_temps, write_atomic
+from blob_store import count_objects, link_or_copy, log_dedup_summary, manifest_path_for, object_path
+from blob_store import merge_manifest, read_manifest, store_blob, write_manifest
+from cache_stats import CacheStats
+from cache_keys import KeyTable, keys_path_for, parse_key_table, read_key_file, select_parts, write_keys
+from cache_index import ChunkEntry, chunk_checksum, index_path_for, load_index, read_chunk, write_index
+from lz4_pool import MAX_RETAINED_BYTES, BufferPool
+from memory_budget import IN_FLIGHT_SHARE, RETAINED_SHARE, log_peak_rss, over_budget, parse_size, plan_jobs
+from memory_budget import worker_share
+from output_layout import FLAT, LAYOUTS, OutputLayout, load_layout, resolve_layout
+from part_filter import PartFilter, add_filter_arguments, filter_from_args, with_skipped
+from run_journal import RunJournal
+from run_manifest import RunManifest
+from shader_pack import PackWriter, pack_path_for
+from worker_pool import resolve_jobs, run_per_file
+from write_behind import WRITE_QUEUE_BYTES, WriteBehind
+
 DELIMITER = b"ZZZ4"
 HEADER32_SIZE = 4
 HEADER64_SIZE = 8
+_SIZE32 = struct.Struct("<I")
+_SIZE64 = struct.Struct("<Q")
+# Declared sizes above this are treated as corrupt headers rather than shader blobs.
+MAX_BLOB_SIZE = 256 * 1024 * 1024
+LZ4_MAX_RATIO = 255
+# Length bytes of a leading literal run checked before the run is taken as plausible (about 4 KiB of literals).
+MAX_LITERAL_EXTENSION = 16
+# How far the splitter advances through a mapped cache before handing consumed pages back to the OS.
+RELEASE_STRIDE = 64 * 1024 * 1024
+# Bytes read per call when splitting a cache from a stream.
+STREAM_READ_SIZE = 1024 * 1024
+# Chunks each decompression thread may have queued ahead of the ordered writer.
+IN_FLIGHT_PER_WORKER = 4
+# "files" writes <stem>/<stem>_partNNNN.* loose files, "pack" appends everything to <stem>.shaderpack and "dedup"
+# stores each distinct decompressed blob once under objects/ with a <stem>.manifest.tsv per cache.
+OUTPUT_FORMATS = ("files", "pack", "dedup")
+# When the compressed .cache_part is kept next to the decompressed blob: for every part, only for parts that failed
+# to decompress (for forensics), or not at all.
+RAW_PART_MODES = ("always", "on-failure", "never")
+
+# Decompressed parts borrow their buffers from here and hand them back once the consumer moves on.
+_PART_BUFFERS = BufferPool()
+
+
+def _size_header(data: bytes | memoryview | mmap.mmap, start: int, stop: int) -> Optional[Tuple[int, int]]:
+    """Return (uncompressed_size, header_len) of the size header at ``data[start:stop]``, or None if there is none."""
+    if stop - start < HEADER32_SIZE:
+        return None
+    size32 = _SIZE32.unpack_from(data, start)[0]
+    # A 64-bit size has a zero high half; an LZ4 block never starts with four zero bytes.
+    wide = stop - start >= HEADER64_SIZE
+    if size32:
+        if wide and _SIZE32.unpack_from(data, start + HEADER32_SIZE)[0] == 0:
+            return size32, HEADER64_SIZE
+        return size32, HEADER32_SIZE
+    if wide:
+        size64 = _SIZE64.unpack_from(data, start)[0]
+        if size64:
+            return size64, HEADER64_SIZE
+    return None
 
 
-def _detect_blob_size(chunk: bytes) -> Tuple[int, int]:
+def _detect_blob_size(chunk: bytes | memoryview) -> Tuple[int, int]:
     """Return (uncompressed_size, header_len)."""
     if len(chunk) < HEADER32_SIZE:
         raise ValueError("Chunk too small to contain size header")
+    header = _size_header(chunk, 0, len(chunk))
+    if header is None:
+        raise ValueError("Unable to determine shader blob size from chunk header")
+    return header
 
-    size32 = int.from_bytes(chunk[:HEADER32_SIZE], "little", signed=False)
-    if size32 > 0:
-        return size32, HEADER32_SIZE
 
-    if len(chunk) >= HEADER64_SIZE:
-        size64 = int.from_bytes(chunk[:HEADER64_SIZE], "little", signed=False)
-        if size64 > 0:
-            return size64, HEADER64_SIZE
+def _release_consumed(buffer: mmap.mmap, upto: int) -> None:
+    """Drop mapped pages below ``upto`` so RSS tracks the current chunk, not the file size."""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    aligned = upto - (upto % mmap.PAGESIZE)
+    if aligned > 0:
+        buffer.madvise(mmap.MADV_DONTNEED, 0, aligned)
+
+
+def _plausible_payload(data: bytes | mmap.mmap, start: int, stop: int) -> int:
+    """Return where the LZ4 payload of ``data[start:stop]`` starts if its size header fits the span, else -1."""
+    header = _size_header(data, start, stop)
+    if header is None:
+        return -1
+    blob_size, header_len = header
+    payload_len = stop - start - header_len
+    if payload_len <= 0:
+        return -1
+    # LZ4 can neither expand data beyond compressBound() nor inflate a byte into more than ~255 output bytes.
+    bound = blob_size + blob_size // 255 + 16
+    if not blob_size // LZ4_MAX_RATIO <= payload_len <= bound or blob_size > MAX_BLOB_SIZE:
+        return -1
+    return start + header_len
+
 
-    raise ValueError("Unable to determine shader blob size from chunk header")
+def _plausible_span(data: bytes | mmap.mmap, start: int, stop: int) -> bool:
+    """Cheap sanity check that ``data[start:stop]`` starts with a size header consistent with an LZ4 block."""
+    payload = _plausible_payload(data, start, stop)
+    return payload != -1 and _plausible_first_sequence(data, payload, stop)
 
 
-def _iterate_cache_chunks(data: bytes) -> Iterable[bytes]:
-    """Yield payload-containing chunks after the delimiter, skipping the header chunk."""
-    segments = data.split(DELIMITER)
-    if len(segments) <= 1:
+def _plausible_first_sequence(data: bytes | mmap.mmap, position: int, stop: int) -> bool:
+    """Check that an LZ4 block starts with literals and that its first match only refers back into them."""
+    token = data[position]
+    literals = token >> 4
+    if not literals:
+        return False
+    position += 1
+    if literals == 15:
+        limit = min(stop, position + MAX_LITERAL_EXTENSION)
+        while position < limit:
+            extra = data[position]
+            position += 1
+            literals += extra
+            if extra != 255:
+                break
+        else:
+            # A literal run this long is what incompressible data looks like, not a sign of a false delimiter.
+            return position < stop
+    offset_at = position + literals
+    if offset_at == stop:
+        return True  # a literal-only block
+    if offset_at + 2 > stop:
+        return False
+    offset = data[offset_at] | data[offset_at + 1] << 8
+    return 0 < offset <= literals
+
+
+def _decodes_exactly(chunk: memoryview) -> bool:
+    try:
+        blob_size, header_len = _detect_blob_size(chunk)
+        _decompress(chunk[header_len:], blob_size)
+    except (ValueError, lz4.block.LZ4BlockError):
+        return False
+    return True
+
+
+def _is_boundary(view: memoryview, current: Tuple[int, int], following: Tuple[int, int]) -> bool:
+    """Keep a suspicious delimiter unless the piece before it only decodes once merged with the piece after it."""
+    with view[current[0] : current[1]] as chunk:
+        if _decodes_exactly(chunk):
+            return True
+    with view[current[0] : following[1]] as merged:
+        return not _decodes_exactly(merged)
+
+
+def _iterate_cache_chunks(
+    data: bytes | mmap.mmap, release_stride: int = RELEASE_STRIDE, trial_decode: bool = True
+) -> Iterator[Tuple[int, memoryview]]:
+    """Yield (offset, view) for the payload chunks after each delimiter, merging in-payload delimiters."""
+    start = data.find(DELIMITER)
+    if start == -1:
         return
     # Discard first chunk (metadata before the first delimiter)
-    for chunk in segments[1:]:
-        if not chunk:
+    start += len(DELIMITER)
+    plausible = _plausible_span(data, start, len(data) if (end := data.find(DELIMITER, start)) == -1 else end)
+    released = 0
+    with memoryview(data) as view:
+        while end != -1:
+            following = end + len(DELIMITER)
+            next_end = data.find(DELIMITER, following)
+            next_stop = len(data) if next_end == -1 else next_end
+            next_plausible = _plausible_span(data, following, next_stop)
+            # Only a boundary with a doubtful side pays for a trial decode.
+            if plausible and next_plausible:
+                boundary = True
+            elif trial_decode:
+                boundary = _is_boundary(view, (start, end), (following, next_stop))
+            else:
+                boundary = _plausible_payload(data, following, next_stop) != -1
+            if not boundary:
+                logging.debug("Merging false delimiter at offset %s into the preceding chunk", end)
+                end = next_end
+                plausible = _plausible_span(data, start, next_stop)
+                continue
+
+            if end > start:
+                with view[start:end] as chunk:
+                    yield start, chunk
+            start, end, plausible = following, next_end, next_plausible
+            if isinstance(data, mmap.mmap) and start - released >= release_stride:
+                _release_consumed(data, start)
+                released = start
+
+        if len(data) > start:
+            with view[start:] as chunk:
+                yield start, chunk
+
+
+def _stream_spans(stream: BinaryIO, read_size: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, bytes) of every region after a delimiter in ``stream``, including empty ones."""
+    buffer = bytearray()
+    base = 0  # stream offset of buffer[0]
+    start: Optional[int] = None  # buffer index where the current region begins, once a delimiter has been seen
+    search = 0
+    while True:
+        found = buffer.find(DELIMITER, search)
+        if found != -1:
+            if start is not None:
+                with memoryview(buffer) as view:
+                    yield base + start, bytes(view[start:found])
+            start = search = found + len(DELIMITER)
             continue
-        yield chunk
 
+        # Drop what has been consumed (or, before the first delimiter, the metadata) before reading more.
+        keep_from = start if start is not None else max(0, len(buffer) - len(DELIMITER) + 1)
+        del buffer[:keep_from]
+        base += keep_from
+        if start is not None:
+            start = 0
+        # Resume a few bytes back, so a delimiter split across two reads is still found.
+        search = max(0, len(buffer) - len(DELIMITER) + 1)
+        block = stream.read(read_size)
+        if not block:
+            if start is not None:
+                yield base + start, bytes(buffer)
+            return
+        buffer += block
 
-def process_cache_file(cache_path: Path, output_root: Path) -> int:
-    logging.info("Processing %s", cache_path.name)
-    data = cache_path.read_bytes()
-    chunks = list(_iterate_cache_chunks(data))
 
-    if not chunks:
-        logging.warning("No delimiter chunks detected in %s", cache_path)
-        return 0
+def _stream_boundary(current: bytes, following: bytes) -> bool:
+    joined = current + DELIMITER + following
+    with memoryview(joined) as view:
+        return _is_boundary(view, (0, len(current)), (len(current) + len(DELIMITER), len(joined)))
 
-    file_output_dir = output_root / cache_path.stem
-    file_output_dir.mkdir(parents=True, exist_ok=True)
 
-    written = 0
-    for index, chunk in enumerate(chunks, start=1):
-        try:
-            blob_size, header_len = _detect_blob_size(chunk)
-        except ValueError as err:
-            logging.warning("Skipping chunk %s part %s: %s", cache_path.name, index, err)
+def _iterate_stream_chunks(stream: BinaryIO, read_size: int = STREAM_READ_SIZE) -> Iterator[Tuple[int, bytes]]:
+    """``_iterate_cache_chunks`` for a file object: same chunks, same order, read ``read_size`` bytes at a time."""
+    current: Optional[Tuple[int, bytes]] = None
+    plausible = False
+    for offset, span in _stream_spans(stream, read_size):
+        span_plausible = _plausible_span(span, 0, len(span))
+        if current is None:
+            current, plausible = (offset, span), span_plausible
             continue
-
-        compressed_blob = chunk[header_len:]
-        if not compressed_blob:
-            logging.warning("Empty blob payload for %s part %s", cache_path.name, index)
+        if not (plausible and span_plausible) and not _stream_boundary(current[1], span):
+            logging.debug("Merging false delimiter at offset %s into the preceding chunk", offset - len(DELIMITER))
+            merged = current[1] + DELIMITER + span
+            current, plausible = (current[0], merged), _plausible_span(merged, 0, len(merged))
             continue
 
-        raw_part_path = file_output_dir / f"{cache_path.stem}_part{index:04d}.cache_part"
-        raw_part_path.write_bytes(compressed_blob)
-        written += 1
+        if current[1]:
+            yield current
+        current, plausible = (offset, span), span_plausible
+
+    if current is not None and current[1]:
+        yield current
+
+
+def _release_stride(max_memory: Optional[int]) -> int:
+    """How far the scan may run ahead of the last page release, scaled down under a memory budget."""
+    if max_memory is None:
+        return RELEASE_STRIDE
+    return max(mmap.PAGESIZE, min(RELEASE_STRIDE, max_memory // RETAINED_SHARE))
 
+
+@contextmanager
+def _map_cache_file(cache_path: Path) -> Iterator[bytes | mmap.mmap]:
+    """Map ``cache_path`` read-only so chunks can be sliced without copying the file into memory."""
+    with cache_path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            # mmap refuses zero-length files
+            yield b""
+            return
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
         try:
-            decompressed = lz4.block.decompress(compressed_blob, uncompressed_size=blob_size)
-        except lz4.block.LZ4BlockError as err:
-            logging.warning("LZ4 decompress failed for %s part %s: %s", cache_path.name, index, err)
-            continue
+            yield mapped
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # A chunk view is still referenced (e.g. from a traceback); the mapping goes away with it.
+                pass
+
+
+def _describe_chunk(offset: int, chunk: memoryview) -> ChunkEntry:
+    try:
+        blob_size, header_len = _detect_blob_size(chunk)
+    except ValueError:
+        blob_size, header_len = 0, 0
+    return ChunkEntry(offset, len(chunk), header_len, blob_size, chunk_checksum(chunk))
+
+
+def _scan_chunks(
+    data: bytes | mmap.mmap, entries: List[ChunkEntry], release_stride: int = RELEASE_STRIDE
+) -> Iterator[Tuple[int, ChunkEntry, memoryview]]:
+    """Yield (part, entry, chunk) for every chunk, appending each entry to ``entries`` as the scan goes."""
+    for index, (offset, chunk) in enumerate(_iterate_cache_chunks(data, release_stride), start=1):
+        entry = _describe_chunk(offset, chunk)
+        entries.append(entry)
+        yield index, entry, chunk
+
+
+def _scan_stream(stream: BinaryIO, read_size: int) -> Iterator[Tuple[int, ChunkEntry, memoryview]]:
+    """``_scan_chunks`` for a file object; entries are not kept since a stream cannot be indexed."""
+    for index, (offset, chunk) in enumerate(_iterate_stream_chunks(stream, read_size), start=1):
+        with memoryview(chunk) as view:
+            yield index, _describe_chunk(offset, view), view
+
+
+def _indexed_chunks(
+    data: bytes | mmap.mmap,
+    entries: Sequence[ChunkEntry],
+    parts: Optional[Collection[int]],
+    release_stride: int = RELEASE_STRIDE,
+) -> Iterator[Tuple[int, ChunkEntry, memoryview]]:
+    """Yield (part, entry, chunk) by seeking straight to indexed chunks instead of scanning."""
+    ordinals = range(1, len(entries) + 1) if parts is None else sorted(p for p in parts if 1 <= p <= len(entries))
+    released = 0
+    for index in ordinals:
+        entry = entries[index - 1]
+        with read_chunk(data, entry) as chunk:
+            yield index, entry, chunk
+        if isinstance(data, mmap.mmap) and entry.offset - released >= release_stride:
+            _release_consumed(data, entry.offset)
+            released = entry.offset
+
+
+class CachePart(NamedTuple):
+    number: int  # 1-based
+    compressed: memoryview  # only valid until the next part is requested
+    # None when LZ4 decompression failed; with ``pooled_lz4`` a pooled buffer, only valid until the next part too
+    decompressed: Optional[bytes | memoryview]
+
+
+def part_file_name(cache_stem: str, index: int) -> str:
+    return f"{cache_stem}_part{index:04d}.cache_part"
+
+
+def _decompress(
+    compressed_blob: memoryview, blob_size: int, buffers: Optional[BufferPool] = None
+) -> bytes | memoryview:
+    """Decode one blob of exactly ``blob_size`` bytes, into a buffer borrowed from ``buffers`` if given."""
+    if blob_size > MAX_BLOB_SIZE:
+        raise lz4.block.LZ4BlockError(f"Declared size {blob_size} exceeds the {MAX_BLOB_SIZE} byte limit")
+    if buffers is None:
+        decompressed = lz4.block.decompress(compressed_blob, uncompressed_size=blob_size)
+    else:
+        decompressed = buffers.decompress(compressed_blob, blob_size)
+    # uncompressed_size is only a capacity for lz4; a block that decodes short is not the declared blob.
+    if len(decompressed) != blob_size:
+        decoded = len(decompressed)
+        if buffers is not None:
+            buffers.recycle(decompressed)
+        raise lz4.block.LZ4BlockError(f"Decoded {decoded} bytes, header declared {blob_size}")
+    return decompressed
 
+
+def _decompress_now(compressed_blob: memoryview, blob_size: int, buffers: Optional[BufferPool] = None) -> Future:
+    """Serial counterpart of submitting ``_decompress`` to a pool."""
+    future: Future = Future()
+    try:
+        future.set_result(_decompress(compressed_blob, blob_size, buffers))
+    except lz4.block.LZ4BlockError as err:
+        future.set_exception(err)
+    return future
+
+
+def _recycle_part(part: CachePart) -> None:
+    part.compressed.release()
+    _PART_BUFFERS.recycle(part.decompressed)
+
+
+def _resolve_part(cache_path: Path, index: int, compressed_blob: memoryview, decompressed: Future) -> CachePart:
+    try:
+        payload = decompressed.result()
+    except lz4.block.LZ4BlockError as err:
+        logging.warning("LZ4 decompress failed for %s part %s: %s", cache_path.name, index, err)
+        payload = None
+    return CachePart(index, compressed_blob, payload)
+
+
+def _declared_size(entry: ChunkEntry) -> Optional[int]:
+    return entry.uncompressed_size if entry.header_len else None
+
+
+def _filter_entries(
+    cache_stem: str, entries: Sequence[ChunkEntry], parts: Optional[Collection[int]], part_filter: PartFilter
+) -> Set[int]:
+    """The parts among ``parts`` (default: all) that ``part_filter`` keeps, judged from their index entries."""
+    candidates = range(1, len(entries) + 1) if parts is None else (p for p in parts if 1 <= p <= len(entries))
+    return {p for p in candidates if part_filter.selects(cache_stem, p, _declared_size(entries[p - 1]))}
+
+
+def _decoded_parts(
+    cache_path: Path,
+    chunks: Iterable[Tuple[int, ChunkEntry, memoryview]],
+    parts: Optional[Collection[int]],
+    decompress_workers: int,
+    after: int = 0,
+    max_memory: Optional[int] = None,
+    part_filter: Optional[PartFilter] = None,
+    pooled_lz4: bool = False,
+) -> Iterator[CachePart]:
+    """Decompress the selected ``chunks`` on up to ``decompress_workers`` threads and yield them in part order."""
+    # The window of chunks decompressing ahead of the consumer is bounded so memory stays proportional to it.
+    max_in_flight = max(1, decompress_workers) * IN_FLIGHT_PER_WORKER
+    max_in_flight_bytes = None if max_memory is None else max_memory // IN_FLIGHT_SHARE
+    buffers = _PART_BUFFERS if pooled_lz4 else None
+    if max_memory is not None:
+        _PART_BUFFERS.trim(min(MAX_RETAINED_BYTES, max_memory // RETAINED_SHARE))
+    pending: Deque[Tuple[int, memoryview, Future]] = deque()
+    pending_sizes: Deque[int] = deque()
+    pending_bytes = 0
+
+    def throttled() -> bool:
+        if len(pending) >= max_in_flight:
+            return True
+        if max_in_flight_bytes is None or not pending:
+            return False
+        return pending_bytes > max_in_flight_bytes or over_budget(max_memory)
+
+    with ThreadPoolExecutor(decompress_workers) if decompress_workers > 1 else nullcontext() as pool:
+        for index, entry, chunk in chunks:
+            if index <= after or (parts is not None and index not in parts):
+                continue
+            if part_filter is not None and not part_filter.selects(cache_path.stem, index, _declared_size(entry)):
+                continue
+
+            if not entry.header_len:
+                logging.warning(
+                    "Skipping chunk %s part %s: unable to determine shader blob size", cache_path.name, index
+                )
+                continue
+
+            compressed_blob = chunk[entry.header_len :]
+            if not compressed_blob:
+                logging.warning("Empty blob payload for %s part %s", cache_path.name, index)
+                continue
+
+            if pool is None:
+                decompressed = _decompress_now(compressed_blob, entry.uncompressed_size, buffers)
+            else:
+                decompressed = pool.submit(_decompress, compressed_blob, entry.uncompressed_size, buffers)
+            pending.append((index, compressed_blob, decompressed))
+            pending_sizes.append(entry.uncompressed_size)
+            pending_bytes += entry.uncompressed_size
+
+            while throttled():
+                part = _resolve_part(cache_path, *pending.popleft())
+                pending_bytes -= pending_sizes.popleft()
+                yield part
+                _recycle_part(part)
+
+        while pending:
+            part = _resolve_part(cache_path, *pending.popleft())
+            yield part
+            _recycle_part(part)
+
+
+def iter_cache_parts(
+    cache_path: Path,
+    output_root: Path,
+    parts: Optional[Collection[int]] = None,
+    use_index: bool = True,
+    decompress_workers: int = 1,
+    max_memory: Optional[int] = None,
+    part_filter: Optional[PartFilter] = None,
+    pooled_lz4: bool = False,
+) -> Iterator[CachePart]:
+    """Yield the parts of ``cache_path`` in order without writing them, seeking via the chunk index when current."""
+    release_stride = _release_stride(max_memory)
+    logging.info("Processing %s", cache_path.name)
+    index_path = index_path_for(cache_path, output_root)
+    entries = load_index(index_path, cache_path) if use_index else None
+
+    with _map_cache_file(cache_path) as data:
+        emitted = 0
+        if entries is not None:
+            wanted = parts if part_filter is None else _filter_entries(cache_path.stem, entries, parts, part_filter)
+            try:
+                for part in _decoded_parts(
+                    cache_path,
+                    _indexed_chunks(data, entries, wanted, release_stride),
+                    None,
+                    decompress_workers,
+                    max_memory=max_memory,
+                    pooled_lz4=pooled_lz4,
+                ):
+                    emitted = part.number
+                    yield part
+            except ValueError as err:
+                logging.warning("Chunk index for %s is out of date (%s); rescanning", cache_path.name, err)
+                entries = None
+        if entries is None:
+            entries = []
+            scanned = _scan_chunks(data, entries, release_stride)
+            yield from _decoded_parts(
+                cache_path, scanned, parts, decompress_workers, emitted, max_memory, part_filter, pooled_lz4
+            )
+            if use_index:
+                write_index(index_path, cache_path, entries)
+
+    if not entries:
+        logging.warning("No delimiter chunks detected in %s", cache_path)
+
+
+def iter_stream_parts(
+    stream: BinaryIO,
+    cache_name: str,
+    parts: Optional[Collection[int]] = None,
+    decompress_workers: int = 1,
+    read_size: int = STREAM_READ_SIZE,
+    max_memory: Optional[int] = None,
+    part_filter: Optional[PartFilter] = None,
+    pooled_lz4: bool = False,
+) -> Iterator[CachePart]:
+    """``iter_cache_parts`` for a cache read sequentially from ``stream``; parts are numbered as for a file."""
+    logging.info("Processing %s", cache_name)
+    if max_memory is not None:
+        read_size = min(read_size, max(64 * 1024, max_memory // RETAINED_SHARE))
+    chunks = _scan_stream(stream, read_size)
+    found = False
+    decoded = _decoded_parts(
+        Path(cache_name),
+        chunks,
+        parts,
+        decompress_workers,
+        max_memory=max_memory,
+        part_filter=part_filter,
+        pooled_lz4=pooled_lz4,
+    )
+    for part in decoded:
+        found = True
+        yield part
+    if not found and parts is None and part_filter is None:
+        logging.warning("No shader parts found in %s", cache_name)
+
+
+def default_raw_parts(output_format: str) -> str:
+    # The dedup store has always kept raw parts only for failures; the other layouts keep every one.
+    return "on-failure" if output_format == "dedup" else "always"
+
+
+def wants_raw_part(raw_parts: str, part: CachePart) -> bool:
+    return raw_parts == "always" or (raw_parts == "on-failure" and part.decompressed is None)
+
+
+def _write_file(writer: Optional[WriteBehind], path: Path, payload: bytes | memoryview, label: str) -> None:
+    if writer is None:
+        write_atomic(path, payload)
+    else:
+        writer.write(path, payload, label)
+
+
+def write_part_files(
+    file_output_dir: Path,
+    cache_stem: str,
+    part: CachePart,
+    raw_parts: str = "always",
+    decompressed: bool = True,
+    writer: Optional[WriteBehind] = None,
+    layout: OutputLayout = FLAT,
+) -> bool:
+    """Write (or queue to ``writer``) a part's raw and/or decompressed blob; returns whether anything was written."""
+    raw_part_path = layout.part_path(file_output_dir, part_file_name(cache_stem, part.number))
+    label = f"{cache_stem} part {part.number}"
+    write_raw = wants_raw_part(raw_parts, part)
+    write_decompressed = decompressed and part.decompressed is not None
+    if writer is None and layout.levels and (write_raw or write_decompressed):
+        raw_part_path.parent.mkdir(parents=True, exist_ok=True)
+    if write_raw:
+        _write_file(writer, raw_part_path, part.compressed, label)
+    if write_decompressed:
         decompressed_path = raw_part_path.with_suffix(raw_part_path.suffix + ".lz4_decompressed")
-        decompressed_path.write_bytes(decompressed)
+        _write_file(writer, decompressed_path, part.decompressed, label)
+    return write_raw or write_decompressed
+
+
+def add_part_to_pack(pack: PackWriter, part: CachePart, raw_parts: str = "always", decompressed: bool = True) -> bool:
+    """Pack counterpart of ``write_part_files``; a pack is append-only, so kinds it already holds are not re-added."""
+    added = False
+    if wants_raw_part(raw_parts, part):
+        if (part.number, "cache_part") not in pack:
+            pack.add(part.number, "cache_part", part.compressed)
+        added = True
+    if decompressed and part.decompressed is not None:
+        if (part.number, "lz4_decompressed") not in pack:
+            pack.add(part.number, "lz4_decompressed", part.decompressed)
+        added = True
+    return added
+
+
+def dedup_part(
+    output_root: Path,
+    cache_stem: str,
+    part: CachePart,
+    link: bool,
+    raw_parts: str = "on-failure",
+    writer: Optional[WriteBehind] = None,
+    layout: OutputLayout = FLAT,
+) -> Optional[Tuple[str, bool]]:
+    """Store a part in the content-addressed store; returns (object key, newly stored), or None if undecoded."""
+    file_output_dir = output_root / cache_stem
+    if wants_raw_part(raw_parts, part):
+        raw_part_path = layout.part_path(file_output_dir, part_file_name(cache_stem, part.number))
+        if writer is None:
+            raw_part_path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(raw_part_path, part.compressed)
+        else:
+            writer.write(raw_part_path, part.compressed, f"{cache_stem} part {part.number}")
+    if part.decompressed is None:
+        return None
+
+    key, created = store_blob(output_root, part.decompressed)
+    if link:
+        name = part_file_name(cache_stem, part.number) + ".lz4_decompressed"
+        link_or_copy(object_path(output_root, key), layout.part_path(file_output_dir, name))
+    return key, created
+
+
+class SplitOptions(NamedTuple):
+    """How the parts of a cache are decoded and written; ``process_cache_file`` and batch extraction both take one."""
+
+    output_format: str = "files"  # one of OUTPUT_FORMATS
+    raw_parts: Optional[str] = None  # one of RAW_PART_MODES; None picks ``default_raw_parts(output_format)``
+    decompressed: bool = True  # write the .lz4_decompressed blob of loose-file and pack parts
+    dedup_links: bool = False  # hardlink dedup objects back into <stem>/ under their part names
+    use_index: bool = True
+    decompress_workers: int = 1
+    max_memory: Optional[int] = None  # this process's share of the --max-memory budget
+    writer_threads: int = 1  # 0 writes loose files inline
+    layout: Optional[OutputLayout] = None  # None uses the layout recorded for the output root
+    resume: bool = False  # skip the parts the journal of an interrupted full run marks as finished
+    pooled_lz4: bool = False  # decode with the experimental ctypes decoder of ``lz4_pool``
+
+    @property
+    def raw_part_mode(self) -> str:
+        return self.raw_parts or default_raw_parts(self.output_format)
+
 
-    return written
+def open_journal(
+    cache_path: Path, output_root: Path, resume: bool, stages: Collection[str]
+) -> Tuple[RunJournal, Optional[PartFilter]]:
+    """Start the journal of a full run over ``cache_path``, with a filter skipping the parts it has ``stages`` for."""
+    journal = RunJournal(cache_path, output_root, resume)
+    part_filter = with_skipped(None, journal.finished_parts(stages))
+    if part_filter is not None:
+        logging.info("Resuming %s after %s finished part(s)", cache_path.name, len(part_filter.skip or ()))
+    return journal, part_filter
+
+
+class PartOutput:
+    """Writes the parts of one cache as ``options`` says; the splitter and batch extraction share it."""
+
+    def __init__(
+        self, cache_name: str, output_root: Path, options: SplitOptions, complete: bool, journal: Optional[RunJournal]
+    ) -> None:
+        self.cache_name = cache_name
+        self.cache_stem = Path(cache_name).stem
+        self.output_root = output_root
+        self.file_output_dir = output_root / self.cache_stem
+        self.options = options
+        self.raw_parts = options.raw_part_mode
+        self.layout = options.layout or load_layout(output_root)
+        self.complete = complete  # covers every part, so the pack and dedup manifest are replaced, not added to
+        self.journal = journal
+        self.written = 0  # parts that produced output
+        self._parts = 0
+        self._new_objects = 0
+        # Parts a resumed run skips were stored by the interrupted one; the journal remembers their objects.
+        prior = journal.object_keys() if journal is not None else {}
+        self.manifest_rows = [(f"{self.cache_stem}_part{index:04d}", key) for index, key in sorted(prior.items())]
+        self._outputs = ExitStack()
+        self.writer: Optional[WriteBehind] = None
+        self.pack: Optional[PackWriter] = None
+
+    def __enter__(self) -> "PartOutput":
+        with ExitStack() as outputs:
+            self.writer = outputs.enter_context(part_writer(self.options.writer_threads, self.options.max_memory))
+            if self.options.output_format == "pack":
+                pack_path = pack_path_for(self.cache_stem, self.output_root)
+                self.pack = outputs.enter_context(PackWriter(pack_path, truncate=self.complete))
+            self._outputs = outputs.pop_all()
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        self._outputs.__exit__(exc_type, exc, traceback)
+        if exc_type is None and self.options.output_format == "dedup":
+            self._write_manifest()
+
+    def add(self, part: CachePart) -> Optional[str]:
+        """Write ``part``; returns its dedup object key, or None when it was not stored as an object."""
+        key = None
+        # Packs and dedup objects are written inline; dedup objects must exist before later parts link to them.
+        if self.pack is not None:
+            written = add_part_to_pack(self.pack, part, self.raw_parts, self.options.decompressed)
+        elif self.options.output_format == "dedup":
+            stored = dedup_part(
+                self.output_root,
+                self.cache_stem,
+                part,
+                self.options.dedup_links,
+                self.raw_parts,
+                self.writer,
+                self.layout,
+            )
+            if stored is not None:
+                key = stored[0]
+                self.manifest_rows.append((f"{self.cache_stem}_part{part.number:04d}", key))
+                self._new_objects += stored[1]
+            written = stored is not None or wants_raw_part(self.raw_parts, part)
+        else:
+            if not self._parts:
+                self.writer.ensure_dir(self.file_output_dir)
+            written = write_part_files(
+                self.file_output_dir,
+                self.cache_stem,
+                part,
+                self.raw_parts,
+                self.options.decompressed,
+                self.writer,
+                self.layout,
+            )
+        if self.journal is not None:
+            self.writer.then(partial(self.journal.record, part.number, "split", key))
+        self._parts += 1
+        self.written += written
+        return key
+
+    def artifact_dir(self, part_index: int) -> Path:
+        """The directory the loose files of ``part_index`` go to (created), for artifacts derived from the part."""
+        directory = self.layout.part_dir(self.file_output_dir, part_file_name(self.cache_stem, part_index))
+        self.writer.ensure_dir(directory)
+        return directory
+
+    def _write_manifest(self) -> None:
+        manifest_path = manifest_path_for(self.cache_stem, self.output_root)
+        if self.complete:
+            write_manifest(manifest_path, self.manifest_rows)
+        else:
+            # A selective run only touched some parts; the rest of an earlier manifest stays valid.
+            merge_manifest(manifest_path, self.manifest_rows)
+        logging.info(
+            "Deduplicated %s: %s part(s), %s new object(s)", self.cache_name, len(self.manifest_rows), self._new_objects
+        )
+
+
+def process_cache_file(
+    cache_path: Path,
+    output_root: Path,
+    options: SplitOptions = SplitOptions(),
+    parts: Optional[Collection[int]] = None,
+    keys: Optional[Collection[str]] = None,
+    part_filter: Optional[PartFilter] = None,
+) -> int:
+    """Split ``cache_path`` into ``output_root`` and return the number of parts that produced output."""
+    if keys is not None:
+        parts = set(parts or ()) | _parts_for_keys(cache_path, output_root, keys, options.use_index)
+        if not parts:
+            return 0
+    complete = parts is None and part_filter is None
+    journal = None
+    if complete and options.output_format != "pack":
+        journal, part_filter = open_journal(cache_path, output_root, options.resume, ("split",))
+    cache_parts = iter_cache_parts(
+        cache_path,
+        output_root,
+        parts,
+        options.use_index,
+        options.decompress_workers,
+        options.max_memory,
+        part_filter,
+        options.pooled_lz4,
+    )
+    with journal or nullcontext(), PartOutput(cache_path.name, output_root, options, complete, journal) as output:
+        for part in cache_parts:
+            output.add(part)
+    return output.written
+
+
+def process_cache_stream(
+    stream: BinaryIO,
+    cache_name: str,
+    output_root: Path,
+    options: SplitOptions = SplitOptions(),
+    parts: Optional[Collection[int]] = None,
+    part_filter: Optional[PartFilter] = None,
+    read_size: int = STREAM_READ_SIZE,
+) -> int:
+    """``process_cache_file`` for a cache read from a binary file object; no index or journal is used."""
+    cache_parts = iter_stream_parts(
+        stream,
+        cache_name,
+        parts,
+        options.decompress_workers,
+        read_size,
+        options.max_memory,
+        part_filter,
+        options.pooled_lz4,
+    )
+    complete = parts is None and part_filter is None
+    with PartOutput(cache_name, output_root, options, complete, None) as output:
+        for part in cache_parts:
+            output.add(part)
+    return output.written
+
+
+def part_writer(writer_threads: int, max_memory: Optional[int] = None) -> WriteBehind:
+    """A ``WriteBehind`` for split artifacts whose queue stays within a share of ``max_memory``."""
+    queued = WRITE_QUEUE_BYTES if max_memory is None else min(WRITE_QUEUE_BYTES, max_memory // IN_FLIGHT_SHARE)
+    return WriteBehind(writer_threads, queued)
+
+
+def _load_or_build_index(cache_path: Path, output_root: Path, use_index: bool = True) -> List[ChunkEntry]:
+    index_path = index_path_for(cache_path, output_root)
+    entries = load_index(index_path, cache_path) if use_index else None
+    if entries is None:
+        entries = []
+        with _map_cache_file(cache_path) as data:
+            for _ in _scan_chunks(data, entries):
+                pass
+        if use_index:
+            write_index(index_path, cache_path, entries)
+    return entries
+
+
+def cache_key_table(cache_path: Path, output_root: Path, use_index: bool = True) -> Optional[KeyTable]:
+    """Parse the key table in the metadata block before the first delimiter, or None when none is recognised."""
+    entries = _load_or_build_index(cache_path, output_root, use_index)
+    with _map_cache_file(cache_path) as data:
+        end = data.find(DELIMITER)
+        header = data[:end] if end != -1 else b""
+    table = parse_key_table(header, entries)
+    if table is not None and table.ordered_by == "position":
+        logging.warning("The key table of %s does not locate its chunks; assuming table order", cache_path.name)
+    return table
+
+
+def _parts_for_keys(cache_path: Path, output_root: Path, keys: Collection[str], use_index: bool) -> Set[int]:
+    table = cache_key_table(cache_path, output_root, use_index)
+    if table is None:
+        logging.warning("No key table recognised in the header of %s; --keys selects nothing there", cache_path.name)
+        return set()
+    parts, unmatched = select_parts(table, keys)
+    matched = len(keys) - len(unmatched)
+    logging.info("Selected %s part(s) of %s for %s of %s key(s)", len(parts), cache_path.name, matched, len(keys))
+    if unmatched:
+        logging.debug("Keys not in %s: %s", cache_path.name, ", ".join(unmatched))
+    return parts
+
+
+def export_keys(cache_path: Path, output_root: Path, use_index: bool = True) -> int:
+    """Write ``<stem>.keys.tsv`` (key, part) for ``cache_path`` and return the number of keys, 0 without a table."""
+    table = cache_key_table(cache_path, output_root, use_index)
+    if table is None:
+        logging.warning("No key table recognised in the header of %s", cache_path.name)
+        return 0
+    write_keys(keys_path_for(cache_path.stem, output_root), table)
+    logging.info(
+        "%s: %s key(s) in %s-byte records at header offset %s (matched by chunk %s)",
+        cache_path.name,
+        len(table.keys),
+        table.record_size,
+        table.position,
+        table.ordered_by,
+    )
+    return len(table.keys)
+
+
+def survey_cache(cache_path: Path, output_root: Path, use_index: bool = True) -> CacheStats:
+    """Collect ``CacheStats`` from the chunk index or size headers alone; nothing is decompressed or written."""
+    stats = CacheStats()
+    stats.add_cache(cache_path.stat().st_size)
+    entries = load_index(index_path_for(cache_path, output_root), cache_path) if use_index else None
+    if entries is not None:
+        for index, entry in enumerate(entries, start=1):
+            stats.add_chunk(cache_path.name, index, entry.length, entry.header_len, entry.uncompressed_size)
+        return stats
+
+    # Without trial decodes, delimiter bytes inside a payload can make the chunk count approximate.
+    with _map_cache_file(cache_path) as data:
+        for index, (_, chunk) in enumerate(_iterate_cache_chunks(data, trial_decode=False), start=1):
+            try:
+                blob_size, header_len = _detect_blob_size(chunk)
+            except ValueError:
+                blob_size, header_len = 0, 0
+            stats.add_chunk(cache_path.name, index, len(chunk), header_len, blob_size)
+    return stats
+
+
+def read_cache_part(cache_path: Path, output_root: Path, part: int) -> bytes:
+    """Return the decompressed blob for 1-based ``part`` of ``cache_path`` using (and maintaining) its index."""
+    entries = _load_or_build_index(cache_path, output_root)
+    if not 1 <= part <= len(entries):
+        raise ValueError(f"{cache_path.name} has {len(entries)} part(s); part {part} does not exist")
+    entry = entries[part - 1]
+    if not entry.header_len:
+        raise ValueError(f"Part {part} of {cache_path.name} has no usable size header")
+
+    with _map_cache_file(cache_path) as data:
+        with read_chunk(data, entry) as chunk:
+            return bytes(_decompress(chunk[entry.header_len :], entry.uncompressed_size))
 
 
 def main() -> None:
@@ -103,6 +936,105 @@ def main() -> None:
         default=None,
         help="Optional single cache filename to process (must exist in input-dir)",
     )
+    parser.add_argument(
+        "--stdin",
+        metavar="NAME",
+        default=None,
+        help="Split one cache read from standard input (e.g. tar -xOf caches.tar NAME | ...), naming its outputs "
+        "as if it were the file NAME; --input-dir and --single are ignored",
+    )
+    add_filter_arguments(parser)
+    parser.add_argument(
+        "--keys",
+        nargs="+",
+        default=None,
+        help="Only write the parts the cache header's key table maps these hex shader keys (or unique prefixes) to",
+    )
+    parser.add_argument(
+        "--key-file",
+        type=Path,
+        default=None,
+        help="Like --keys, reading one key per line (a <stem>.keys.tsv from --list-keys works too)",
+    )
+    parser.add_argument(
+        "--list-keys",
+        action="store_true",
+        help="Write <stem>.keys.tsv with the key table of every cache instead of splitting",
+    )
+    parser.add_argument(
+        "--stats-only",
+        action="store_true",
+        help="Report chunk counts, sizes, ratios and header widths from the chunk headers without splitting",
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Always rescan caches and do not read or write chunk index sidecars",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess every cache even if run_manifest.json says it is unchanged since the last run",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the caches an interrupted run left unfinished, skipping the parts its journal marks as written",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=parse_size,
+        default=None,
+        help="RSS budget for the whole run, e.g. 2G; caps --jobs and throttles read-ahead and decompression",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of cache files to process in parallel (0 = one per CPU, default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="files",
+        help="Write loose part files or one <stem>.shaderpack per cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dedup-links",
+        action="store_true",
+        help="With --output-format dedup, hardlink each part back into <stem>/ under its usual name",
+    )
+    parser.add_argument(
+        "--raw-parts",
+        choices=RAW_PART_MODES,
+        default=None,
+        help="When to keep the compressed .cache_part next to the decompressed blob "
+        "(default: always, or on-failure with --output-format dedup)",
+    )
+    parser.add_argument(
+        "--decompress-threads",
+        type=int,
+        default=1,
+        help="Threads used to decompress chunks within one cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pooled-lz4",
+        action="store_true",
+        help="Decode LZ4 into reused buffers through liblz4 via ctypes (experimental; default: python-lz4)",
+    )
+    parser.add_argument(
+        "--writer-threads",
+        type=int,
+        default=1,
+        help="Threads writing loose part files behind decompression; 0 writes inline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default=None,
+        help="Put loose part files directly in <stem>/ or in hash-prefix shard directories below it; fixed per "
+        "output directory once it holds parts (default: the recorded layout, else flat)",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -116,10 +1048,43 @@ def main() -> None:
     input_dir: Path = args.input_dir
     output_dir: Path = args.output_dir
 
+    part_filter = filter_from_args(args)
+    keys: Optional[List[str]] = None
+    if args.keys is not None or args.key_file is not None:
+        keys = [*(args.keys or ()), *(read_key_file(args.key_file) if args.key_file else ())]
+        if not keys:
+            raise SystemExit("--key-file lists no keys")
+
+    if args.stdin:
+        if keys is not None or args.list_keys or args.stats_only or args.resume:
+            raise SystemExit(
+                "--keys, --key-file, --list-keys, --stats-only and --resume need cache files and cannot be used "
+                "with --stdin"
+            )
+        # A piped cache has no file to fingerprint or index, so it always runs in full and in this process.
+        output_dir.mkdir(parents=True, exist_ok=True)
+        options = SplitOptions(
+            output_format=args.output_format,
+            raw_parts=args.raw_parts,
+            dedup_links=args.dedup_links,
+            decompress_workers=args.decompress_threads,
+            max_memory=args.max_memory,
+            writer_threads=args.writer_threads,
+            layout=resolve_layout(output_dir, args.layout),
+            pooled_lz4=args.pooled_lz4,
+        )
+        written = process_cache_stream(sys.stdin.buffer, args.stdin, output_dir, options, part_filter=part_filter)
+        logging.info("Finished. Wrote %s shader blobs from standard input.", written)
+        log_peak_rss(args.max_memory)
+        return
+
     if not input_dir.exists():
         raise SystemExit(f"Input directory not found: {input_dir}")
+    if args.resume and (part_filter is not None or keys is not None):
+        raise SystemExit("--resume continues a full split and cannot be combined with part or key selection")
 
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if not args.stats_only:
+        output_dir.mkdir(parents=True, exist_ok=True)
 
     targets = []
     if args.single:
@@ -134,11 +1099,93 @@ def main() -> None:
         logging.warning("No cache files found under %s", input_dir)
         return
 
+    if args.stats_only:
+        started = time.perf_counter()
+        surveyor = partial(survey_cache, output_root=output_dir, use_index=not args.no_index)
+        total = CacheStats()
+        failed = 0
+        for cache_file, stats, error in run_per_file(surveyor, targets, min(resolve_jobs(args.jobs), len(targets))):
+            if error is not None:
+                logging.error("Failed to survey %s: %s", cache_file.name, error)
+                failed += 1
+                continue
+            total.merge(stats)
+        total.log_report(time.perf_counter() - started)
+        if failed:
+            raise SystemExit(f"{failed} cache file(s) failed; see the log above")
+        return
+
+    if args.list_keys:
+        lister = partial(export_keys, output_root=output_dir, use_index=not args.no_index)
+        failed = 0
+        listed = 0
+        for cache_file, count, error in run_per_file(lister, targets, min(resolve_jobs(args.jobs), len(targets))):
+            if error is not None:
+                logging.error("Failed to read the key table of %s: %s", cache_file.name, error)
+                failed += 1
+            listed += bool(count)
+        logging.info("Finished. Listed keys for %s of %s cache file(s).", listed, len(targets))
+        if failed:
+            raise SystemExit(f"{failed} cache file(s) failed; see the log above")
+        return
+
+    layout = resolve_layout(output_dir, args.layout)
+    raw_parts = args.raw_parts or default_raw_parts(args.output_format)
+    # Selective (--parts/--keys/size/sample) runs neither consult nor update the incremental run manifest.
+    manifest = None
+    if part_filter is None and keys is None:
+        settings = {"output_format": args.output_format, "dedup_links": args.dedup_links, "raw_parts": raw_parts}
+        manifest = RunManifest(output_dir, "split", settings)
+        if not args.force:
+            targets, unchanged = manifest.partition(targets)
+            if unchanged:
+                logging.info("Skipping %s unchanged cache file(s); pass --force to redo them", len(unchanged))
+            if not targets:
+                manifest.save()
+                logging.info("Finished. Nothing to do.")
+                return
+
+    jobs = plan_jobs(min(resolve_jobs(args.jobs), len(targets)), args.max_memory)
+    options = SplitOptions(
+        output_format=args.output_format,
+        raw_parts=raw_parts,
+        dedup_links=args.dedup_links,
+        use_index=not args.no_index,
+        decompress_workers=args.decompress_threads,
+        max_memory=worker_share(args.max_memory, jobs),
+        writer_threads=args.writer_threads,
+        layout=layout,
+        resume=args.resume,
+        pooled_lz4=args.pooled_lz4,
+    )
+    if output_dir.is_dir():
+        remove_stale_temps(output_dir)
+    worker = partial(process_cache_file, output_root=output_dir, options=options, keys=keys, part_filter=part_filter)
+    objects_before = count_objects(output_dir) if args.output_format == "dedup" else 0
+
     total_parts = 0
-    for cache_file in targets:
-        total_parts += process_cache_file(cache_file, output_dir)
+    failed = 0
+    succeeded = []
+    for cache_file, written, error in run_per_file(worker, targets, jobs):
+        if error is not None:
+            logging.error("Failed to process %s: %s", cache_file.name, error)
+            failed += 1
+            continue
+        total_parts += written
+        succeeded.append(cache_file)
+
+    if manifest is not None:
+        manifest.record(succeeded)
+        manifest.save()
 
-    logging.info("Finished. Wrote %s shader blobs from %s cache file(s).", total_parts, len(targets))
+    logging.info("Finished. Wrote %s shader blobs from %s cache file(s).", total_parts, len(targets) - failed)
+    log_peak_rss(args.max_memory, jobs)
+    if args.output_format == "dedup":
+        manifests = (manifest_path_for(cache_file.stem, output_dir) for cache_file in targets)
+        keys = [key for path in manifests if path.exists() for _, key in read_manifest(path)]
+        log_dedup_summary(keys, count_objects(output_dir) - objects_before)
+    if failed:
+        raise SystemExit(f"{failed} cache file(s) failed; see the log above")
 
 
 if __name__ == "__main__":
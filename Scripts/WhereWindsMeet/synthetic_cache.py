@@ -0,0 +1,188 @@
+"""Generate synthetic Where Winds Meet shader caches for benchmarking without the proprietary game files."""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import struct
+from pathlib import Path
+from typing import List, NamedTuple
+
+import lz4.block
+
+DELIMITER = b"ZZZ4"
+DXBC_MAGIC = b"DXBC"
+DXIL_SIGNATURE = b"DXIL"
+BITCODE_MAGIC = b"BC\xC0\xDE"
+
+_DXBC_HEADER = struct.Struct("<4s16sHHII")  # magic, digest, major, minor, total size, chunk count
+_CHUNK_HEADER = struct.Struct("<4sI")  # tag, payload size
+_PROGRAM_HEADER = struct.Struct("<II4sIII")  # program version, size in dwords, "DXIL", DXIL version, offset, size
+# Default share of chunks with a 64-bit size header, so the default corpus exercises both header widths.
+HEADER64_RATIO = 0.1
+_CACHE_HEADER = struct.Struct("<8sII")  # magic, version, chunk count
+_KEY_RECORD = struct.Struct("<QQII")  # shader key, hash, chunk offset (past the delimiter), blob size
+_SHADER_KINDS = (0, 1, 5)  # pixel, vertex, compute
+_ENTRY_NAMES = ("PSMain", "VSMain", "CSMain", "MainPS", "main", "GBufferPS", "ShadowVS", "TonemapCS")
+# A vocabulary of repeated "instruction" words keeps the bitcode about as compressible as real DXIL.
+_VOCABULARY = [bytes(random.Random(word).getrandbits(8) for _ in range(8)) for word in range(64)]
+
+
+class SyntheticCache(NamedTuple):
+    path: Path
+    chunks: int
+    header64_chunks: int
+    decompressed_bytes: int
+
+
+def _bitcode(rng: random.Random, size: int) -> bytes:
+    words = rng.choices(_VOCABULARY, k=max(1, (size - len(BITCODE_MAGIC)) // 8 + 1))
+    body = bytearray(b"".join(words))
+    for _ in range(len(body) // 64):
+        body[rng.randrange(len(body))] = rng.getrandbits(8)
+    return BITCODE_MAGIC + bytes(body[: max(0, size - len(BITCODE_MAGIC))])
+
+
+def _dxil_program(rng: random.Random, bitcode: bytes) -> bytes:
+    kind = rng.choice(_SHADER_KINDS)
+    version = (kind << 16) | (6 << 4) | rng.randrange(7)
+    size = _PROGRAM_HEADER.size + len(bitcode)
+    header = _PROGRAM_HEADER.pack(version, (size + 3) // 4, DXIL_SIGNATURE, 0x106, 16, len(bitcode))
+    return header + bitcode
+
+
+def synthetic_dxbc(rng: random.Random, bitcode_size: int) -> bytes:
+    """Return a DXBC container with SFI0/ISG1/OSG1/PSV0/HASH chunks and a DXIL chunk of ``bitcode_size`` bytes."""
+    chunks = [
+        (b"SFI0", struct.pack("<Q", rng.getrandbits(16))),
+        (b"ISG1", bytes(rng.randrange(8, 16) * 8)),
+        (b"OSG1", bytes(rng.randrange(4, 8) * 8)),
+        (b"PSV0", bytes(52 + rng.randrange(4) * 4)),
+        (b"HASH", rng.randbytes(20)),
+        (b"DXIL", _dxil_program(rng, _bitcode(rng, bitcode_size))),
+    ]
+    offsets: List[int] = []
+    position = _DXBC_HEADER.size + 4 * len(chunks)
+    body = bytearray()
+    for tag, payload in chunks:
+        offsets.append(position + len(body))
+        body += _CHUNK_HEADER.pack(tag, len(payload)) + payload
+    total = position + len(body)
+    header = _DXBC_HEADER.pack(DXBC_MAGIC, rng.randbytes(16), 1, 0, total, len(chunks))
+    return header + struct.pack(f"<{len(offsets)}I", *offsets) + bytes(body)
+
+
+def synthetic_ir_text(rng: random.Random, lines: int = 200) -> str:
+    """Return dxc-style textual IR whose ``!dx.entryPoints`` metadata names a random entry function."""
+    entry = rng.choice(_ENTRY_NAMES)
+    body = [f"  %{index} = fadd fast float %{index - 1}, 1.000000e+00" for index in range(1, lines)]
+    return "\n".join(
+        [
+            "; shader hash: " + rng.randbytes(16).hex(),
+            "define void @main() {",
+            *body,
+            "  ret void",
+            "}",
+            "!dx.entryPoints = !{!9}",
+            f'!9 = !{{void ()* @main, !"{entry}", !10, null, null}}',
+            "",
+        ]
+    )
+
+
+def write_synthetic_cache(
+    path: Path,
+    chunk_count: int,
+    min_size: int = 2 * 1024,
+    max_size: int = 64 * 1024,
+    header64_ratio: float = HEADER64_RATIO,
+    seed: int = 0,
+    key_table: bool = False,
+) -> SyntheticCache:
+    """Write ``chunk_count`` chunks with bitcode sizes in [``min_size``, ``max_size``], plus an optional key table."""
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = _CACHE_HEADER.pack(b"WWMCACHE", 1, chunk_count)
+    filler = rng.randbytes(48)
+    chunks: List[bytes] = []
+    sizes: List[int] = []
+    header64_chunks = 0
+    for _ in range(chunk_count):
+        blob = synthetic_dxbc(rng, rng.randint(min_size, max_size))
+        if rng.random() < header64_ratio:
+            size_header = struct.pack("<Q", len(blob))
+            header64_chunks += 1
+        else:
+            size_header = struct.pack("<I", len(blob))
+        chunks.append(size_header + lz4.block.compress(blob, store_size=False))
+        sizes.append(len(blob))
+
+    if key_table:
+        position = len(header) + chunk_count * _KEY_RECORD.size
+        records = []
+        for chunk, size in zip(chunks, sizes):
+            position += len(DELIMITER)
+            records.append(_KEY_RECORD.pack(rng.getrandbits(64), rng.getrandbits(64), position, size))
+            position += len(chunk)
+        header += b"".join(sorted(records))
+    else:
+        header += filler
+
+    with path.open("wb") as handle:
+        handle.write(header)
+        for chunk in chunks:
+            handle.write(DELIMITER)
+            handle.write(chunk)
+    return SyntheticCache(path, chunk_count, header64_chunks, sum(sizes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write synthetic Where Winds Meet shader caches")
+    parser.add_argument("--output-dir", type=Path, required=True, help="Directory receiving the *.cache files")
+    parser.add_argument("--caches", type=int, default=1, help="Number of cache files (default: %(default)s)")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per cache (default: %(default)s)")
+    parser.add_argument("--min-size", type=int, default=2 * 1024, help="Smallest bitcode size (default: %(default)s)")
+    parser.add_argument("--max-size", type=int, default=64 * 1024, help="Largest bitcode size (default: %(default)s)")
+    parser.add_argument(
+        "--header64-ratio",
+        type=float,
+        default=HEADER64_RATIO,
+        help="Share of chunks written with a 64-bit size header (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--key-table",
+        action="store_true",
+        help="Put a shader key table in the metadata block instead of random filler",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    parser.add_argument("--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s")
+
+    if args.min_size > args.max_size:
+        raise SystemExit("--min-size must not exceed --max-size")
+
+    for index in range(args.caches):
+        cache = write_synthetic_cache(
+            args.output_dir / f"synthetic{index:03d}.cache",
+            args.chunks,
+            args.min_size,
+            args.max_size,
+            args.header64_ratio,
+            args.seed + index,
+            args.key_table,
+        )
+        logging.info(
+            "Wrote %s: %s chunk(s), %s with 64-bit headers, %.1f MB compressed / %.1f MB decompressed",
+            cache.path,
+            cache.chunks,
+            cache.header64_chunks,
+            cache.path.stat().st_size / 1e6,
+            cache.decompressed_bytes / 1e6,
+        )
+
+
+if __name__ == "__main__":
+    main()
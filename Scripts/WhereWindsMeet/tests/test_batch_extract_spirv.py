@@ -0,0 +1,52 @@
+import random
+import struct
+
+import lz4.block
+from batch_extract_spirv import ExtractOptions, _process_cache
+from run_journal import journal_path_for, read_journal
+from shader_pack import _FOOTER, _HEADER, _RECORD, PackReader, pack_path_for
+from split_shader_cache import DELIMITER, SplitOptions
+from synthetic_cache import synthetic_dxbc, write_synthetic_cache
+
+
+def _chunk(blob):
+    return struct.pack("<I", len(blob)) + lz4.block.compress(blob, store_size=False)
+
+
+def _record_count(pack_path):
+    data = pack_path.read_bytes()
+    index_offset = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)[0]
+    count, position = 0, _HEADER.size
+    while position < index_offset:
+        position += _RECORD.size + _RECORD.unpack_from(data, position)[2]
+        count += 1
+    return count
+
+
+def test_repacking_without_raw_parts_adds_no_records(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "synthetic.cache", 6, seed=7).path
+    split = SplitOptions(output_format="pack", decompressed=True, use_index=False, raw_parts="never")
+    options = ExtractOptions(split, emit_ir=False)
+    pack_path = pack_path_for(cache.stem, tmp_path / "out")
+
+    assert _process_cache(cache, tmp_path / "out", options) == (6, 6, 0)
+    records = _record_count(pack_path)
+    assert _process_cache(cache, tmp_path / "out", options) == (6, 6, 0)
+
+    assert records == 12 and _record_count(pack_path) == records
+    with PackReader(pack_path) as reader:
+        assert sorted(set(kind for _, kind in reader.entries())) == ["dxil", "lz4_decompressed"]
+
+
+def test_journal_records_dxil_only_for_extracted_parts(tmp_path):
+    rng = random.Random(8)
+    blobs = [synthetic_dxbc(rng, 4096), rng.randbytes(4096), synthetic_dxbc(rng, 4096)]
+    cache = tmp_path / "mixed.cache"
+    cache.write_bytes(b"metadata" + b"".join(DELIMITER + _chunk(blob) for blob in blobs))
+    options = ExtractOptions(SplitOptions(use_index=False), emit_ir=False)
+
+    assert _process_cache(cache, tmp_path / "out", options) == (3, 2, 1)
+
+    _, entries = read_journal(journal_path_for(cache.stem, tmp_path / "out"))
+    assert sorted(part for part, stage in entries if stage == "dxil") == [1, 3]
+    assert sorted(part for part, stage in entries if stage == "split") == [1, 2, 3]
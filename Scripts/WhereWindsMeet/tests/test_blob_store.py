@@ -0,0 +1,45 @@
+import random
+import struct
+
+import lz4.block
+from blob_store import count_objects, manifest_path_for, merge_manifest, object_path, read_manifest, write_manifest
+from split_shader_cache import DELIMITER, SplitOptions, process_cache_file
+
+
+def _write_cache(path, blobs):
+    chunks = (struct.pack("<I", len(blob)) + lz4.block.compress(blob, store_size=False) for blob in blobs)
+    path.write_bytes(b"metadata" + b"".join(DELIMITER + chunk for chunk in chunks))
+    return path
+
+
+def test_duplicate_parts_share_one_object_and_its_links(tmp_path):
+    rng = random.Random(10)
+    common, other = rng.randbytes(512), rng.randbytes(512)
+    output_root = tmp_path / "out"
+    options = SplitOptions(output_format="dedup", dedup_links=True, use_index=False)
+    first = _write_cache(tmp_path / "first.cache", [common, other, common])
+    second = _write_cache(tmp_path / "second.cache", [common])
+
+    assert process_cache_file(first, output_root, options) == 3
+    assert process_cache_file(second, output_root, options) == 1
+
+    assert count_objects(output_root) == 2
+    rows = dict(read_manifest(manifest_path_for("first", output_root)))
+    rows.update(read_manifest(manifest_path_for("second", output_root)))
+    assert rows["first_part0001"] == rows["first_part0003"] == rows["second_part0001"] != rows["first_part0002"]
+    shared = object_path(output_root, rows["first_part0001"])
+    assert shared.read_bytes() == common
+    # The object plus one hardlink per part that decompressed to it.
+    assert shared.stat().st_nlink == 4
+    assert object_path(output_root, rows["first_part0002"]).stat().st_nlink == 2
+    link = output_root / "first" / "first_part0003.cache_part.lz4_decompressed"
+    assert link.stat().st_ino == shared.stat().st_ino
+
+
+def test_merged_manifest_replaces_only_the_given_rows(tmp_path):
+    manifest = manifest_path_for("cache", tmp_path)
+    write_manifest(manifest, [("cache_part0001", "aa"), ("cache_part0002", "bb")])
+
+    merge_manifest(manifest, [("cache_part0002", "cc"), ("cache_part0003", "dd")])
+
+    assert read_manifest(manifest) == [("cache_part0001", "aa"), ("cache_part0002", "cc"), ("cache_part0003", "dd")]
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from cache_index import index_path_for, load_index, read_chunk
+from split_shader_cache import iter_cache_parts, read_cache_part
+from synthetic_cache import write_synthetic_cache
+
+
+def test_index_parts_match_a_full_scan(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "indexed.cache", 40, max_size=4096, header64_ratio=0.3, seed=13).path
+    output_root = tmp_path / "out"
+    scanned = [bytes(part.decompressed) for part in iter_cache_parts(cache, output_root, use_index=False)]
+
+    assert read_cache_part(cache, output_root, 17) == scanned[16]
+    entries = load_index(index_path_for(cache, output_root), cache)
+    assert entries is not None and len(entries) == 40
+    assert [bytes(part.decompressed) for part in iter_cache_parts(cache, output_root, parts={3, 40})] == [
+        scanned[2],
+        scanned[39],
+    ]
+    with pytest.raises(ValueError):
+        read_cache_part(cache, output_root, 41)
+
+
+def test_stale_index_is_ignored(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "stale.cache", 5, max_size=4096).path
+    index_path = index_path_for(cache, tmp_path / "out")
+    read_cache_part(cache, tmp_path / "out", 1)
+    assert load_index(index_path, cache) is not None
+
+    stat = cache.stat()
+    os.utime(cache, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_index(index_path, cache) is None
+
+
+def test_chunk_that_changed_under_its_index_is_rejected(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "changed.cache", 5, max_size=4096).path
+    read_cache_part(cache, tmp_path / "out", 1)
+    entry = load_index(index_path_for(cache, tmp_path / "out"), cache)[2]
+    data = bytearray(cache.read_bytes())
+    data[entry.offset + entry.length // 2] ^= 0xFF
+
+    with pytest.raises(ValueError):
+        read_chunk(bytes(data), entry)
@@ -0,0 +1,29 @@
+from cache_keys import KeyTable, select_parts
+from split_shader_cache import SplitOptions, cache_key_table, process_cache_file
+from synthetic_cache import write_synthetic_cache
+
+
+def test_key_table_maps_every_chunk(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "keyed.cache", 30, max_size=4096, key_table=True, seed=12).path
+
+    table = cache_key_table(cache, tmp_path / "out", use_index=False)
+
+    assert table is not None and table.ordered_by == "offset"
+    assert sorted(table.keys.values()) == list(range(1, 31))
+    assert cache_key_table(write_synthetic_cache(tmp_path / "plain.cache", 30).path, tmp_path / "out") is None
+
+
+def test_keys_select_only_their_parts(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "keyed.cache", 30, max_size=4096, key_table=True, seed=12).path
+    table = cache_key_table(cache, tmp_path / "out")
+    wanted = sorted(table.keys.items(), key=lambda item: item[1])[4:6]
+
+    assert process_cache_file(cache, tmp_path / "out", SplitOptions(), keys=[key for key, _ in wanted]) == 2
+    names = sorted(path.name for path in (tmp_path / "out" / "keyed").glob("*.lz4_decompressed"))
+    assert names == [f"keyed_part{part:04d}.cache_part.lz4_decompressed" for _, part in wanted]
+
+
+def test_prefixes_must_be_long_and_unique():
+    table = KeyTable(0, 24, "offset", {"0123456789abcdef": 1, "0123456799999999": 2, "fedcba9876543210": 3})
+
+    assert select_parts(table, ["0x0123456789ABCDEF", "fedcba98", "01234567", "fedc"]) == ({1, 3}, ["01234567", "fedc"])
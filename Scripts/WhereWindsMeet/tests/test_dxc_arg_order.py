@@ -0,0 +1,49 @@
+from dxc_arg_order import PROBE_INTERVAL, SKIP_AFTER_FAILURES, ArgSetOrder, save_learned, shader_class
+from tool_scheduler import ToolRun
+
+DUMPBIN = ("-dumpbin",)
+DXIL = ("-dumpbin", "-dxil")
+
+
+def _run(group, variant, status):
+    return ToolRun("shader", group, variant, ("dxc",), status, 0 if status == "ok" else 1, 0.1)
+
+
+def test_most_successful_set_is_tried_first_per_class():
+    order = ArgSetOrder([DUMPBIN, DXIL])
+    for _ in range(3):
+        order.record("ps_6_6", DUMPBIN, False)
+        order.record("ps_6_6", DXIL, True)
+
+    assert order.attempts("ps_6_6") == [DXIL, DUMPBIN]
+    assert order.attempts("vs_6_0") == [DUMPBIN, DXIL]
+    assert list(order) == [DUMPBIN, DXIL]
+
+
+def test_set_that_never_worked_is_skipped_except_on_probes():
+    order = ArgSetOrder([DUMPBIN, DXIL])
+    for _ in range(SKIP_AFTER_FAILURES):
+        order.record("cs_6_5", DUMPBIN, False)
+
+    attempts = [order.attempts("cs_6_5") for _ in range(PROBE_INTERVAL)]
+    assert attempts[:-1] == [[DXIL]] * (PROBE_INTERVAL - 1)
+    assert attempts[-1] == [DXIL, DUMPBIN]
+
+
+def test_learned_counts_survive_a_save_and_load(tmp_path):
+    stats = tmp_path / "stats.json"
+    runs = [_run("ps_6_6", "-dumpbin -dxil", "ok"), _run("ps_6_6", "-dumpbin", "failed")]
+    # A timeout says nothing about the arguments, and calls without a class are not counted.
+    runs += [_run("ps_6_6", "-dumpbin -dxil", "timeout"), _run("", "-dumpbin", "ok")]
+
+    save_learned([DUMPBIN, DXIL], stats, runs)
+    save_learned([DUMPBIN, DXIL], stats, runs[:1])
+
+    loaded = ArgSetOrder.load([DUMPBIN, DXIL], stats)
+    assert loaded.counts == {"ps_6_6": {"-dumpbin -dxil": [2, 0], "-dumpbin": [0, 1]}}
+    assert loaded.attempts("ps_6_6") == [DXIL, DUMPBIN]
+
+
+def test_shader_class_names():
+    assert shader_class((0 << 16) | (6 << 4) | 6) == "ps_6_6"
+    assert shader_class((5 << 16) | (6 << 4) | 0) == "cs_6_0"
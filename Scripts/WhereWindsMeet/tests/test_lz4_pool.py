@@ -0,0 +1,61 @@
+import random
+
+import lz4.block
+import pytest
+from batch_extract_spirv import _iter_parts
+from lz4_pool import BufferPool, size_class
+from split_shader_cache import SplitOptions, iter_cache_parts
+from synthetic_cache import synthetic_dxbc, write_synthetic_cache
+
+pytestmark = pytest.mark.skipif(not BufferPool().pooled, reason="no usable LZ4_decompress_safe")
+
+
+def test_pooled_decoder_matches_python_lz4():
+    rng = random.Random(3)
+    pool = BufferPool()
+    for size in (0, 1, 100, 4096, 70_000, 300_000):
+        blob = synthetic_dxbc(rng, size)
+        block = lz4.block.compress(blob, store_size=False)
+        decoded = pool.decompress(block, len(blob))
+        assert isinstance(decoded, memoryview)
+        assert bytes(decoded) == lz4.block.decompress(block, uncompressed_size=len(blob)) == blob
+        pool.recycle(decoded)
+
+
+def test_pooled_and_default_split_agree_on_synthetic_cache(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "synthetic.cache", 24, header64_ratio=0.25, seed=5).path
+
+    def decoded(pooled):
+        parts = iter_cache_parts(cache, tmp_path / "out", use_index=False, pooled_lz4=pooled)
+        return [bytes(part.decompressed) for part in parts]
+
+    assert decoded(True) == decoded(False)
+
+
+def test_corrupt_block_raises_without_overrun():
+    blob = synthetic_dxbc(random.Random(4), 8192)
+    block = lz4.block.compress(blob, store_size=False)
+    capacity = len(blob) // 2
+    pool = BufferPool()
+    sentinel = bytearray(b"\xa5" * size_class(capacity))
+    pool.release(sentinel)
+
+    with pytest.raises(lz4.block.LZ4BlockError):
+        pool.decompress(block, capacity)
+    with pytest.raises(lz4.block.LZ4BlockError):
+        pool.decompress(block[: len(block) // 3] + bytes(64), len(blob))
+    with pytest.raises(lz4.block.LZ4BlockError):
+        lz4.block.decompress(block, uncompressed_size=capacity)
+
+    assert sentinel[capacity:] == b"\xa5" * (len(sentinel) - capacity)
+
+
+def test_batch_parts_outlive_their_pooled_buffers(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "synthetic.cache", 12, seed=6).path
+    options = SplitOptions(use_index=False, pooled_lz4=True)
+
+    # Held across the whole run, as views from the DXBC parser may be; recycled buffers would change under them.
+    kept = [part.decompressed for part in _iter_parts(cache, tmp_path / "out", options, None)]
+
+    assert all(isinstance(blob, bytes) for blob in kept)
+    assert kept == [bytes(part.decompressed) for part in iter_cache_parts(cache, tmp_path / "out", use_index=False)]
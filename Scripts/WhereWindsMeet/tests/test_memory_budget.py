@@ -0,0 +1,26 @@
+import argparse
+
+import pytest
+from memory_budget import MIN_WORKER_MEMORY, parse_size, plan_jobs, worker_share
+
+
+def test_sizes_parse_with_binary_units():
+    assert [parse_size(text) for text in ("4096", "16K", "512M", "1.5GiB", "2g")] == [
+        4096,
+        16 * 1024,
+        512 * 1024**2,
+        3 * 1024**3 // 2,
+        2 * 1024**3,
+    ]
+    for text in ("0", "12X", "-1M"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_size(text)
+
+
+def test_jobs_are_capped_by_the_budget():
+    assert plan_jobs(8, None) == 8
+    assert plan_jobs(8, 3 * MIN_WORKER_MEMORY) == 3
+    assert plan_jobs(8, MIN_WORKER_MEMORY // 2) == 1
+    assert plan_jobs(2, 16 * MIN_WORKER_MEMORY) == 2
+    assert worker_share(3 * MIN_WORKER_MEMORY, 3) == MIN_WORKER_MEMORY
+    assert worker_share(None, 3) is None
@@ -0,0 +1,42 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+from output_layout import FLAT, OutputLayout, load_layout, migrate, resolve_layout
+from split_shader_cache import SplitOptions, process_cache_file
+from synthetic_cache import write_synthetic_cache
+
+SHARDED = OutputLayout("sharded", 2)
+
+
+def test_every_artifact_of_a_part_shares_a_shard():
+    cache_dir = Path("out") / "cache"
+    shard = hashlib.blake2b(b"cache_part0042", digest_size=2).hexdigest()
+    names = (
+        "cache_part0042.cache_part",
+        "cache_part0042.cache_part.lz4_decompressed",
+        "cache_part0042.cache_part.dxil",
+    )
+
+    assert {SHARDED.part_dir(cache_dir, name) for name in names} == {cache_dir / shard[:2] / shard[2:]}
+    assert SHARDED.part_path(cache_dir, "notes.txt") == cache_dir / "notes.txt"
+    assert FLAT.part_path(cache_dir, names[0]) == cache_dir / names[0]
+
+
+def test_sharded_split_migrates_back_to_flat(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "cache.cache", 20, max_size=4096).path
+    output_root = tmp_path / "out"
+    layout = resolve_layout(output_root, "sharded")
+    assert load_layout(output_root) == layout
+
+    assert process_cache_file(cache, output_root, SplitOptions(use_index=False, layout=layout)) == 20
+    sharded = layout.glob(output_root / "cache", "*.lz4_decompressed")
+    assert len(sharded) == 20 and all(path == layout.part_path(output_root / "cache", path.name) for path in sharded)
+    with pytest.raises(SystemExit):
+        resolve_layout(output_root, "flat")
+
+    assert migrate(output_root, FLAT) == 40
+    assert load_layout(output_root) == FLAT
+    # The emptied shard directories are gone.
+    assert all(path.is_file() for path in (output_root / "cache").iterdir())
+    assert len(FLAT.glob(output_root / "cache", "*.lz4_decompressed")) == 20
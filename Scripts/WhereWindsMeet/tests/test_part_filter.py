@@ -0,0 +1,57 @@
+import argparse
+
+import pytest
+from part_filter import PartFilter, add_filter_arguments, filter_from_args, parse_part_range, with_skipped
+
+
+def _filter(*argv):
+    parser = argparse.ArgumentParser()
+    add_filter_arguments(parser)
+    return filter_from_args(parser.parse_args(argv))
+
+
+def test_part_ranges_stay_ranges():
+    part_filter = _filter("--parts", "7", "100-2000000000")
+
+    assert part_filter.parts == (range(7, 8), range(100, 2000000001))
+    assert [index for index in (6, 7, 8, 99, 100, 2000000000, 2000000001) if part_filter.selects("c", index, None)] == [
+        7,
+        100,
+        2000000000,
+    ]
+
+
+def test_invalid_part_ranges_are_rejected():
+    for text in ("0", "5-3", "a-b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_part_range(text)
+
+
+def test_size_filters_and_skipped_parts(tmp_path):
+    part_filter = with_skipped(_filter("--min-size", "1K", "--max-size", "2K"), frozenset({2}))
+
+    assert [part_filter.selects("c", index, size) for index, size in ((1, 1024), (2, 1024), (3, 4096), (4, None))] == [
+        True,
+        False,
+        False,
+        False,
+    ]
+    path = tmp_path / "c_part0005.cache_part.lz4_decompressed"
+    path.write_bytes(bytes(1500))
+    assert part_filter.selects_path(path)
+
+
+def test_sampling_is_deterministic_per_seed():
+    def picked(seed):
+        part_filter = PartFilter(sample=0.25, seed=seed)
+        return [index for index in range(1, 2001) if part_filter.selects("cache", index, None)]
+
+    assert picked(1) == picked(1)
+    assert 400 < len(picked(1)) < 600
+    assert picked(1) != picked(2)
+
+
+def test_no_options_means_no_filter():
+    assert _filter() is None
+    with pytest.raises(SystemExit):
+        _filter("--min-size", "2K", "--max-size", "1K")
@@ -0,0 +1,41 @@
+from run_journal import FLUSH_EVERY, RunJournal, journal_path_for, read_journal
+from split_shader_cache import SplitOptions, process_cache_file
+from synthetic_cache import write_synthetic_cache
+
+
+def test_entries_are_flushed_in_batches_and_on_close(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "batch.cache", 1).path
+    with RunJournal(cache, tmp_path) as journal:
+        for part in range(1, FLUSH_EVERY + 2):
+            journal.record(part, "split")
+        assert len(read_journal(journal.path)[1]) == FLUSH_EVERY
+
+    assert len(read_journal(journal.path)[1]) == FLUSH_EVERY + 1
+    reopened = RunJournal(cache, tmp_path, resume=True)
+    reopened.close()
+    assert reopened.finished_parts(("split",)) == frozenset(range(1, FLUSH_EVERY + 2))
+
+
+def test_resume_after_kill_redoes_only_unjournaled_parts(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "killed.cache", 6, max_size=4096, seed=9).path
+    output_root = tmp_path / "out"
+    options = SplitOptions(decompressed=False, use_index=False, raw_parts="always")
+    assert process_cache_file(cache, output_root, options) == 6
+    part_dir = output_root / cache.stem
+    expected = {path.name: path.read_bytes() for path in part_dir.iterdir()}
+
+    # A run killed after part 3: parts 4-6 never landed and the last journal line was cut short.
+    journal_path = journal_path_for(cache.stem, output_root)
+    lines = journal_path.read_text().splitlines(keepends=True)
+    journal_path.write_text("".join(lines[:4]) + "4\tspl")
+    for name in sorted(expected)[3:]:
+        (part_dir / name).unlink()
+    # Journaled parts are not rewritten, so this one staying gone shows part 1 was skipped.
+    (part_dir / sorted(expected)[0]).unlink()
+
+    assert process_cache_file(cache, output_root, options._replace(resume=True)) == 3
+    assert {path.name: path.read_bytes() for path in part_dir.iterdir()} == {
+        name: data for name, data in expected.items() if name != sorted(expected)[0]
+    }
+    _, entries = read_journal(journal_path)
+    assert sorted(part for part, _ in entries) == [1, 2, 3, 4, 5, 6]
@@ -0,0 +1,51 @@
+import os
+
+from run_manifest import RunManifest
+
+SETTINGS = {"output_format": "files"}
+
+
+def _processed(tmp_path, *names):
+    output_root = tmp_path / "out"
+    caches = []
+    for name in names:
+        cache = tmp_path / name
+        cache.write_bytes(name.encode() * 100)
+        caches.append(cache)
+        (output_root / cache.stem).mkdir(parents=True)
+        (output_root / cache.stem / "part").write_bytes(b"x")
+    manifest = RunManifest(output_root, "split", SETTINGS)
+    manifest.record(caches)
+    manifest.save()
+    return output_root, caches
+
+
+def test_unchanged_and_touched_caches_are_skipped(tmp_path):
+    output_root, (same, touched) = _processed(tmp_path, "same.cache", "touched.cache")
+    stat = touched.stat()
+    os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    pending, unchanged = RunManifest(output_root, "split", SETTINGS).partition([same, touched])
+
+    assert (pending, unchanged) == ([], [same, touched])
+
+
+def test_changed_cache_is_redone_and_its_outputs_removed(tmp_path):
+    output_root, (kept, changed) = _processed(tmp_path, "kept.cache", "changed.cache")
+    changed.write_bytes(b"patched" * 100)
+
+    manifest = RunManifest(output_root, "split", SETTINGS)
+    assert manifest.partition([kept, changed]) == ([changed], [kept])
+    assert (output_root / "kept").is_dir() and not (output_root / "changed").exists()
+
+    # Still pending on the next run until it is recorded as processed.
+    manifest.save()
+    assert RunManifest(output_root, "split", SETTINGS).partition([changed]) == ([changed], [])
+
+
+def test_other_settings_or_stage_invalidate(tmp_path):
+    output_root, caches = _processed(tmp_path, "cache.cache")
+
+    assert RunManifest(output_root, "split", {"output_format": "pack"}).partition(caches, clean=False) == (caches, [])
+    assert RunManifest(output_root, "batch", SETTINGS).partition(caches) == (caches, [])
+    assert (output_root / "cache").is_dir()
@@ -0,0 +1,73 @@
+from output_layout import FLAT
+from shader_pack import _RECORD, PackReader, PackWriter, pack_path_for, unpack
+
+ARTIFACTS = {
+    (1, "cache_part"): b"raw one",
+    (1, "lz4_decompressed"): b"DXBC one",
+    (2, "lz4_decompressed"): b"DXBC two",
+    (2, "dxil_ir"): b"; ModuleID",
+}
+
+
+def _write_pack(tmp_path):
+    path = pack_path_for("shaders", tmp_path)
+    with PackWriter(path) as pack:
+        for (part, kind), payload in ARTIFACTS.items():
+            pack.add(part, kind, payload)
+    return path
+
+
+def test_pack_reads_back_what_was_added(tmp_path):
+    path = _write_pack(tmp_path)
+
+    with PackReader(path) as reader:
+        assert list(reader.entries()) == sorted(ARTIFACTS, key=lambda key: (key[0], key[1] != "cache_part"))
+        assert reader.parts("lz4_decompressed") == [1, 2]
+        for (part, kind), payload in ARTIFACTS.items():
+            with reader.read(part, kind) as view:
+                assert bytes(view) == payload
+
+
+def test_reopened_pack_appends_and_supersedes(tmp_path):
+    path = _write_pack(tmp_path)
+    with PackWriter(path) as pack:
+        assert (2, "dxil_ir") in pack and pack.read(1, "cache_part") == b"raw one"
+        pack.add(3, "dxil", b"BC")
+        pack.add(1, "cache_part", b"raw again")
+
+    with PackReader(path) as reader:
+        assert reader.parts() == [1, 2, 3]
+        with reader.read(1, "cache_part") as view:
+            assert bytes(view) == b"raw again"
+
+
+def test_pack_without_trailer_is_recovered(tmp_path):
+    path = _write_pack(tmp_path)
+    with PackReader(path) as reader:
+        records_end = max(offset + length for offset, length in reader.index.values())
+    # A killed writer leaves its records, then part of one more, but no trailer.
+    path.write_bytes(path.read_bytes()[:records_end] + _RECORD.pack(3, 2, 100) + b"xyz")
+
+    with PackWriter(path) as pack:
+        assert sorted(pack.index) == sorted(ARTIFACTS)
+    with PackReader(path) as reader:
+        assert sorted(reader.index) == sorted(ARTIFACTS)
+
+
+def test_unpack_writes_the_loose_file_layout(tmp_path):
+    path = _write_pack(tmp_path)
+
+    assert unpack(path, tmp_path / "out", layout=FLAT) == len(ARTIFACTS)
+    assert unpack(path, tmp_path / "only", kinds=["lz4_decompressed"], layout=FLAT) == 2
+
+    out_dir = tmp_path / "out" / "shaders"
+    assert {path.name: path.read_bytes() for path in out_dir.iterdir()} == {
+        "shaders_part0001.cache_part": b"raw one",
+        "shaders_part0001.cache_part.lz4_decompressed": b"DXBC one",
+        "shaders_part0002.cache_part.lz4_decompressed": b"DXBC two",
+        "shaders_part0002.cache_part.dxil_ir.txt": b"; ModuleID",
+    }
+    assert sorted(path.name for path in (tmp_path / "only" / "shaders").iterdir()) == [
+        "shaders_part0001.cache_part.lz4_decompressed",
+        "shaders_part0002.cache_part.lz4_decompressed",
+    ]
@@ -0,0 +1,108 @@
+import io
+import random
+import struct
+
+import lz4.block
+import split_shader_cache
+from atomic_files import remove_stale_temps, temp_path_for
+from blob_store import manifest_path_for, read_manifest
+from split_shader_cache import DELIMITER, SplitOptions, iter_cache_parts, iter_stream_parts, process_cache_file
+from split_shader_cache import survey_cache
+from synthetic_cache import write_synthetic_cache
+
+
+def _chunk(blob: bytes, size_format: str = "<I") -> bytes:
+    return struct.pack(size_format, len(blob)) + lz4.block.compress(blob, store_size=False)
+
+
+def _blob_with_delimiter(rng: random.Random) -> bytes:
+    # Incompressible bytes are stored as literals, so the delimiter inside the blob shows up in the payload as well.
+    blob = rng.randbytes(300) + DELIMITER + rng.randbytes(300)
+    assert DELIMITER in lz4.block.compress(blob, store_size=False)
+    return blob
+
+
+def _write_cache(path, blobs):
+    path.write_bytes(b"metadata" + b"".join(DELIMITER + _chunk(blob) for blob in blobs))
+    return path
+
+
+def _decoded(parts):
+    return [bytes(part.decompressed) if part.decompressed is not None else None for part in parts]
+
+
+def test_false_delimiter_inside_payload_is_merged(tmp_path):
+    rng = random.Random(1)
+    blobs = [rng.randbytes(256), _blob_with_delimiter(rng), rng.randbytes(256)]
+    cache = _write_cache(tmp_path / "false.cache", blobs)
+
+    assert _decoded(iter_cache_parts(cache, tmp_path / "out", use_index=False)) == blobs
+
+
+def test_delimiter_straddling_stream_reads(tmp_path):
+    rng = random.Random(3)
+    blobs = [rng.randbytes(256), _blob_with_delimiter(rng), rng.randbytes(256)]
+    data = _write_cache(tmp_path / "stream.cache", blobs).read_bytes()
+    second = data.index(DELIMITER, len(b"metadata") + 1)
+    # Reads that end one, two and three bytes into a delimiter, or just before or after it.
+    for read_size in range(second - 1, second + 6):
+        parts = iter_stream_parts(io.BytesIO(data), "stream.cache", read_size=read_size)
+        assert _decoded(parts) == blobs, read_size
+
+
+def test_synthetic_cache_round_trips(tmp_path):
+    # This seed produces a false delimiter whose surroundings pass the size header sanity check on both sides.
+    cache = write_synthetic_cache(tmp_path / "synthetic.cache", 2000, seed=1)
+    blobs = _decoded(iter_cache_parts(cache.path, tmp_path / "out", use_index=False))
+
+    assert len(blobs) == cache.chunks
+    assert all(blob is not None and blob.startswith(b"DXBC") for blob in blobs)
+    assert sum(map(len, blobs)) == cache.decompressed_bytes
+
+
+def test_64bit_size_headers(tmp_path):
+    rng = random.Random(2)
+    blobs = [rng.randbytes(512) for _ in range(4)]
+    formats = ["<Q", "<I", "<Q", "<Q"]
+    cache = tmp_path / "wide.cache"
+    cache.write_bytes(b"metadata" + b"".join(DELIMITER + _chunk(blob, fmt) for blob, fmt in zip(blobs, formats)))
+
+    assert _decoded(iter_cache_parts(cache, tmp_path / "out", use_index=False)) == blobs
+
+
+def test_synthetic_cache_with_mixed_headers_round_trips(tmp_path):
+    cache = write_synthetic_cache(tmp_path / "mixed.cache", 200, max_size=8192, header64_ratio=0.5, seed=5)
+    blobs = _decoded(iter_cache_parts(cache.path, tmp_path / "out", use_index=False))
+
+    assert cache.header64_chunks
+    assert None not in blobs
+    assert (len(blobs), sum(map(len, blobs))) == (cache.chunks, cache.decompressed_bytes)
+
+
+def test_resumed_dedup_split_keeps_the_manifest_whole(tmp_path):
+    rng = random.Random(4)
+    cache = _write_cache(tmp_path / "resume.cache", [rng.randbytes(256) for _ in range(3)])
+    output_root = tmp_path / "out"
+    options = SplitOptions(output_format="dedup", use_index=False)
+    assert process_cache_file(cache, output_root, options) == 3
+    stale = temp_path_for(output_root / cache.stem / "resume_part0001.cache_part")
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"partial")
+
+    assert remove_stale_temps(output_root) == 1
+    assert process_cache_file(cache, output_root, options._replace(resume=True)) == 0
+    assert len(read_manifest(manifest_path_for(cache.stem, output_root))) == 3
+
+
+def test_survey_settles_delimiters_without_decoding(tmp_path, monkeypatch):
+    rng = random.Random(6)
+    blobs = [rng.randbytes(256), _blob_with_delimiter(rng), rng.randbytes(256)]
+    cache = _write_cache(tmp_path / "survey.cache", blobs)
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("the survey decoded a chunk")
+
+    monkeypatch.setattr(split_shader_cache, "_decompress", no_decode)
+    stats = survey_cache(cache, tmp_path / "out", use_index=False)
+
+    assert (stats.chunks, stats.uncompressed_bytes) == (3, sum(map(len, blobs)))
@@ -0,0 +1,70 @@
+import sys
+import time
+from functools import partial
+
+import pytest
+from tool_scheduler import ToolScheduler, read_tool_log, shared_tool_log
+from worker_pool import run_per_file
+
+_SLEEP = "import sys, time; time.sleep(float(sys.argv[1]))"
+# Appends "<start> <end>" of its own run to the file it is given.
+_RECORD = (
+    "import sys, time; start = time.time(); time.sleep(0.3); "
+    "open(sys.argv[1], 'a').write(f'{start} {time.time()}\\n')"
+)
+
+
+def test_hanging_tool_is_killed_and_logged(tmp_path):
+    with shared_tool_log(tmp_path / "tools.tsv") as log_path:
+        with ToolScheduler(timeout=0.5, log_path=log_path) as tools:
+            started = time.perf_counter()
+            run, output = tools.run([sys.executable, "-c", _SLEEP, "30"], "hang", group="ps_6_6", variant="-dumpbin")
+            elapsed = time.perf_counter() - started
+
+    assert (run.status, output) == ("timeout", None)
+    assert elapsed < 10
+    logged = read_tool_log(log_path)
+    assert [(entry.label, entry.group, entry.variant, entry.status) for entry in logged] == [
+        ("hang", "ps_6_6", "-dumpbin", "timeout")
+    ]
+    assert logged[0].returncode is not None and logged[0].returncode != 0
+    assert logged[0].seconds == pytest.approx(0.5, abs=0.4)
+
+
+def test_exit_code_and_output_are_recorded(tmp_path):
+    with shared_tool_log(tmp_path / "tools.tsv") as log_path:
+        with ToolScheduler(log_path=log_path) as tools:
+            ok, text = tools.run([sys.executable, "-c", "print('ir')"], "good")
+            failed, _ = tools.run([sys.executable, "-c", "raise SystemExit(3)"], "bad")
+            missing, _ = tools.run(["no-such-tool-here"], "gone")
+
+    assert (ok.status, ok.returncode, text.strip()) == ("ok", 0, "ir")
+    assert (failed.status, failed.returncode) == ("failed", 3)
+    assert (missing.status, missing.returncode) == ("missing", None)
+    assert [(run.label, run.returncode) for run in read_tool_log(log_path)] == [("good", 0), ("bad", 3), ("gone", None)]
+
+
+def test_stdout_path_is_only_created_on_success(tmp_path):
+    with ToolScheduler() as tools:
+        tools.run([sys.executable, "-c", "print('ir')"], "good", tmp_path / "good.txt")
+        tools.run([sys.executable, "-c", "raise SystemExit(1)"], "bad", tmp_path / "bad.txt")
+
+    assert (tmp_path / "good.txt").read_text().strip() == "ir"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["good.txt"]
+
+
+def _record_call(marker, tools):
+    tools.run([sys.executable, "-c", _RECORD, str(marker)], marker.name)
+
+
+def test_concurrency_limit_spans_pool_workers(tmp_path):
+    marker = tmp_path / "calls"
+    tools = ToolScheduler(max_concurrent=1)
+    initializer, initargs = tools.pool_initializer()
+    results = list(run_per_file(partial(_record_call, tools=tools), [marker] * 4, 4, initializer, initargs))
+    tools.close()
+
+    assert [error for _, _, error in results] == [None] * 4
+    spans = sorted(tuple(map(float, line.split())) for line in marker.read_text().splitlines())
+    assert len(spans) == 4
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
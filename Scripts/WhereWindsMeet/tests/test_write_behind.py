@@ -0,0 +1,41 @@
+import pytest
+from write_behind import WriteBehind, WriteError
+
+
+@pytest.mark.parametrize("writers", [0, 1, 3])
+def test_callbacks_run_once_earlier_writes_landed(tmp_path, writers):
+    landed = []
+
+    def check(upto):
+        landed.append(all((tmp_path / "deep" / f"{index}.bin").exists() for index in range(upto)))
+
+    with WriteBehind(writers, max_queued_bytes=4096) as writer:
+        for index in range(20):
+            writer.write(tmp_path / "deep" / f"{index}.bin", bytes([index]) * 1000, f"part {index}")
+            if index % 5 == 4:
+                writer.then(lambda upto=index + 1: check(upto))
+
+    assert landed == [True] * 4
+    assert (tmp_path / "deep" / "7.bin").read_bytes() == bytes([7]) * 1000
+
+
+def test_views_are_copied_when_queued(tmp_path):
+    buffer = bytearray(b"first")
+    with WriteBehind(1) as writer:
+        with memoryview(buffer) as view:
+            writer.write(tmp_path / "a.bin", view, "part 1")
+        buffer[:] = b"later"
+
+    assert (tmp_path / "a.bin").read_bytes() == b"first"
+
+
+def test_failed_write_names_its_part_and_skips_later_callbacks(tmp_path):
+    (tmp_path / "blocker").write_bytes(b"a file, not a directory")
+    called = []
+
+    with pytest.raises(WriteError, match="cache part 3"):
+        with WriteBehind(1) as writer:
+            writer.write(tmp_path / "blocker" / "x.bin", b"data", "cache part 3")
+            writer.then(lambda: called.append(True))
+
+    assert called == []
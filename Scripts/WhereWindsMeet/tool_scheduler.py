@@ -0,0 +1,273 @@
+"""Asyncio scheduler for the external tools (dxc) with bounded concurrency, timeouts and a shared TSV log."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing.util
+import os
+import shlex
+import signal
+import threading
+import tempfile
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from atomic_files import temp_path_for
+
+# Seconds a tool call may run before it is killed; far above what dxc needs for even the largest shaders.
+DEFAULT_TOOL_TIMEOUT = 300.0
+STATUSES = ("ok", "failed", "timeout", "missing")
+_LOG_HEADER = "label\tgroup\tvariant\tstatus\texit\tseconds\tcommand\n"
+
+
+_POSIX = os.name == "posix"
+_PROCESS_SCHEDULERS: Dict[Tuple[int, Optional[float], Optional[Path]], "ToolScheduler"] = {}
+_PROCESS_SCHEDULERS_LOCK = threading.Lock()
+# Slots shared by every worker of a process pool (see ``ToolScheduler.pool_initializer``); None outside such a pool.
+_POOL_SLOTS: Optional[Any] = None
+
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    # The call runs in a session of its own, so any children it started (that still hold its pipes) die with it.
+    try:
+        if _POSIX:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+class ToolRun(NamedTuple):
+    label: str  # the shader (or other input) the call was made for
+    group: str  # class of the input, e.g. "ps_6_6"; "" when not given
+    variant: str  # which of the caller's ways of running the tool this was, e.g. "-dumpbin -dxil"; "" when not given
+    command: Tuple[str, ...]
+    status: str  # one of STATUSES; "failed" covers a non-zero exit and a clean exit without output
+    returncode: Optional[int]  # None when the tool was missing; negative (the signal) when it was killed on POSIX
+    seconds: float
+
+
+class ToolScheduler:
+    """Run external tool calls on a background asyncio loop with bounded concurrency and per-call timeouts."""
+
+    def __init__(
+        self, max_concurrent: int = 0, timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT, log_path: Optional[Path] = None
+    ) -> None:
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.timeout = timeout
+        self.log_path = log_path
+        self.runs: List[ToolRun] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def __reduce__(self) -> Tuple[object, Tuple[int, Optional[float], Optional[Path]]]:
+        return process_scheduler, (self.max_concurrent, self.timeout, self.log_path)
+
+    def __enter__(self) -> "ToolScheduler":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        self.close()
+
+    def submit(
+        self,
+        command: Sequence[str],
+        label: str,
+        stdout_path: Optional[Path] = None,
+        group: str = "",
+        variant: str = "",
+    ) -> Future:
+        """Start ``command`` and return a future of (``ToolRun``, captured stdout or None)."""
+        # The temporary name is picked here, in the caller's thread, so concurrent callers never share one.
+        tmp_path = temp_path_for(stdout_path) if stdout_path is not None else None
+        call = self._run(tuple(command), (label, group, variant), stdout_path, tmp_path)
+        return asyncio.run_coroutine_threadsafe(call, self._running_loop())
+
+    def run(
+        self,
+        command: Sequence[str],
+        label: str,
+        stdout_path: Optional[Path] = None,
+        group: str = "",
+        variant: str = "",
+    ) -> Tuple[ToolRun, Optional[str]]:
+        """``submit`` and wait for the call to finish."""
+        return self.submit(command, label, stdout_path, group, variant).result()
+
+    def pool_initializer(self) -> Tuple[Callable[..., None], Tuple[Any, ...]]:
+        """(initializer, args) for a process pool whose workers must share ``max_concurrent`` between them."""
+        return _use_pool_slots, (multiprocessing.BoundedSemaphore(self.max_concurrent),)
+
+    def close(self) -> None:
+        """Stop the loop thread; calls still running are left to finish on their own."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and self._loop_pid == os.getpid():
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _running_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked child inherits the loop object but not the thread running it.
+            if self._loop is None or self._loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="tool-scheduler", daemon=True).start()
+                self._loop = loop
+                self._loop_pid = os.getpid()
+                self._slots = asyncio.Semaphore(self.max_concurrent)
+            return self._loop
+
+    async def _run(
+        self,
+        command: Tuple[str, ...],
+        names: Tuple[str, str, str],
+        stdout_path: Optional[Path],
+        tmp_path: Optional[Path],
+    ) -> Tuple[ToolRun, Optional[str]]:
+        assert self._slots is not None
+        async with self._slots:
+            pool_slots = _POOL_SLOTS
+            if pool_slots is not None:
+                await asyncio.get_running_loop().run_in_executor(None, pool_slots.acquire)
+            try:
+                run, stdout = await self._call(command, names, tmp_path)
+            finally:
+                if pool_slots is not None:
+                    pool_slots.release()
+        if stdout_path is not None and tmp_path is not None:
+            if run.status == "ok":
+                os.replace(tmp_path, stdout_path)
+            else:
+                tmp_path.unlink(missing_ok=True)
+        return self._record(run), stdout
+
+    async def _call(
+        self, command: Tuple[str, ...], names: Tuple[str, str, str], tmp_path: Optional[Path]
+    ) -> Tuple[ToolRun, Optional[str]]:
+        label = names[0]
+        logging.debug("Running %s", " ".join(command))
+        started = time.perf_counter()
+        sink = tmp_path.open("wb") if tmp_path is not None else None
+        try:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=sink or asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=_POSIX,
+                )
+            except FileNotFoundError:
+                logging.warning("Tool %s not found on PATH", command[0])
+                return ToolRun(*names, command, "missing", None, 0.0), None
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+            except asyncio.TimeoutError:
+                _kill(process)
+                await process.wait()
+                logging.error("Tool %s timed out after %ss on %s and was killed", command[0], self.timeout, label)
+                seconds = time.perf_counter() - started
+                return ToolRun(*names, command, "timeout", process.returncode, seconds), None
+            wrote_output = os.fstat(sink.fileno()).st_size > 0 if sink is not None else bool(stdout)
+        finally:
+            if sink is not None:
+                sink.close()
+
+        seconds = time.perf_counter() - started
+        if process.returncode != 0:
+            message = stderr.decode(errors="replace").strip().splitlines()
+            logging.error(
+                "Tool %s failed with exit code %s on %s%s",
+                command[0],
+                process.returncode,
+                label,
+                f": {message[-1]}" if message else "",
+            )
+        status = "ok" if process.returncode == 0 and wrote_output else "failed"
+        text = stdout.decode(errors="replace") if status == "ok" and sink is None else None
+        return ToolRun(*names, command, status, process.returncode, seconds), text
+
+    def _record(self, run: ToolRun) -> ToolRun:
+        with self._lock:
+            self.runs.append(run)
+            if self.log_path is not None:
+                command = shlex.join(run.command)
+                fields = (run.label, run.group, run.variant, run.status, run.returncode, f"{run.seconds:.3f}", command)
+                line = "\t".join(map(str, fields)) + "\n"
+                with self.log_path.open("a", encoding="utf-8") as handle:
+                    handle.write(line)
+        return run
+
+
+def _use_pool_slots(slots: Any) -> None:
+    global _POOL_SLOTS
+    _POOL_SLOTS = slots
+
+
+def process_scheduler(
+    max_concurrent: int = 0, timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT, log_path: Optional[Path] = None
+) -> ToolScheduler:
+    """The scheduler with these settings shared by this whole process; it is closed when the process exits."""
+    key = (max_concurrent, timeout, log_path)
+    with _PROCESS_SCHEDULERS_LOCK:
+        scheduler = _PROCESS_SCHEDULERS.get(key)
+        if scheduler is None:
+            scheduler = _PROCESS_SCHEDULERS[key] = ToolScheduler(*key)
+            # Unlike atexit, this also runs in multiprocessing workers, and only in the process that registered it.
+            multiprocessing.util.Finalize(scheduler, scheduler.close, exitpriority=0)
+        return scheduler
+
+
+@contextmanager
+def shared_tool_log(path: Optional[Path]) -> Iterator[Path]:
+    """Start an empty tool log at ``path`` for this run's processes, or a temporary one without it."""
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(_LOG_HEADER, encoding="utf-8")
+        yield path
+        return
+    handle, name = tempfile.mkstemp(prefix="tool-log-", suffix=".tsv")
+    os.close(handle)
+    log_path = Path(name)
+    try:
+        log_path.write_text(_LOG_HEADER, encoding="utf-8")
+        yield log_path
+    finally:
+        log_path.unlink(missing_ok=True)
+
+
+def read_tool_log(path: Path) -> List[ToolRun]:
+    runs = []
+    for line in path.read_text(encoding="utf-8").splitlines()[1:]:
+        fields = line.split("\t")
+        if len(fields) != 7 or fields[3] not in STATUSES:
+            continue  # torn by a killed writer
+        label, group, variant, status, returncode, seconds, command = fields
+        exit_code = int(returncode) if returncode.lstrip("-").isdigit() else None
+        runs.append(ToolRun(label, group, variant, tuple(shlex.split(command)), status, exit_code, float(seconds)))
+    return runs
+
+
+def log_tool_summary(runs: Iterable[ToolRun]) -> None:
+    runs = list(runs)
+    if not runs:
+        return
+    counts = {status: 0 for status in STATUSES}
+    for run in runs:
+        counts[run.status] += 1
+    slowest = max(runs, key=lambda run: run.seconds)
+    logging.info(
+        "Tool calls: %s (%s ok, %s failed, %s timed out, %s missing), %.1fs in total; slowest %.1fs on %s",
+        len(runs),
+        counts["ok"],
+        counts["failed"],
+        counts["timeout"],
+        counts["missing"],
+        sum(run.seconds for run in runs),
+        slowest.seconds,
+        slowest.label,
+    )
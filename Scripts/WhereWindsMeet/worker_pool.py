@@ -0,0 +1,68 @@
+"""Process-pool fan-out shared by the cache splitting entry points."""
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def resolve_jobs(jobs: int) -> int:
+    """Map the CLI ``--jobs`` value to a worker count (0 means one per CPU)."""
+    if jobs < 0:
+        raise SystemExit(f"--jobs must be >= 0, got {jobs}")
+    return jobs or os.cpu_count() or 1
+
+
+def _init_worker(
+    log_queue: multiprocessing.Queue,
+    level: int,
+    initializer: Optional[Callable[..., None]],
+    initargs: Tuple[Any, ...],
+) -> None:
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def run_per_file(
+    func: Callable[[T], R],
+    items: Sequence[T],
+    jobs: int,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: Tuple[Any, ...] = (),
+) -> Iterator[Tuple[T, Optional[R], Optional[Exception]]]:
+    """Run ``func`` over ``items`` (in a process pool when ``jobs`` > 1); yields (item, result, error) in order."""
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as err:
+                yield item, None, err
+        return
+
+    root = logging.getLogger()
+    log_queue: multiprocessing.Queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(items)),
+            initializer=_init_worker,
+            initargs=(log_queue, root.level, initializer, initargs),
+        ) as pool:
+            futures = [pool.submit(func, item) for item in items]
+            for item, future in zip(items, futures):
+                try:
+                    yield item, future.result(), None
+                except Exception as err:
+                    yield item, None, err
+    finally:
+        listener.stop()
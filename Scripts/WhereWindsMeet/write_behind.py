@@ -0,0 +1,144 @@
+"""Write-behind file output for split artifacts, so decompression keeps running while storage catches up."""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Set, Tuple
+
+from atomic_files import write_atomic
+
+# Bytes of queued payloads a writer holds before ``write`` blocks.
+WRITE_QUEUE_BYTES = 64 * 1024 * 1024
+
+
+class WriteError(OSError):
+    """A queued write failed; the message names the part and path."""
+
+
+class WriteBehind:
+    """Queue file writes to ``writers`` background threads (0 writes inline, in the calling thread)."""
+
+    def __init__(self, writers: int = 1, max_queued_bytes: int = WRITE_QUEUE_BYTES) -> None:
+        self.max_queued_bytes = max_queued_bytes
+        self._pending: Deque[Tuple[int, Path, bytes, str]] = deque()
+        self._queued_bytes = 0
+        # Writes are numbered as they are queued; a callback waits until every write numbered below its bound landed.
+        self._next_seq = 0
+        self._in_flight: Set[int] = set()
+        self._callbacks: Deque[Tuple[int, Callable[[], None]]] = deque()
+        self._closing = False
+        self._error: Optional[WriteError] = None
+        self._made_dirs: Set[Path] = set()
+        self._changed = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"write-behind-{index}", daemon=True) for index in range(writers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "WriteBehind":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        try:
+            self.close()
+        except WriteError as err:
+            if exc_type is None:
+                raise
+            # Do not mask the exception that is already propagating (usually this very error, raised by write()).
+            if err is not exc:
+                logging.error("%s", err)
+
+    def ensure_dir(self, directory: Path) -> None:
+        if directory in self._made_dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._changed:
+            self._made_dirs.add(directory)
+
+    def write(self, path: Path, payload: bytes | memoryview, label: str) -> None:
+        """Queue ``payload`` for ``path``, copying views; raises the first ``WriteError`` of an earlier queued write."""
+        if not self._threads:
+            self._write(path, payload, label)
+            return
+        data = bytes(payload)
+        with self._changed:
+            while self._error is None and self._pending and self._queued_bytes + len(data) > self.max_queued_bytes:
+                self._changed.wait()
+            if self._error is not None:
+                raise self._error
+            self._pending.append((self._next_seq, path, data, label))
+            self._next_seq += 1
+            self._queued_bytes += len(data)
+            self._changed.notify_all()
+
+    def then(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` from a writer thread once every write queued so far has landed, unless one failed."""
+        with self._changed:
+            if self._error is not None:
+                raise self._error
+            self._callbacks.append((self._next_seq, callback))
+            ready = self._ready_callbacks()
+        self._run_callbacks(ready)
+
+    def close(self) -> None:
+        """Flush every queued write, stop the threads and raise the first write error, if any."""
+        with self._changed:
+            self._closing = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write(self, path: Path, data: bytes | memoryview, label: str) -> None:
+        try:
+            self.ensure_dir(path.parent)
+            write_atomic(path, data)
+        except OSError as err:
+            raise WriteError(f"Writing {label} to {path} failed: {err}") from err
+
+    def _run(self) -> None:
+        while True:
+            with self._changed:
+                while not self._pending and not self._closing:
+                    self._changed.wait()
+                if not self._pending:
+                    return
+                seq, path, data, label = self._pending.popleft()
+                self._in_flight.add(seq)
+            try:
+                self._write(path, data, label)
+            except WriteError as err:
+                logging.debug("%s", err)
+                with self._changed:
+                    self._error = self._error or err
+            with self._changed:
+                self._in_flight.discard(seq)
+                self._queued_bytes -= len(data)
+                ready = self._ready_callbacks()
+                self._changed.notify_all()
+            self._run_callbacks(ready)
+
+    def _ready_callbacks(self) -> List[Callable[[], None]]:
+        # After a failure nothing is reported as landed any more; the error surfaces from write() or close().
+        if self._error is not None:
+            return []
+        outstanding = set(self._in_flight)
+        if self._pending:
+            outstanding.add(self._pending[0][0])
+        landed_below = min(outstanding, default=self._next_seq)
+        ready = []
+        while self._callbacks and self._callbacks[0][0] <= landed_below:
+            ready.append(self._callbacks.popleft()[1])
+        return ready
+
+    def _run_callbacks(self, callbacks: List[Callable[[], None]]) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except OSError as err:
+                with self._changed:
+                    self._error = self._error or WriteError(f"Recording a finished write failed: {err}")